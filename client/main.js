@@ -4,9 +4,15 @@ document.getElementById('wiki-form').addEventListener('submit', function(event)
 
     var startPage = document.getElementById('start-page').value;
     var finishPage = document.getElementById('finish-page').value;
+    var pathElement = document.getElementById('path');
+    var logsElement = document.getElementById('logs');
+    var statsElement = document.getElementById('stats');
+    pathElement.innerHTML = '';
+    logsElement.innerHTML = '';
+    statsElement.innerHTML = '';
 
     console.log("Sending fetch request...");
-    fetch('/find_path', {
+    fetch('/jobs', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
@@ -22,51 +28,67 @@ document.getElementById('wiki-form').addEventListener('submit', function(event)
         }
         return response.json();
     })
+    .then(data => {
+        if (data.error) {
+            throw new Error(data.error);
+        }
+        followJob(data.events, pathElement, logsElement, statsElement);
+    })
     .catch(error => {
         console.error('Error:', error);
-        var pathElement = document.getElementById('path');
         pathElement.innerHTML = '<p>Error: ' + error.message + '</p>';
-        return error.response.json();
-    })
-    .then(data => {
-        if (!data) return; // if there was an error, data will be undefined
-        var logsElement = document.getElementById('logs');
-        logsElement.innerHTML = data.error + (data.time ? '<p>Elapsed time: ' + data.time + '</p>' : '');
-        return data; // return data so it can be used in the next .then block
-    })
-    .then(data => {
-        if (!data) return; // if there was an error, data will be undefined
-        console.log('about to output data')
+    });
+});
+
+// Streams a search job's progress and result as Server-Sent Events
+function followJob(eventsUrl, pathElement, logsElement, statsElement) {
+    var events = new EventSource(eventsUrl);
+
+    events.addEventListener('queued', function(message) {
+        logsElement.innerHTML = '<p>Queued at position ' + JSON.parse(message.data).position + '</p>';
+    });
+    events.addEventListener('started', function() {
+        logsElement.innerHTML = '<p>Searching...</p>';
+    });
+    events.addEventListener('progress', function(message) {
+        var progress = JSON.parse(message.data);
+        var statsHtml = '<ul>';
+        statsHtml += '<li>Depth: ' + progress.depth + '</li>';
+        statsHtml += '<li>Forward frontier: ' + progress.forward_frontier + ' pages</li>';
+        statsHtml += '<li>Backward frontier: ' + progress.backward_frontier + ' pages</li>';
+        statsHtml += '<li>Number of discovered pages: ' + progress.discovered + '</li>';
+        statsHtml += '</ul>';
+        statsElement.innerHTML = statsHtml;
+    });
+    events.addEventListener('done', function(message) {
+        events.close();
+        var data = JSON.parse(message.data);
         console.log(data);
-        // output path
-        console.log('about to output path')
-        var pathElement = document.getElementById('path');
-        pathElement.innerHTML = ''; // clear previous path
-        var pathHtml = '<ul>';
-        data.path.forEach(function(page) {
-            pathHtml += '<li><a href="' + page + '">' + decodeURIComponent(page) + '</a></li>';
-        });
-        pathHtml += '</ul>';
-        pathElement.innerHTML = pathHtml;
-        // output discovered pages 
-        console.log('about to output logs')
-        var logsElement = document.getElementById('logs');
-        logsElement.innerHTML = ''; // clear previous logs
-        var logsHtml = '<pre>';
-        data.logs.forEach(function(log) {
-            logsHtml += log + '\n';
-        });
-        logsHtml += '</pre>';
-        logsElement.innerHTML = logsHtml;
-        // output stats
-        console.log('about to output stats')
-        var statsElement = document.getElementById('stats');
-        statsElement.innerHTML = ''; // clear previous stats
+        if (data.error) {
+            logsElement.innerHTML = data.error;
+        } else {
+            logsElement.innerHTML = '';
+            var pathHtml = '<ul>';
+            data.path.forEach(function(page) {
+                pathHtml += '<li><a href="' + page + '">' + decodeURIComponent(page) + '</a></li>';
+            });
+            pathHtml += '</ul>';
+            pathElement.innerHTML = pathHtml;
+        }
         var statsHtml = '<ul>';
         statsHtml += '<li>Elapsed time: ' + data.time + '</li>';
         statsHtml += '<li>Number of discovered pages: ' + data.discovered + '</li>';
         statsHtml += '</ul>';
         statsElement.innerHTML = statsHtml;
     });
-});
+    events.addEventListener('failed', function(message) {
+        events.close();
+        pathElement.innerHTML = '<p>Error: ' + JSON.parse(message.data).error + '</p>';
+    });
+    // Only fired for a dropped connection; the job's own errors arrive as 'failed'
+    events.addEventListener('error', function() {
+        events.close();
+        pathElement.innerHTML = '<p>Error: Lost connection to the server.</p>';
+    });
+}
 console.log("Finished fetch request...");
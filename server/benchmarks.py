@@ -0,0 +1,1178 @@
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import hashlib
+import heapq
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+from array import array
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from network import AsyncHTTPClient
+from stub_wiki import DEFAULT_MEAN_LINKS, SyntheticWiki, start_stub
+import search_algorithms
+from crawler import build_graph, build_graph_bounded, find_path, lazy_graph, online_search
+from link_sources import WIKI_BASE_URL, APILinkSource, HTMLLinkSource
+from heuristic import WikipediaTextFetcher
+from cache import KVCache
+from canonical import TITLES_PER_REQUEST
+from crawl_store import CrawlStore
+from scheduler import FetchScheduler
+from graph_store import LinkGraph, write_store
+from landmarks import LandmarkIndex, build_landmarks, write_landmarks
+from minhash import SketchIndex
+from sparse_bfs import sparse_bfs
+from utils import extract_title, parse_links, parse_link_titles
+from urllib.parse import quote, unquote, urljoin
+from bs4 import BeautifulSoup
+
+async def bench_network(args):
+    wiki = SyntheticWiki(args.pages)
+    runner, base_url = await start_stub(wiki, latency=args.latency, rate_limit=args.server_rate_limit)
+    try:
+        urls = [f"{base_url}/wiki/{title}" for title in wiki.titles[:args.requests]]
+        failures = 0
+        async with AsyncHTTPClient(rate_limit=args.rate_limit, burst=args.burst,
+                                   max_parallel_requests=args.concurrency,
+                                   max_connections_per_host=args.concurrency) as client:
+            started = time.perf_counter()
+            async for url, content in client.get_many(urls):
+                if isinstance(content, Exception):
+                    failures += 1
+            elapsed = time.perf_counter() - started
+        log = runner.app['request_log']
+        print(f"requests:        {len(urls)} ({failures} failed, {log.throttled} answered 429)")
+        print(f"elapsed:         {elapsed:.2f}s")
+        print(f"throughput:      {len(urls) / elapsed:.1f} pages/s")
+        print(f"observed rate:   {log.mean_rate():.1f} req/s mean, {log.peak_rate():.0f} req/s peak (1s window)")
+        print(f"configured rate: {args.rate_limit} req/s, burst {args.burst}")
+    finally:
+        await runner.cleanup()
+
+async def bench_extracts(args):
+    wiki = SyntheticWiki(args.pages)
+    runner, base_url = await start_stub(wiki, latency=args.latency)
+    log = runner.app['request_log']
+    titles = [title.replace('_', ' ') for title in wiki.titles[:args.titles]]
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            fetcher = WikipediaTextFetcher(cache_dir, api_url=f"{base_url}/w/api.php")
+            async with AsyncHTTPClient(rate_limit=None) as client:
+                started = time.perf_counter()
+                # Overlapping calls, as when several frontier expansions ask for the same pages
+                results = await asyncio.gather(fetcher.fetch_texts(titles, client),
+                                               fetcher.fetch_texts(titles[:len(titles) // 2], client))
+                elapsed = time.perf_counter() - started
+            missing = [title for title in titles if not results[0].get(title)]
+            assert not missing, f"No text returned for {missing[:5]}"
+            assert all(results[1][title] == results[0][title] for title in results[1])
+            assert all(results[0][title] == wiki.extract(title) for title in titles)
+            cached_requests = len(log.times)
+            await fetcher.fetch_texts(titles)
+            assert len(log.times) == cached_requests, "Cached titles were requested again"
+        print(f"titles:          {len(titles)} (plus {len(titles) // 2} requested twice concurrently)")
+        print(f"API requests:    {cached_requests} (one request per title would take {len(titles)})")
+        print(f"elapsed:         {elapsed:.2f}s at {args.latency * 1000:.0f}ms per request")
+    finally:
+        await runner.cleanup()
+
+async def bench_link_sources(args):
+    wiki = SyntheticWiki(args.pages, seed=args.seed)
+    runner, base_url = await start_stub(wiki, latency=args.latency)
+    log = runner.app['request_log']
+    start, finish = wiki.titles[0].replace('_', ' '), wiki.titles[1].replace('_', ' ')
+    try:
+        graphs = {}
+        for source in ('html', 'api'):
+            requests_before, bytes_before = len(log.times), log.bytes_sent
+            started = time.perf_counter()
+            graphs[source] = await build_graph(start, finish, max_depth=args.max_depth, max_links_per_page=10**6,
+                                               max_pages=args.max_pages, concurrency=args.concurrency,
+                                               base_url=base_url, link_source=source)
+            elapsed = time.perf_counter() - started
+            print(f"{source:<5}{len(graphs[source]):>7} pages{len(log.times) - requests_before:>7} requests"
+                  f"{(log.bytes_sent - bytes_before) / 2**20:>9.2f}MB{elapsed:>8.2f}s")
+        for page, links in graphs['api'].items():
+            if links and page in graphs['html']:
+                assert sorted(links) == sorted(graphs['html'][page]), f"Links differ for {page}"
+
+        async with AsyncHTTPClient(rate_limit=None) as client:
+            source = APILinkSource(client, f"{base_url}/w/api.php")
+            sample = [title.replace('_', ' ') for title in wiki.titles[:args.backward_titles]]
+            backward = await source.backward(sample)
+            for title in sample:
+                assert sorted(backward[title]) == sorted(t.replace('_', ' ') for t in wiki.backlinks(title))
+            print(f"backward links for {len(sample)} pages match the stub's reverse index")
+
+            # A bidirectional search expanding the target side through incoming links
+            loop = asyncio.get_running_loop()
+            forward_graph, backward_graph = lazy_graph(source.forward, loop), lazy_graph(source.backward, loop)
+            path = await loop.run_in_executor(None, search_algorithms.bidirectional_bfs, forward_graph, start, finish,
+                                              10, backward_graph)
+            assert len(path) - 1 == wiki.shortest_path_length(start, finish), path
+            print(f"bidirectional search over the API: {' -> '.join(path)} "
+                  f"({len(forward_graph) + len(backward_graph)} pages expanded)")
+    finally:
+        await runner.cleanup()
+
+async def bench_crawl_store(args):
+    wiki = SyntheticWiki(args.pages, seed=args.seed)
+    runner, base_url = await start_stub(wiki, latency=args.latency)
+    log = runner.app['request_log']
+    start, finish = wiki.titles[0].replace('_', ' '), wiki.titles[1].replace('_', ' ')
+
+    async def crawl(store, label):
+        requests_before = len(log.times)
+        started = time.perf_counter()
+        graph = await build_graph(start, finish, max_depth=args.max_depth, max_links_per_page=10**6,
+                                  max_pages=args.max_pages, concurrency=args.concurrency, base_url=base_url,
+                                  link_source=args.link_source, store=store)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<34}{len(graph):>7} pages{len(log.times) - requests_before:>7} requests{elapsed:>8.2f}s")
+        return graph
+
+    try:
+        with tempfile.TemporaryDirectory() as store_dir:
+            with CrawlStore(store_dir) as store:
+                cold = await crawl(store, 'cold')
+                assert await crawl(store, 'warm') == cold
+                store.ttl = 1e-9
+                assert await crawl(store, 'expired, no edits') == cold
+                # Reordering keeps the graph's pages the same while giving each edited page a new revision
+                edited = [title for title, links in cold.items() if links][:args.edits]
+                for title in edited:
+                    wiki.edit(title, wiki.outlinks(title)[::-1])
+                after_edits = await crawl(store, f'expired, {len(edited)} pages edited')
+                assert all(after_edits[title] == cold[title][::-1] for title in edited)
+
+        with tempfile.TemporaryDirectory() as store_dir:
+            with CrawlStore(store_dir) as store:
+                reference = await build_graph(start, finish, max_depth=args.max_depth, max_links_per_page=10**6,
+                                              max_pages=args.max_pages, concurrency=args.concurrency,
+                                              base_url=base_url, link_source=args.link_source)
+                task = asyncio.ensure_future(crawl(store, 'unused'))
+                # Interrupt the crawl once it has checkpointed its first depth levels
+                while not os.path.exists(store.checkpoint_path) or store.load_checkpoint()['depth'] < args.max_depth - 1:
+                    await asyncio.sleep(0.005)
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                print(f"interrupted at depth {store.load_checkpoint()['depth']} with {len(store)} pages stored")
+            with CrawlStore(store_dir) as store:
+                assert await crawl(store, 'resumed') == reference
+                assert store.load_checkpoint() is None
+    finally:
+        await runner.cleanup()
+
+async def bench_canonical(args):
+    wiki = SyntheticWiki(args.pages, seed=args.seed)
+    wiki.add_redirects(args.redirects, seed=args.seed)
+    runner, base_url = await start_stub(wiki, latency=args.latency)
+    log = runner.app['request_log']
+    start = wiki.titles[0].replace('_', ' ')
+    # Ask for the target by a redirect, as a user typing 'USA' would
+    finish = next(alias for alias, target in wiki.redirects.items() if target != wiki.titles[0]).replace('_', ' ')
+    try:
+        for source in ('html', 'api'):
+            requests, redirects = {}, {}
+            for canonicalize in (False, True):
+                requests_before = len(log.times)
+                started = time.perf_counter()
+                graph = await build_graph(start, finish, max_depth=args.max_depth, max_links_per_page=10**6,
+                                          max_pages=args.max_pages, concurrency=args.concurrency, base_url=base_url,
+                                          link_source=source, canonicalize=canonicalize)
+                elapsed = time.perf_counter() - started
+                aliases = sum(1 for title in graph if title.replace(' ', '_') in wiki.redirects)
+                label = f"{source}, {'canonical' if canonicalize else 'raw'} titles"
+                requests[canonicalize], redirects[canonicalize] = len(log.times) - requests_before, aliases
+                print(f"{label:<24}{len(graph):>7} pages{aliases:>6} redirects{requests[canonicalize]:>7} requests"
+                      f"{elapsed:>8.2f}s")
+                if canonicalize:
+                    assert not aliases, "Redirect titles were kept as separate pages"
+                    target = wiki.resolve(finish).replace('_', ' ')
+                    path = find_path(graph, start, target, 'bidirectional')
+                    if path:
+                        assert len(path) - 1 == wiki.shortest_path_length(start, finish), path
+            # Link targets are resolved in queries of their own, so canonical titles cost requests
+            print(f"{source}: resolution spends {requests[True] - requests[False]:+d} requests "
+                  f"({TITLES_PER_REQUEST} titles per lookup) to merge {redirects[False]} redirect pages into their articles")
+    finally:
+        await runner.cleanup()
+
+async def bench_online(args):
+    wiki = SyntheticWiki(args.pages, seed=args.seed)
+    runner, base_url = await start_stub(wiki, latency=args.latency)
+    log = runner.app['request_log']
+    rng = random.Random(args.seed + 1)
+    pairs = []
+    while len(pairs) < args.pairs:
+        start, finish = rng.sample(wiki.titles, 2)
+        distance = wiki.shortest_path_length(start, finish)
+        if distance is not None and distance <= args.max_depth:
+            pairs.append((start.replace('_', ' '), finish.replace('_', ' '), distance))
+
+    totals = {mode: {'requests': 0, 'elapsed': 0.0, 'solved': 0, 'extra_links': 0} for mode in ('crawl, then search', 'online')}
+    try:
+        for start, finish, distance in pairs:
+            for mode, total in totals.items():
+                requests_before = len(log.times)
+                started = time.perf_counter()
+                if mode == 'online':
+                    path = await online_search(start, finish, args.max_pages, base_url=base_url, link_source=args.link_source)
+                else:
+                    graph = await build_graph(start, finish, max_depth=args.max_depth, max_links_per_page=10**6,
+                                              max_pages=args.max_pages, concurrency=args.concurrency,
+                                              base_url=base_url, link_source=args.link_source)
+                    path = find_path(graph, start, finish, 'bidirectional') if graph and finish in graph else None
+                total['elapsed'] += time.perf_counter() - started
+                total['requests'] += len(log.times) - requests_before
+                if path:
+                    assert all(link.replace(' ', '_') in wiki.outlinks(page) for page, link in zip(path, path[1:])), path
+                    total['solved'] += 1
+                    total['extra_links'] += len(path) - 1 - distance
+        print(f"{len(pairs)} pairs at distance {min(d for *_, d in pairs)}-{max(d for *_, d in pairs)}, "
+              f"{args.link_source} link source, {args.latency * 1000:.0f}ms latency")
+        for mode, total in totals.items():
+            print(f"{mode:<20}{total['solved']:>4}/{len(pairs)} solved{total['requests'] / len(pairs):>9.1f} requests/pair"
+                  f"{total['elapsed'] / len(pairs):>8.2f}s/pair{total['extra_links']:>5} links longer than shortest")
+    finally:
+        await runner.cleanup()
+
+async def bench_scheduler(args):
+    wiki = SyntheticWiki(args.pages, seed=args.seed)
+    runner, base_url = await start_stub(wiki, latency=args.latency, slow_fraction=args.slow_fraction,
+                                        slow_latency=args.slow_latency, seed=args.seed)
+    log = runner.app['request_log']
+    rng = random.Random(args.seed)
+    urls = [f"{base_url}/wiki/{title}" for title in wiki.titles[:args.requests]]
+    try:
+        # Priority order under a rate limit: how soon do the most valuable pages arrive?
+        priorities = {url: rng.random() for url in urls}
+        best = set(sorted(urls, key=priorities.get)[:args.requests // 10])
+        for name in ('FIFO', 'priority'):
+            async with AsyncHTTPClient(rate_limit=args.rate_limit, burst=1, max_parallel_requests=args.concurrency) as client:
+                order = []
+                async def fetch(url, get):
+                    await get(url)
+                    order.append(url)
+                started = time.perf_counter()
+                if name == 'FIFO':
+                    await asyncio.gather(*(fetch(url, client.get) for url in urls))
+                else:
+                    async with FetchScheduler(client, hedge=False) as scheduler:
+                        await asyncio.gather(*(fetch(url, lambda url: scheduler.get(url, priorities[url])) for url in urls))
+                elapsed = time.perf_counter() - started
+            arrived = max(position for position, url in enumerate(order, 1) if url in best)
+            print(f"{name:<10} best {len(best)} pages all fetched after {arrived:>4} of {len(urls)} requests "
+                  f"({arrived / len(urls) * elapsed:.2f}s of {elapsed:.2f}s)")
+
+        # Hedging: the same fetches with a heavy tail, with and without hedged requests
+        for hedge in (False, True):
+            async with AsyncHTTPClient(rate_limit=None, max_parallel_requests=args.concurrency) as client:
+                async with FetchScheduler(client, hedge=hedge) as scheduler:
+                    latencies = []
+                    async def timed(url):
+                        started = time.perf_counter()
+                        await scheduler.get(url)
+                        latencies.append(time.perf_counter() - started)
+                    requests_before = len(log.times)
+                    # One page at a time per worker, so queue wait does not hide the tail
+                    for i in range(0, len(urls), args.concurrency):
+                        await asyncio.gather(*(timed(url) for url in urls[i:i + args.concurrency]))
+            latencies.sort()
+            sent = len(log.times) - requests_before
+            print(f"{'hedged' if hedge else 'unhedged':<10} p50 {latencies[len(latencies) // 2] * 1000:>6.0f}ms  "
+                  f"p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1000:>6.0f}ms  total {sum(latencies):>6.1f}s  "
+                  f"{sent - len(urls):>4} extra requests")
+
+        # Cancellation: nothing should reach the server once an online search has its path
+        for start, finish in [(wiki.titles[i].replace('_', ' '), wiki.titles[i + 1].replace('_', ' ')) for i in range(5)]:
+            await online_search(start, finish, args.max_pages, base_url=base_url, link_source='html')
+            returned = time.monotonic()
+            await asyncio.sleep(args.slow_latency + args.latency)
+            late = sum(1 for t in log.times if t > returned)
+            assert late == 0, f"{late} requests reached the server after the search returned"
+        print("online searches sent no requests after finding their paths")
+    finally:
+        await runner.cleanup()
+
+class GeneratedLinkSource:
+    """Link source whose links are computed from each title on demand, so crawls of millions of pages
+    need neither a stub server nor the whole graph in memory. Low-numbered articles are the hubs."""
+
+    def __init__(self, pages, mean_links=DEFAULT_MEAN_LINKS, seed=0):
+        self.pages = pages
+        self.mean_links = mean_links
+        self.seed = seed
+
+    def links(self, title):
+        rng = random.Random(self.seed * 1000003 + int(title.rsplit(' ', 1)[1]))
+        degree = max(1, int(rng.lognormvariate(0, 0.8) * self.mean_links / 1.377))
+        return list(dict.fromkeys(f"Article {int(self.pages * rng.random() ** 2)}" for _ in range(degree)))
+
+    async def exists(self, titles):
+        return True
+
+    async def forward(self, titles):
+        return {title: self.links(title) for title in titles}
+
+async def bench_bounded_crawl(args):
+    source = GeneratedLinkSource(args.pages, seed=args.seed)
+    results = {}
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as directory:
+            stats = {}
+            tracemalloc.start()
+            started = time.perf_counter()
+            if mode == 'bounded':
+                graph = await build_graph_bounded('Article 0', 'Article 1', os.path.join(directory, 'graph'), args.max_depth,
+                                                  args.max_links_per_page, args.max_pages, link_source=source,
+                                                  memory_budget=args.memory_budget * 2**20, bloom=not args.no_bloom,
+                                                  stats=stats)
+                pages, nodes, links = stats['pages'], graph.node_count, graph.edge_count
+            else:
+                graph = await build_graph('Article 0', 'Article 1', args.max_depth, args.max_links_per_page, args.max_pages,
+                                          concurrency=10, link_source=source)
+                pages = sum(1 for links in graph.values() if links)
+                nodes, links = len(set(graph) | {title for links in graph.values() for title in links}), sum(map(len, graph.values()))
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[mode] = graph if mode == 'dict' else {title: graph[title] for title in random.Random(args.seed).sample(
+                [f"Article {node}" for node in range(args.pages)], 1000) if title in graph}
+            spills = f", {stats['spills']} frontier spills, filter skipped {stats['skipped_lookups']} of " \
+                     f"{stats['skipped_lookups'] + stats['lookups']} title lookups" if stats else ''
+            print(f"{mode:<8}{pages:>9} pages{nodes:>10} nodes{links:>11} links{elapsed:>8.1f}s"
+                  f"{peak / 2**20:>8.1f}MB peak Python heap{spills}")
+    if len(results) == 2:
+        # Without a max_pages cut both crawls reach the same pages, so their links must agree
+        mismatched = [title for title, links in results['bounded'].items()
+                      if sorted(links) != sorted(set(results['dict'].get(title, [])))]
+        print(f"sampled pages whose links differ: {len(mismatched)}")
+
+REPLAY_FIELDS = ['start_page', 'finish_page', 'elapsed_time', 'discovered_pages_count', 'depth_reached']
+REPLAY_MODES = ('crawler', 'server')
+
+def load_replay_pairs(path):
+    """Distinct (start, finish) titles from a performance log, in first-seen order."""
+    with open(path, newline='') as file:
+        rows = list(csv.DictReader(file))
+    pairs = [tuple(unquote(extract_title(row[field])).replace('_', ' ') for field in ('start_page', 'finish_page'))
+             for row in rows]
+    return list(dict.fromkeys(pairs))
+
+async def replay_crawler(args, base_url, start, finish, directory):
+    """crawler.build_graph followed by find_path, as `crawler.py` runs them."""
+    started = time.perf_counter()
+    graph = await build_graph(start, finish, max_depth=args.max_depth, max_links_per_page=args.max_links_per_page,
+                              max_pages=args.max_pages, concurrency=args.concurrency, base_url=base_url,
+                              link_source=args.link_source)
+    path = find_path(graph, start, finish, args.algorithm) if graph else None
+    return time.perf_counter() - started, len(graph or {}), path
+
+async def replay_server(args, base_url, start, finish, directory):
+    """One POST /find_path against a fresh server app, so neither its result cache nor its link cache is warm."""
+    from aiohttp.test_utils import TestClient, TestServer
+    from server import PathFinder, create_app
+    path_finder = PathFinder(None, os.path.join(directory, f"server-{time.monotonic_ns()}.db"), f"{base_url}/w/api.php")
+    async with TestClient(TestServer(create_app(path_finder, rate_limit='1000000/second'))) as client:
+        started = time.perf_counter()
+        response = await client.post('/find_path', json={'start': f"{WIKI_BASE_URL}/wiki/{quote(start.replace(' ', '_'))}",
+                                                         'finish': f"{WIKI_BASE_URL}/wiki/{quote(finish.replace(' ', '_'))}"})
+        data = await response.json()
+        return time.perf_counter() - started, data['discovered'], data.get('path')
+
+async def run_replay(args):
+    pairs = load_replay_pairs(args.log)
+    if args.graph_store:
+        wiki = SyntheticWiki(links=dict(LinkGraph(args.graph_store).items()))
+    else:
+        titles = list(dict.fromkeys(title for pair in pairs for title in pair))
+        wiki = SyntheticWiki(args.pages, args.mean_links, seed=args.seed, titles=titles)
+    runner, base_url = await start_stub(wiki, latency=args.latency, jitter=args.jitter, seed=args.seed)
+    print(f"stub: {len(wiki.titles)} pages, {sum(len(links) for links in wiki.links.values())} links; "
+          f"{len(pairs)} pairs x {args.runs} runs")
+    for start, finish in pairs:
+        print(f"  {start} -> {finish}: shortest path {wiki.shortest_path_length(start, finish)} links")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    summary = {}
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in args.modes:
+                replay = replay_crawler if mode == 'crawler' else replay_server
+                rows, solved = [], 0
+                for start, finish in pairs:
+                    for _ in range(args.runs):
+                        elapsed, discovered, path = await replay(args, base_url, start, finish, directory)
+                        solved += bool(path)
+                        rows.append({'start_page': f"{WIKI_BASE_URL}/wiki/{quote(start.replace(' ', '_'))}",
+                                     'finish_page': f"{WIKI_BASE_URL}/wiki/{quote(finish.replace(' ', '_'))}",
+                                     'elapsed_time': elapsed, 'discovered_pages_count': discovered,
+                                     'depth_reached': len(path) - 1 if path else args.max_depth})
+                with open(os.path.join(args.out_dir, f"{mode}_logs.csv"), 'w', newline='') as file:
+                    writer = csv.DictWriter(file, fieldnames=REPLAY_FIELDS)
+                    writer.writeheader()
+                    writer.writerows(rows)
+                summary[mode] = {
+                    'searches': len(rows),
+                    'solved': solved,
+                    'pages_per_second': sum(row['discovered_pages_count'] for row in rows) / sum(row['elapsed_time'] for row in rows),
+                    'discovered_per_search': sum(row['discovered_pages_count'] for row in rows) / len(rows),
+                }
+    finally:
+        await runner.cleanup()
+    return summary
+
+def check_replay_baseline(summary, baseline, tolerance):
+    """Regressions against the baseline: lower throughput, more pages discovered per search, a lower share
+    of searches solved. Solve rates are compared, so a replay with a different --runs is judged fairly."""
+    failures = []
+    for mode, metrics in summary.items():
+        expected = baseline.get(mode)
+        if not expected:
+            continue
+        if metrics['pages_per_second'] < expected['pages_per_second'] * (1 - tolerance):
+            failures.append(f"{mode}: {metrics['pages_per_second']:.1f} pages/s, baseline {expected['pages_per_second']:.1f}")
+        if metrics['discovered_per_search'] > expected['discovered_per_search'] * (1 + tolerance):
+            failures.append(f"{mode}: {metrics['discovered_per_search']:.1f} pages discovered per search, "
+                            f"baseline {expected['discovered_per_search']:.1f}")
+        solve_rate, expected_rate = metrics['solved'] / metrics['searches'], expected['solved'] / expected['searches']
+        if solve_rate < expected_rate:
+            failures.append(f"{mode}: {solve_rate:.0%} of searches solved, baseline {expected_rate:.0%}")
+    return failures
+
+def bench_replay(args):
+    summary = asyncio.run(run_replay(args))
+    print(f"{'mode':<9}{'searches':>10}{'solved':>8}{'pages/s':>10}{'pages/search':>14}")
+    for mode, metrics in summary.items():
+        print(f"{mode:<9}{metrics['searches']:>10}{metrics['solved']:>8}{metrics['pages_per_second']:>10.1f}"
+              f"{metrics['discovered_per_search']:>14.1f}")
+    print(f"rows written to {args.out_dir}")
+    if args.update_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(summary, file, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; pass --update_baseline to record one")
+        return
+    with open(args.baseline) as file:
+        failures = check_replay_baseline(summary, json.load(file), args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if failures:
+        sys.exit(1)
+
+# The path-carrying implementations search_algorithms used before the parent-pointer rewrite,
+# kept here as the baseline for `benchmarks.py search`
+
+def legacy_bfs(graph, start_page, target_page, max_depth=10):
+    if start_page == target_page:
+        return [start_page]
+    queue = deque([(start_page, [start_page], 0)])
+    visited = set([start_page])
+    while queue:
+        current_page, path, depth = queue.popleft()
+        if depth > max_depth:
+            continue
+        for neighbor in graph.get(current_page, []):
+            if neighbor == target_page:
+                return path + [neighbor]
+            if neighbor not in visited:
+                if depth + 1 <= max_depth:
+                    visited.add(neighbor)
+                    queue.append((neighbor, path + [neighbor], depth + 1))
+    return []
+
+def legacy_dfs(graph, start_page, target_page, max_depth=10):
+    def dfs_util(current_page, path, depth, visited):
+        if current_page == target_page:
+            return path
+        if depth >= max_depth:
+            return None
+        visited.add(current_page)
+        for neighbor in graph.get(current_page, []):
+            if neighbor not in visited:
+                result = dfs_util(neighbor, path + [neighbor], depth + 1, visited)
+                if result is not None:
+                    return result
+        return None
+
+    result = dfs_util(start_page, [start_page], 0, set())
+    return result if result is not None else []
+
+def legacy_dijkstra(graph, start_page, target_page):
+    priority_queue = [(0, start_page, [start_page])]
+    distances = defaultdict(lambda: float('inf'))
+    distances[start_page] = 0
+    while priority_queue:
+        current_distance, current_node, path = heapq.heappop(priority_queue)
+        if current_node == target_page:
+            return path, current_distance
+        if current_distance > distances[current_node]:
+            continue
+        for neighbor in graph[current_node]:
+            distance = current_distance + 1
+            if distance < distances[neighbor]:
+                distances[neighbor] = distance
+                heapq.heappush(priority_queue, (distance, neighbor, path + [neighbor]))
+    return [], float('inf')
+
+def legacy_a_star_search(graph, start_page, target_page, heuristic):
+    open_set = [(heuristic(start_page, target_page), start_page, [start_page])]
+    g_scores = {node: float('inf') for node in graph}
+    g_scores[start_page] = 0
+    f_scores = {node: float('inf') for node in graph}
+    f_scores[start_page] = heuristic(start_page, target_page)
+    heuristic_cache = {}
+    while open_set:
+        current_f_score, current_node, current_path = heapq.heappop(open_set)
+        if current_node == target_page:
+            return current_path, current_f_score
+        for neighbor in graph[current_node]:
+            tentative_g_score = g_scores[current_node] + 1
+            if tentative_g_score < g_scores[neighbor]:
+                g_scores[neighbor] = tentative_g_score
+                if (neighbor, target_page) not in heuristic_cache:
+                    heuristic_cache[(neighbor, target_page)] = heuristic(neighbor, target_page)
+                f_score = tentative_g_score + heuristic_cache[(neighbor, target_page)]
+                if f_score < f_scores[neighbor]:
+                    f_scores[neighbor] = f_score
+                    heapq.heappush(open_set, (f_score, neighbor, current_path + [neighbor]))
+    return [], float('inf')
+
+def synthetic_graph(nodes, edges, seed=0):
+    """Random directed graph as a dict of int lists, with a path 0 -> 1 -> ... -> nodes - 1 so everything is reachable."""
+    rng = random.Random(seed)
+    graph = {node: [node + 1] if node + 1 < nodes else [] for node in range(nodes)}
+    for _ in range(edges - (nodes - 1)):
+        graph[rng.randrange(nodes)].append(rng.randrange(nodes))
+    return graph
+
+def farthest_node(graph, start):
+    depths = {start: 0}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for neighbor in graph.get(node, []):
+            if neighbor not in depths:
+                depths[neighbor] = depths[node] + 1
+                queue.append(neighbor)
+    return node
+
+def _measure(search):
+    started = time.perf_counter()
+    try:
+        result = search()
+    except RecursionError:
+        return None, time.perf_counter() - started, None
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    search()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def bench_search(args):
+    graph = synthetic_graph(args.nodes, args.edges, args.seed)
+    zero = lambda page, target: 0
+    # The last node is only reachable through the chain, so DFS with no depth limit goes very deep
+    deep_target, deep_limit = args.nodes - 1, args.nodes
+    far_target = farthest_node(graph, 0)
+    cases = [
+        ('bfs', lambda: legacy_bfs(graph, 0, far_target), lambda: search_algorithms.bfs(graph, 0, far_target)),
+        ('dfs', lambda: legacy_dfs(graph, 0, deep_target, deep_limit),
+         lambda: search_algorithms.dfs(graph, 0, deep_target, deep_limit)),
+        ('dijkstra', lambda: legacy_dijkstra(graph, 0, far_target)[0],
+         lambda: search_algorithms.dijkstra(graph, 0, far_target)[0]),
+        ('a_star', lambda: legacy_a_star_search(graph, 0, far_target, zero)[0],
+         lambda: search_algorithms.a_star_search(graph, 0, far_target, zero)[0]),
+    ]
+    print(f"graph: {args.nodes} nodes, {sum(len(links) for links in graph.values())} edges")
+    print(f"{'algorithm':<10}{'legacy time':>14}{'legacy peak':>14}{'new time':>12}{'new peak':>12}{'path':>8}")
+    for name, legacy, current in cases:
+        legacy_path, legacy_time, legacy_peak = _measure(legacy)
+        path, elapsed, peak = _measure(current)
+        if legacy_path is not None and len(legacy_path) != len(path):
+            print(f"{name}: path lengths differ ({len(legacy_path)} vs {len(path)})")
+        legacy_cells = (f"{legacy_time:>13.2f}s{legacy_peak / 2**20:>12.1f}MB" if legacy_path is not None
+                        else f"{'RecursionError':>14}{'-':>14}")
+        print(f"{name:<10}{legacy_cells}{elapsed:>11.2f}s{peak / 2**20:>10.1f}MB{len(path):>8}")
+
+def bench_landmarks(args):
+    graph = synthetic_graph(args.nodes, args.edges, args.seed)
+    sources = np.array([node for node, links in graph.items() for _ in links], dtype=np.int32)
+    destinations = np.array([link for links in graph.values() for link in links], dtype=np.int32)
+    with tempfile.TemporaryDirectory() as directory:
+        write_store(os.path.join(directory, 'graph'), [f"Page {node}" for node in range(args.nodes)], sources, destinations)
+        store = LinkGraph(os.path.join(directory, 'graph'))
+        started = time.perf_counter()
+        landmarks, to_landmarks, from_landmarks = build_landmarks(store, args.landmarks, args.strategy)
+        write_landmarks(os.path.join(directory, 'landmarks'), store, landmarks, to_landmarks, from_landmarks)
+        print(f"graph: {store.node_count} nodes, {store.edge_count} edges; {len(landmarks)} landmarks "
+              f"({args.strategy}) in {time.perf_counter() - started:.2f}s, {to_landmarks.nbytes + from_landmarks.nbytes} bytes")
+        index = LandmarkIndex.load(os.path.join(directory, 'landmarks'), store)
+
+        rng = random.Random(args.seed + 1)  # the graph's own edges were drawn from seed
+        zero = lambda pages, target: [0] * len(pages)
+        totals = defaultdict(float)
+        for _ in range(args.pairs):
+            start, target = f"Page {rng.randrange(args.nodes)}", f"Page {rng.randrange(args.nodes)}"
+            shortest = len(search_algorithms.bfs(store, start, target, max_depth=args.nodes))
+            for name, heuristic in (('none', zero), ('landmarks', index.distance_estimates)):
+                stats = {}
+                started = time.perf_counter()
+                path, _ = search_algorithms.a_star_search(store, start, target, batch_heuristic=heuristic, stats=stats)
+                totals[name, 'time'] += time.perf_counter() - started
+                totals[name, 'expanded'] += stats['expanded']
+                if len(path) != shortest:
+                    print(f"{name}: {start} -> {target} found {len(path)} pages, shortest is {shortest}")
+    print(f"{'heuristic':<12}{'mean expanded':>15}{'mean time':>12}")
+    for name in ('none', 'landmarks'):
+        print(f"{name:<12}{totals[name, 'expanded'] / args.pairs:>15.1f}{totals[name, 'time'] / args.pairs * 1000:>10.1f}ms")
+
+def topical_graph(nodes, topics, mean_links, locality, seed=0):
+    """Titles to link lists where pages belong to `topics` contiguous topics on a ring. A link stays in
+    its page's topic with probability `locality`, otherwise it goes to a neighboring topic half the time
+    and anywhere the other half, so pages of one topic share links as articles on one subject do."""
+    rng = random.Random(seed)
+    size = nodes // topics
+    graph = {}
+    for node in range(nodes):
+        topic = node // size
+        links = []
+        for _ in range(max(1, int(rng.expovariate(1 / mean_links)))):
+            draw = rng.random()
+            if draw < locality:
+                link = topic * size + rng.randrange(size)
+            elif draw < (1 + locality) / 2:
+                link = ((topic + rng.choice((-1, 1))) % topics) * size + rng.randrange(size)
+            else:
+                link = rng.randrange(nodes)
+            links.append(f"Page {link}")
+        graph[f"Page {node}"] = list(dict.fromkeys(links))
+    return graph
+
+def bench_sketches(args):
+    graph = topical_graph(args.nodes, args.topics, args.mean_links, args.locality, args.seed)
+    print(f"graph: {len(graph)} pages, {sum(map(len, graph.values()))} links, {args.topics} topics")
+    with tempfile.TemporaryDirectory() as directory:
+        index = SketchIndex(directory, args.permutations, weight=args.weight)
+        pages = list(graph)
+        started = time.perf_counter()
+        # As a crawl would: pages arrive in batches, and half of each page's links arrive later
+        for first in range(0, len(pages), 500):
+            index.add({page: graph[page][:len(graph[page]) // 2] for page in pages[first:first + 500]})
+        for first in range(0, len(pages), 500):
+            index.add({page: graph[page][len(graph[page]) // 2:] for page in pages[first:first + 500]})
+        print(f"sketched in {time.perf_counter() - started:.2f}s, {len(index) * args.permutations * 4} bytes of signatures")
+
+        rng = random.Random(args.seed + 1)
+        started = time.perf_counter()
+        for _ in range(100):
+            index.distance_estimates(rng.sample(pages, 1000), rng.choice(pages))
+        print(f"scoring: {(time.perf_counter() - started) / 100000 * 1e6:.2f}us per page")
+
+        zero = lambda titles, target: [0] * len(titles)
+        totals = defaultdict(float)
+        for _ in range(args.pairs):
+            start, target = rng.choice(pages), rng.choice(pages)
+            shortest = len(search_algorithms.bfs(graph, start, target, max_depth=len(graph)))
+            if not shortest:
+                continue
+            totals['pairs'] += 1
+            for name, heuristic in (('none', zero), ('sketches', index.distance_estimates)):
+                stats = {}
+                started = time.perf_counter()
+                path, _ = search_algorithms.a_star_search(graph, start, target, batch_heuristic=heuristic, stats=stats)
+                totals[name, 'time'] += time.perf_counter() - started
+                totals[name, 'expanded'] += stats['expanded']
+                totals[name, 'extra'] += len(path) - shortest
+    pairs = totals['pairs']
+    print(f"{'heuristic':<12}{'mean expanded':>15}{'mean time':>12}{'extra links':>13}  ({pairs:.0f} connected pairs)")
+    for name in ('none', 'sketches'):
+        print(f"{name:<12}{totals[name, 'expanded'] / pairs:>15.1f}{totals[name, 'time'] / pairs * 1000:>10.1f}ms"
+              f"{totals[name, 'extra'] / pairs:>13.2f}")
+
+def _run_cli(command):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable] + command, capture_output=True, text=True)
+    return time.perf_counter() - started, result.stdout
+
+def bench_startup(args):
+    graph = synthetic_graph(args.nodes, args.edges, args.seed)
+    sources = np.array([node for node, links in graph.items() for _ in links], dtype=np.int32)
+    destinations = np.array([link for links in graph.values() for link in links], dtype=np.int32)
+    rng = random.Random(args.seed + 1)
+    pairs = [(f"Page {rng.randrange(args.nodes)}", f"Page {rng.randrange(args.nodes)}") for _ in range(args.pairs)]
+    for module in ('search_algorithms', 'crawler'):
+        elapsed, _ = _run_cli(['-c', f"import {module}"])
+        print(f"import {module}: {elapsed * 1000:.0f}ms (interpreter start included)")
+    with tempfile.TemporaryDirectory() as directory:
+        store_path, socket_path = os.path.join(directory, 'graph'), os.path.join(directory, 'daemon.sock')
+        write_store(store_path, [f"Page {node}" for node in range(args.nodes)], sources, destinations)
+        times = defaultdict(list)
+        for start, end in pairs:
+            elapsed, cli_output = _run_cli(['crawler.py', '--graph_store', store_path, '--algorithm', args.algorithm,
+                                            '--start_page', start, '--end_page', end])
+            times['crawler.py'].append(elapsed)
+        started = time.perf_counter()
+        daemon = subprocess.Popen([sys.executable, 'daemon.py', '--graph_store', store_path, '--socket', socket_path,
+                                   '--cache_path', ''], stdout=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.01)
+            print(f"daemon ready in {(time.perf_counter() - started) * 1000:.0f}ms")
+            for start, end in pairs:
+                elapsed, daemon_output = _run_cli(['daemon_client.py', '--socket', socket_path, '--algorithm', args.algorithm,
+                                                   '--start_page', start, '--end_page', end])
+                times['daemon_client.py'].append(elapsed)
+            if cli_output != daemon_output:
+                print(f"outputs differ for {start} -> {end}: {cli_output!r} against {daemon_output!r}")
+        finally:
+            daemon.terminate()
+            daemon.wait()
+    print(f"{'command':<18}{'mean':>10}{'max':>10}")
+    for command, elapsed in times.items():
+        print(f"{command:<18}{sum(elapsed) / len(elapsed) * 1000:>8.0f}ms{max(elapsed) * 1000:>8.0f}ms")
+
+def python_bfs_layers(graph, start, max_depth):
+    """Seconds and frontier size per layer of search_algorithms' id-based BFS loop, run to exhaustion."""
+    parents = array('i', [-1]) * graph.node_count
+    parents[start] = start
+    frontier = [start]
+    layers = []
+    for depth in range(max_depth + 1):
+        if not frontier:
+            break
+        started = time.perf_counter()
+        next_frontier = []
+        for node in frontier:
+            for neighbor in graph.neighbor_ids(node).tolist():
+                if parents[neighbor] < 0:
+                    parents[neighbor] = node
+                    next_frontier.append(neighbor)
+        layers.append((len(frontier), time.perf_counter() - started))
+        frontier = next_frontier
+    return layers
+
+def bench_sparse_bfs(args):
+    rng = np.random.default_rng(args.seed)
+    # Destinations skewed towards low ids make hub pages, so frontiers explode by depth 3 as on Wikipedia
+    sources = rng.integers(0, args.nodes, args.edges).astype(np.int32)
+    destinations = (rng.random(args.edges) ** args.skew * args.nodes).astype(np.int32)
+    with tempfile.TemporaryDirectory() as directory:
+        write_store(directory, [f"Page {node}" for node in range(args.nodes)], sources, destinations)
+        graph = LinkGraph(directory)
+        print(f"graph: {graph.node_count} nodes, {graph.edge_count} edges")
+        start = int(sources[0])
+        # A page nothing links to is never reached, so searching for it traverses everything reachable
+        unlinked = np.flatnonzero(np.diff(graph.in_offsets) == 0)
+        unlinked = unlinked[unlinked != start]
+        if not len(unlinked):
+            print("Every page has incoming links; pass a larger --nodes to time a full traversal")
+            return
+        target = int(unlinked[0])
+        python_layers = python_bfs_layers(graph, start, args.max_depth)
+        engines = {}
+        for direction in ('top-down', 'auto'):
+            stats = {}
+            sparse_bfs(graph, start, target, args.max_depth, direction, stats)
+            engines[direction] = stats['layers']
+        print(f"{'depth':>5}{'frontier':>10}{'python':>10}{'top-down':>10}{'auto':>10}  auto direction")
+        for depth, (frontier, python_seconds) in enumerate(python_layers):
+            top_down, auto = engines['top-down'][depth], engines['auto'][depth]
+            print(f"{depth:>5}{frontier:>10}{python_seconds * 1000:>8.1f}ms{top_down['seconds'] * 1000:>8.1f}ms"
+                  f"{auto['seconds'] * 1000:>8.1f}ms  {auto['direction']}")
+        totals = [sum(seconds for _, seconds in python_layers)] + [sum(layer['seconds'] for layer in engines[direction])
+                                                                    for direction in ('top-down', 'auto')]
+        print(f"{'total':>15}{totals[0] * 1000:>8.1f}ms{totals[1] * 1000:>8.1f}ms{totals[2] * 1000:>8.1f}ms")
+
+        pair_rng = random.Random(args.seed)
+        mismatches = 0
+        for _ in range(args.pairs):
+            start, target = pair_rng.randrange(args.nodes), pair_rng.randrange(args.nodes)
+            if search_algorithms._bfs_ids(graph, start, target, args.max_depth) != sparse_bfs(graph, start, target, args.max_depth):
+                mismatches += 1
+        print(f"{args.pairs} random pairs, paths differing from bfs: {mismatches}")
+
+def bench_batch(args):
+    rng = np.random.default_rng(args.seed)
+    sources = rng.integers(0, args.nodes, args.edges).astype(np.int32)
+    destinations = (rng.random(args.edges) ** args.skew * args.nodes).astype(np.int32)
+    with tempfile.TemporaryDirectory() as directory:
+        write_store(directory, [f"Page {node}" for node in range(args.nodes)], sources, destinations)
+        graph = LinkGraph(directory)
+        reverse_graph = graph.reversed()
+        print(f"graph: {graph.node_count} nodes, {graph.edge_count} edges")
+        # Puzzles share a start; leaderboard pairs share nothing
+        pair_rng = random.Random(args.seed)
+        page = lambda: f"Page {pair_rng.randrange(args.nodes)}"
+        pairs = [(start, page()) for start in [page() for _ in range(args.starts)] for _ in range(args.targets)]
+        pairs += [(page(), page()) for _ in range(args.random_pairs)]
+        print(f"{len(pairs)} pairs: {args.starts} starts with {args.targets} targets each, {args.random_pairs} unrelated")
+
+        rows = []
+        for name, search in (('bfs per pair', lambda start, target: search_algorithms.bfs(graph, start, target)),
+                             ('bidirectional per pair', lambda start, target: search_algorithms.bidirectional_bfs(
+                                 graph, start, target, reverse_graph=reverse_graph))):
+            started = time.perf_counter()
+            lengths = {(start, target): len(search(start, target)) for start, target in pairs}
+            seconds = time.perf_counter() - started
+            rows.append((name, len(pairs), seconds, seconds / len(pairs)))
+
+        searches = 0
+        bfs_many, bidirectional_bfs = search_algorithms.bfs_many, search_algorithms.bidirectional_bfs
+        def counted(search):
+            def run(*search_args):
+                nonlocal searches
+                searches += 1
+                return search(*search_args)
+            return run
+        search_algorithms.bfs_many, search_algorithms.bidirectional_bfs = counted(bfs_many), counted(bidirectional_bfs)
+        try:
+            started = time.perf_counter()
+            first = None
+            mismatches = 0
+            for start, target, path in search_algorithms.batch_bfs(graph, pairs, reverse_graph=reverse_graph):
+                first = first or time.perf_counter() - started
+                mismatches += len(path) != lengths[(start, target)]
+            seconds = time.perf_counter() - started
+        finally:
+            search_algorithms.bfs_many, search_algorithms.bidirectional_bfs = bfs_many, bidirectional_bfs
+        rows.append(('batch_bfs', searches, seconds, first))
+
+        print(f"{'search':<24}{'searches':>10}{'total':>10}{'per pair / first':>18}")
+        for name, searches, seconds, each in rows:
+            print(f"{name:<24}{searches:>10}{seconds:>9.2f}s{each * 1000:>16.1f}ms")
+        print(f"batch paths of a different length than bfs: {mismatches}")
+
+class LegacyFileCache:
+    """The one-JSON-file-per-key cache that KVCache replaced, kept as the baseline for `benchmarks.py cache`."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _get_cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{hashlib.md5(key.encode('utf-8')).hexdigest()}.json")
+
+    def read(self, key):
+        path = self._get_cache_path(key)
+        if os.path.exists(path):
+            with self.lock, open(path, 'r') as file:
+                return json.load(file)
+        return None
+
+    def write(self, key, data):
+        with self.lock, open(self._get_cache_path(key), 'w') as file:
+            json.dump(data, file)
+
+def bench_cache(args):
+    rng = random.Random(args.seed)
+    entries = {f"links:Article {i}": [f"Article {rng.randrange(args.entries)}" for _ in range(args.links)]
+               for i in range(args.entries)}
+    keys = list(entries)
+    lookups = [rng.choice(keys) for _ in range(args.entries)]
+
+    def timed(operation):
+        started = time.perf_counter()
+        operation()
+        return len(keys) / (time.perf_counter() - started)
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = LegacyFileCache(os.path.join(directory, 'files'))
+        kv = KVCache(os.path.join(directory, 'cache.db'), memory_limit=args.memory_mb * 2**20)
+        cold = KVCache(os.path.join(directory, 'cache.db'), memory_limit=0)
+        rows = [
+            ('FileCache write', timed(lambda: [legacy.write(key, entries[key]) for key in keys])),
+            ('FileCache read', timed(lambda: [legacy.read(key) for key in lookups])),
+            ('KVCache put', timed(lambda: [kv.put(key, entries[key]) for key in keys])),
+            ('KVCache put_many', timed(lambda: kv.put_many(entries))),
+            ('KVCache get (memory tier)', timed(lambda: [kv.get(key) for key in lookups])),
+            ('KVCache get (SQLite only)', timed(lambda: [cold.get(key) for key in lookups])),
+            ('KVCache get_many (SQLite only)', timed(lambda: cold.get_many(lookups))),
+        ]
+        files = len(os.listdir(os.path.join(directory, 'files')))
+        db_size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+                      if name.startswith('cache.db'))
+    print(f"{args.entries} entries of {args.links} links each")
+    for name, rate in rows:
+        print(f"{name:<32}{rate:>12,.0f} ops/s")
+    print(f"FileCache: {files} files; KVCache: 1 database ({db_size / 2**20:.1f}MB including WAL)")
+
+def legacy_parse_links(html_content, base_url="https://en.wikipedia.org"):
+    """utils.parse_links before the streaming extractor, kept as the baseline for `benchmarks.py parse`."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    links = set()
+    for a in soup.find_all('a', href=True):
+        href = a['href']
+        if href.startswith('/wiki/') and ':' not in href:
+            links.add(urljoin(base_url, href))
+    return list(links)
+
+def load_html_corpus(args):
+    if args.corpus:
+        corpus = []
+        for name in sorted(os.listdir(args.corpus)):
+            if name.endswith('.html'):
+                with open(os.path.join(args.corpus, name), 'r', encoding='utf-8') as file:
+                    corpus.append(file.read())
+        return corpus
+    wiki = SyntheticWiki(args.pages, mean_links=args.mean_links, seed=args.seed)
+    return [wiki.render_html(title, paragraphs=args.paragraphs) for title in wiki.titles]
+
+def bench_parse(args):
+    corpus = load_html_corpus(args)
+    megabytes = sum(len(html) for html in corpus) / 2**20
+    print(f"corpus: {len(corpus)} pages, {megabytes:.1f}MB")
+    results = {}
+    for name, parse in [('BeautifulSoup', legacy_parse_links), ('streaming', parse_links)]:
+        started = time.perf_counter()
+        results[name] = [parse(html) for html in corpus]
+        elapsed = time.perf_counter() - started
+        links = sum(len(page_links) for page_links in results[name])
+        print(f"{name:<14}{len(corpus) / elapsed:>10.1f} pages/s{megabytes / elapsed:>10.1f} MB/s{links:>10} links")
+    extra = sum(len(set(old) - set(new)) for old, new in zip(results['BeautifulSoup'], results['streaming']))
+    print(f"links outside the article body no longer collected: {extra}")
+
+async def _max_loop_lag(interval, stop):
+    """Largest delay of a timer that should fire every `interval` seconds, until `stop` is set."""
+    lag = 0.0
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lag = max(lag, time.perf_counter() - expected)
+    return lag
+
+async def bench_parse_pipeline(args):
+    wiki = SyntheticWiki(args.pages, mean_links=args.mean_links, seed=args.seed)
+    runner, base_url = await start_stub(wiki, latency=args.latency, paragraphs=args.paragraphs)
+    titles = wiki.titles[:args.titles]
+    expected = {title: parse_link_titles(wiki.render_html(title, args.paragraphs), base_url) for title in titles}
+    print(f"{len(titles)} pages of ~{len(wiki.render_html(titles[0], args.paragraphs)) / 1024:.0f}KB, "
+          f"{os.cpu_count()} cores")
+    try:
+        async with AsyncHTTPClient(rate_limit=None, max_parallel_requests=args.concurrency,
+                                   max_connections_per_host=args.concurrency) as client:
+            for processes in args.processes or range(os.cpu_count() + 1):
+                with ProcessPoolExecutor(processes) if processes else nullcontext() as pool:
+                    source = HTMLLinkSource(client, base_url, parse_pool=pool, parse_workers=processes or None)
+                    if pool is not None:
+                        await source.forward(titles[:processes])  # start the workers before timing
+                    stop = asyncio.Event()
+                    ticker = asyncio.ensure_future(_max_loop_lag(0.01, stop))
+                    started = time.perf_counter()
+                    links = await source.forward(titles)
+                    elapsed = time.perf_counter() - started
+                    stop.set()
+                    lag = await ticker
+                assert links == expected, f"Links differ with {processes} parse processes"
+                label = f"{processes} processes" if processes else "event loop"
+                print(f"{label:<14}{len(titles) / elapsed:>10.1f} pages/s{lag * 1000:>10.1f}ms max loop lag")
+    finally:
+        await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks against a synthetic Wikipedia')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    network = subparsers.add_parser('network', help='AsyncHTTPClient throughput and request rate')
+    network.add_argument('--pages', type=int, default=2000)
+    network.add_argument('--requests', type=int, default=500)
+    network.add_argument('--latency', type=float, default=0.05)
+    network.add_argument('--concurrency', type=int, default=20)
+    network.add_argument('--rate_limit', type=float, default=100)
+    network.add_argument('--burst', type=int, default=20)
+    network.add_argument('--server_rate_limit', type=int, default=None)
+    network.set_defaults(run=lambda args: asyncio.run(bench_network(args)))
+
+    extracts = subparsers.add_parser('extracts', help='Batched extract fetching against the stub MediaWiki API')
+    extracts.add_argument('--pages', type=int, default=2000)
+    extracts.add_argument('--titles', type=int, default=500)
+    extracts.add_argument('--latency', type=float, default=0.05)
+    extracts.set_defaults(run=lambda args: asyncio.run(bench_extracts(args)))
+
+    link_sources = subparsers.add_parser('link-sources', help='HTML against MediaWiki API link sources on the stub')
+    link_sources.add_argument('--pages', type=int, default=5000)
+    link_sources.add_argument('--max_depth', type=int, default=2)
+    link_sources.add_argument('--max_pages', type=int, default=500)
+    link_sources.add_argument('--concurrency', type=int, default=20)
+    link_sources.add_argument('--latency', type=float, default=0.02)
+    link_sources.add_argument('--backward_titles', type=int, default=120)
+    link_sources.add_argument('--seed', type=int, default=0)
+    link_sources.set_defaults(run=lambda args: asyncio.run(bench_link_sources(args)))
+
+    crawl_store = subparsers.add_parser('crawl-store', help='Crawls reusing, revalidating and resuming from a crawl store')
+    crawl_store.add_argument('--pages', type=int, default=5000)
+    crawl_store.add_argument('--max_depth', type=int, default=3)
+    crawl_store.add_argument('--max_pages', type=int, default=2000)
+    crawl_store.add_argument('--concurrency', type=int, default=20)
+    crawl_store.add_argument('--latency', type=float, default=0.02)
+    crawl_store.add_argument('--link_source', choices=['html', 'api'], default='api')
+    crawl_store.add_argument('--edits', type=int, default=25)
+    crawl_store.add_argument('--seed', type=int, default=0)
+    crawl_store.set_defaults(run=lambda args: asyncio.run(bench_crawl_store(args)))
+
+    canonical = subparsers.add_parser('canonical', help='Crawled pages and requests with and without redirect resolution')
+    canonical.add_argument('--pages', type=int, default=5000)
+    canonical.add_argument('--redirects', type=int, default=200)
+    canonical.add_argument('--max_depth', type=int, default=2)
+    canonical.add_argument('--max_pages', type=int, default=3000)
+    canonical.add_argument('--concurrency', type=int, default=20)
+    canonical.add_argument('--latency', type=float, default=0.01)
+    canonical.add_argument('--seed', type=int, default=0)
+    canonical.set_defaults(run=lambda args: asyncio.run(bench_canonical(args)))
+
+    online = subparsers.add_parser('online', help='Online best-first search against crawling first and then searching')
+    online.add_argument('--pages', type=int, default=5000)
+    online.add_argument('--pairs', type=int, default=20)
+    online.add_argument('--max_depth', type=int, default=3)
+    online.add_argument('--max_pages', type=int, default=2000)
+    online.add_argument('--concurrency', type=int, default=20)
+    online.add_argument('--latency', type=float, default=0.02)
+    online.add_argument('--link_source', choices=['html', 'api'], default='api')
+    online.add_argument('--seed', type=int, default=0)
+    online.set_defaults(run=lambda args: asyncio.run(bench_online(args)))
+
+    bounded = subparsers.add_parser('bounded-crawl', help='Memory of the dict crawl against the memory-bounded crawl on generated links')
+    bounded.add_argument('--pages', type=int, default=200000, help='Articles in the generated wiki')
+    bounded.add_argument('--max_pages', type=int, default=200000)
+    bounded.add_argument('--max_depth', type=int, default=20)
+    bounded.add_argument('--max_links_per_page', type=int, default=20)
+    bounded.add_argument('--memory_budget', type=int, default=64, help='MB')
+    bounded.add_argument('--no_bloom', action='store_true', help='Look every title up in the title table')
+    bounded.add_argument('--modes', nargs='+', choices=['dict', 'bounded'], default=['dict', 'bounded'])
+    bounded.add_argument('--seed', type=int, default=0)
+    bounded.set_defaults(run=lambda args: asyncio.run(bench_bounded_crawl(args)))
+
+    scheduler = subparsers.add_parser('scheduler', help='Priority order, hedged requests and cancellation in the fetch scheduler')
+    scheduler.add_argument('--pages', type=int, default=2000)
+    scheduler.add_argument('--requests', type=int, default=400)
+    scheduler.add_argument('--concurrency', type=int, default=10)
+    scheduler.add_argument('--rate_limit', type=float, default=100)
+    scheduler.add_argument('--latency', type=float, default=0.01)
+    scheduler.add_argument('--slow_fraction', type=float, default=0.03)
+    scheduler.add_argument('--slow_latency', type=float, default=0.5)
+    scheduler.add_argument('--max_pages', type=int, default=300)
+    scheduler.add_argument('--seed', type=int, default=0)
+    scheduler.set_defaults(run=lambda args: asyncio.run(bench_scheduler(args)))
+
+    cache = subparsers.add_parser('cache', help='KVCache against the one-file-per-key FileCache')
+    cache.add_argument('--entries', type=int, default=20000)
+    cache.add_argument('--links', type=int, default=50)
+    cache.add_argument('--memory_mb', type=int, default=64)
+    cache.add_argument('--seed', type=int, default=0)
+    cache.set_defaults(run=bench_cache)
+
+    parse = subparsers.add_parser('parse', help='Streaming link extraction against the BeautifulSoup parser')
+    parse.add_argument('--corpus', default=None, help='Directory of saved article .html files; synthetic pages if omitted')
+    parse.add_argument('--pages', type=int, default=300)
+    parse.add_argument('--mean_links', type=int, default=300)
+    parse.add_argument('--paragraphs', type=int, default=400)
+    parse.add_argument('--seed', type=int, default=0)
+    parse.set_defaults(run=bench_parse)
+
+    parse_pipeline = subparsers.add_parser('parse-pipeline', help='HTML crawl throughput and event loop lag by parse process count')
+    parse_pipeline.add_argument('--pages', type=int, default=2000)
+    parse_pipeline.add_argument('--titles', type=int, default=400)
+    parse_pipeline.add_argument('--mean_links', type=int, default=300)
+    parse_pipeline.add_argument('--paragraphs', type=int, default=200)
+    parse_pipeline.add_argument('--latency', type=float, default=0.01)
+    parse_pipeline.add_argument('--concurrency', type=int, default=32)
+    parse_pipeline.add_argument('--processes', type=int, nargs='*', default=None,
+                                help='Parse process counts to compare; 0 parses in the event loop (default: 0 to one per core)')
+    parse_pipeline.add_argument('--seed', type=int, default=0)
+    parse_pipeline.set_defaults(run=lambda args: asyncio.run(bench_parse_pipeline(args)))
+
+    search = subparsers.add_parser('search', help='Parent-pointer search core against the path-carrying implementations')
+    search.add_argument('--nodes', type=int, default=100000)
+    search.add_argument('--edges', type=int, default=1000000)
+    search.add_argument('--seed', type=int, default=0)
+    search.set_defaults(run=bench_search)
+
+    landmarks = subparsers.add_parser('landmarks', help='A* expansions with and without the landmark heuristic')
+    landmarks.add_argument('--nodes', type=int, default=20000)
+    landmarks.add_argument('--edges', type=int, default=100000)
+    landmarks.add_argument('--landmarks', type=int, default=16)
+    landmarks.add_argument('--strategy', choices=['degree', 'farthest'], default='farthest')
+    landmarks.add_argument('--pairs', type=int, default=50)
+    landmarks.add_argument('--seed', type=int, default=0)
+    landmarks.set_defaults(run=bench_landmarks)
+
+    sketches = subparsers.add_parser('sketches', help='A* expansions with and without the MinHash link-similarity heuristic')
+    sketches.add_argument('--nodes', type=int, default=50000)
+    sketches.add_argument('--topics', type=int, default=500)
+    sketches.add_argument('--mean_links', type=float, default=20)
+    sketches.add_argument('--locality', type=float, default=0.8, help='Share of links staying in their page\'s topic')
+    sketches.add_argument('--permutations', type=int, default=64)
+    sketches.add_argument('--weight', type=float, default=4.0, help='Estimated hops for a page sharing no links with the target')
+    sketches.add_argument('--pairs', type=int, default=50)
+    sketches.add_argument('--seed', type=int, default=0)
+    sketches.set_defaults(run=bench_sketches)
+
+    startup = subparsers.add_parser('startup', help='Per-invocation cost of crawler.py against daemon_client.py over a warm daemon')
+    startup.add_argument('--nodes', type=int, default=20000)
+    startup.add_argument('--edges', type=int, default=100000)
+    startup.add_argument('--algorithm', choices=['bfs', 'bidirectional', 'dfs', 'dijkstra'], default='bidirectional')
+    startup.add_argument('--pairs', type=int, default=10)
+    startup.add_argument('--seed', type=int, default=0)
+    startup.set_defaults(run=bench_startup)
+
+    sparse = subparsers.add_parser('sparse-bfs', help='Per-layer time of the Python BFS loop against the vectorized direction-optimizing BFS')
+    sparse.add_argument('--nodes', type=int, default=1000000)
+    sparse.add_argument('--edges', type=int, default=10000000)
+    sparse.add_argument('--skew', type=float, default=3.0, help='Exponent skewing link targets towards hub pages')
+    sparse.add_argument('--max_depth', type=int, default=10)
+    sparse.add_argument('--pairs', type=int, default=20, help='Random pairs whose paths are compared with bfs')
+    sparse.add_argument('--seed', type=int, default=0)
+    sparse.set_defaults(run=bench_sparse_bfs)
+
+    batch = subparsers.add_parser('batch', help='Many pairs answered by shared BFS trees against one search per pair')
+    batch.add_argument('--nodes', type=int, default=200000)
+    batch.add_argument('--edges', type=int, default=2000000)
+    batch.add_argument('--skew', type=float, default=3.0, help='Exponent skewing link targets towards hub pages')
+    batch.add_argument('--starts', type=int, default=4, help='Starts shared by many targets, as in puzzle generation')
+    batch.add_argument('--targets', type=int, default=100, help='Targets per shared start')
+    batch.add_argument('--random_pairs', type=int, default=50, help='Pairs sharing no page, as in leaderboard validation')
+    batch.add_argument('--seed', type=int, default=0)
+    batch.set_defaults(run=bench_batch)
+
+    replay = subparsers.add_parser('replay', help='Replay performance_logs.csv pairs against the stub and check for regressions')
+    replay.add_argument('--log', default=os.path.join('logs', 'performance_logs.csv'), help='Performance log to take pairs from')
+    replay.add_argument('--graph_store', default=None, help='Serve this graph store instead of a generated graph')
+    replay.add_argument('--pages', type=int, default=5000)
+    replay.add_argument('--mean_links', type=int, default=25)
+    replay.add_argument('--latency', type=float, default=0.02)
+    replay.add_argument('--jitter', type=float, default=0.01)
+    replay.add_argument('--modes', nargs='+', choices=REPLAY_MODES, default=list(REPLAY_MODES))
+    replay.add_argument('--runs', type=int, default=2, help='Replays of every pair')
+    replay.add_argument('--max_depth', type=int, default=6)
+    replay.add_argument('--max_pages', type=int, default=5000)
+    replay.add_argument('--max_links_per_page', type=int, default=10**6,
+                        help='Links followed per page; a cap lets crawls miss the logged targets')
+    replay.add_argument('--concurrency', type=int, default=20)
+    replay.add_argument('--link_source', choices=['html', 'api'], default='api')
+    replay.add_argument('--algorithm', default='bfs')
+    replay.add_argument('--out_dir', default=os.path.join('logs', 'replay'))
+    replay.add_argument('--baseline', default=os.path.join('logs', 'replay_baseline.json'))
+    replay.add_argument('--tolerance', type=float, default=0.25, help='Allowed fractional regression')
+    replay.add_argument('--update_baseline', action='store_true')
+    replay.add_argument('--seed', type=int, default=0)
+    replay.set_defaults(run=bench_replay)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+import json
+import math
+import os
+import sqlite3
+from array import array
+from itertools import islice
+import numpy as np
+from graph_store import STORE_VERSION
+
+# Constants
+BLOOM_BITS_PER_TITLE = 10  # about a 1% false positive rate at capacity
+SQLITE_BATCH_SIZE = 500  # stays under SQLite's bound-parameter limit
+EDGE_CHUNK = 1 << 16  # links handled at a time when writing the graph store
+TITLES_TABLE = 'titles.db'
+PAGES_FILE, COUNTS_FILE, LINKS_FILE = 'pages.i32', 'counts.i32', 'links.i32'
+
+class BloomFilter:
+    """Set membership in a fixed bit array: no false negatives, and false positives at a rate set by its size.
+
+    Keys are hashed with Python's own string hash, so a filter is only valid within one process.
+    """
+
+    def __init__(self, capacity, bits_per_key=BLOOM_BITS_PER_TITLE, max_bytes=None):
+        bits = max(64, int(capacity * bits_per_key))
+        if max_bytes:
+            bits = min(bits, max(64, max_bytes * 8))
+        self.size = bits
+        self.hashes = max(1, round(bits / max(capacity, 1) * math.log(2)))
+        self.bits = np.zeros((bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, keys):
+        hashes = np.fromiter((hash(key) for key in keys), dtype=np.int64, count=len(keys)).view(np.uint64)
+        # Double hashing: position i of a key is h1 + i * h2, with h2 odd so the probes never repeat early
+        step = (hashes * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(17) | np.uint64(1)
+        probes = hashes[:, None] + np.arange(self.hashes, dtype=np.uint64)[None, :] * step[:, None]
+        return (probes % np.uint64(self.size)).astype(np.int64)
+
+    def add_many(self, keys):
+        if keys:
+            positions = self._positions(keys).ravel()
+            np.bitwise_or.at(self.bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+
+    def contains_many(self, keys):
+        """A bool per key: False means the key was never added, True that it probably was."""
+        if not keys:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(keys)
+        return ((self.bits[positions >> 3] >> (positions & 7)) & 1).all(axis=1)
+
+class IdBitmap:
+    """A set of small non-negative integers, one bit each, growing as larger ids are added."""
+
+    def __init__(self, capacity=1 << 16):
+        self.bits = bytearray((capacity + 7) // 8)
+        self.count = 0
+
+    def __contains__(self, node):
+        byte = node >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] >> (node & 7) & 1)
+
+    def add(self, node):
+        """Adds `node`; returns False if it was already present."""
+        byte = node >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(max(byte + 1, 2 * len(self.bits)) - len(self.bits)))
+        mask = 1 << (node & 7)
+        if self.bits[byte] & mask:
+            return False
+        self.bits[byte] |= mask
+        self.count += 1
+        return True
+
+    def __len__(self):
+        return self.count
+
+class TitleIds:
+    """Interns titles as dense integer ids, in an SQLite table rather than a dict, so memory stays flat.
+
+    A Bloom filter of the interned titles answers most lookups for titles never seen before without
+    touching the table; titles it reports as possibly seen are looked up exactly, so ids stay correct.
+    """
+
+    def __init__(self, path, bloom=None, cache_bytes=64 * 2**20):
+        self.path = path
+        self.bloom = bloom
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute(f"PRAGMA cache_size=-{max(1, cache_bytes // 1024)}")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS titles (id INTEGER PRIMARY KEY, title TEXT NOT NULL UNIQUE)")
+        self.count = self.connection.execute("SELECT COUNT(*) FROM titles").fetchone()[0]
+        self.lookups = self.skipped_lookups = 0
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.connection.close()
+
+    def intern(self, titles):
+        """Returns [id] for `titles`, giving titles seen for the first time the next free ids."""
+        unique = list(dict.fromkeys(titles))
+        ids = {}
+        maybe_known = unique
+        if self.bloom is not None:
+            seen = self.bloom.contains_many(unique)
+            maybe_known = [title for title, known in zip(unique, seen) if known]
+            self.skipped_lookups += len(unique) - len(maybe_known)
+        self.lookups += len(maybe_known)
+        for i in range(0, len(maybe_known), SQLITE_BATCH_SIZE):
+            batch = maybe_known[i:i + SQLITE_BATCH_SIZE]
+            rows = self.connection.execute(
+                f"SELECT title, id FROM titles WHERE title IN ({','.join('?' * len(batch))})", batch)
+            ids.update(rows)
+        new_titles = [title for title in unique if title not in ids]
+        if new_titles:
+            new_ids = range(self.count, self.count + len(new_titles))
+            self.connection.execute("BEGIN")
+            self.connection.executemany("INSERT INTO titles (id, title) VALUES (?, ?)", zip(new_ids, new_titles))
+            self.connection.execute("COMMIT")
+            ids.update(zip(new_titles, new_ids))
+            self.count += len(new_titles)
+            if self.bloom is not None:
+                self.bloom.add_many(new_titles)
+        return [ids[title] for title in titles]
+
+    def titles(self, ids):
+        """Returns {id: title} for interned ids."""
+        ids = list(ids)
+        found = {}
+        for i in range(0, len(ids), SQLITE_BATCH_SIZE):
+            batch = ids[i:i + SQLITE_BATCH_SIZE]
+            found.update(self.connection.execute(
+                f"SELECT id, title FROM titles WHERE id IN ({','.join('?' * len(batch))})", batch))
+        return found
+
+    def iter_titles(self):
+        """Every title in id order."""
+        return (title for title, in self.connection.execute("SELECT title FROM titles ORDER BY id"))
+
+    def iter_sorted_ids(self):
+        """Every id in order of its title's UTF-8 bytes, the order of a graph store's title index."""
+        return (node for node, in self.connection.execute("SELECT id FROM titles ORDER BY title"))
+
+class SpillingFrontier:
+    """One BFS level of ids, held in memory up to `max_items` and spilled beyond that to segment files.
+
+    Iterating yields the ids in the order they were appended, segments first, then removes the
+    segments. A `max_pages` cut therefore falls on the pages discovered last, as in build_graph_concurrent.
+    """
+
+    def __init__(self, directory, max_items):
+        self.directory = directory
+        self.max_items = max(1, max_items)
+        self.buffer = array('q')
+        self.segments = []
+        self.length = 0
+        self.spills = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, node):
+        self.buffer.append(node)
+        self.length += 1
+        if len(self.buffer) >= self.max_items:
+            self._spill()
+
+    def _spill(self):
+        path = os.path.join(self.directory, f"frontier-{id(self)}-{len(self.segments)}.npy")
+        np.save(path, np.frombuffer(self.buffer, dtype=np.int64))
+        self.segments.append(path)
+        self.buffer = array('q')
+        self.spills += 1
+
+    def __iter__(self):
+        try:
+            for path in self.segments:
+                segment = np.load(path, mmap_mode='r')
+                for i in range(0, len(segment), EDGE_CHUNK):
+                    yield from segment[i:i + EDGE_CHUNK].tolist()
+                del segment
+            yield from self.buffer
+        finally:
+            for path in self.segments:
+                os.remove(path)
+            self.segments, self.buffer, self.length = [], array('q'), 0
+
+class CrawlEdges:
+    """The links of expanded pages, appended to flat int32 files as each page is crawled."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = [open(os.path.join(directory, name), 'ab') for name in (PAGES_FILE, COUNTS_FILE, LINKS_FILE)]
+        self.pages = 0
+        self.links = 0
+
+    def add(self, page, links):
+        pages_file, counts_file, links_file = self.files
+        array('i', [page]).tofile(pages_file)
+        array('i', [len(links)]).tofile(counts_file)
+        array('i', links).tofile(links_file)
+        self.pages += 1
+        self.links += len(links)
+
+    def close(self):
+        for file in self.files:
+            file.close()
+
+    def load(self, name):
+        path = os.path.join(self.directory, name)
+        return np.memmap(path, dtype=np.int32, mode='r') if os.path.getsize(path) else np.zeros(0, dtype=np.int32)
+
+def _open_array(path, length, dtype=np.int32):
+    """A writable .npy memmap of `length` zeros (a plain array when empty, which cannot be mapped)."""
+    if not length:
+        np.save(path, np.zeros(0, dtype=dtype))
+        return np.load(path)
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(length,))
+
+def _cumsum_in_place(values):
+    total = 0
+    for i in range(0, len(values), EDGE_CHUNK):
+        chunk = np.cumsum(values[i:i + EDGE_CHUNK]) + total
+        values[i:i + EDGE_CHUNK] = chunk
+        total = int(chunk[-1])
+
+def write_crawled_store(out_dir, title_ids, edges):
+    """Writes a graph store (see graph_store.py) from a crawl's title table and edge files.
+
+    Every array is built in place in its memory-mapped output file, EDGE_CHUNK links or pages at a
+    time, so the whole edge list is never held in memory.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    edges.close()
+    node_count = len(title_ids)
+    pages, counts, links = edges.load(PAGES_FILE), edges.load(COUNTS_FILE), edges.load(LINKS_FILE)
+    output = lambda name: os.path.join(out_dir, name)
+
+    offsets = _open_array(output('offsets.npy'), node_count + 1, np.int64)
+    for i in range(0, len(pages), EDGE_CHUNK):
+        offsets[pages[i:i + EDGE_CHUNK].astype(np.int64) + 1] = counts[i:i + EDGE_CHUNK]
+    _cumsum_in_place(offsets)
+    # Each page's links were appended together; move every run to its row of the CSR array
+    adjacency = _open_array(output('adjacency.npy'), len(links))
+    record_start = 0
+    for i in range(0, len(pages), EDGE_CHUNK // 16):
+        chunk_pages, chunk_counts = pages[i:i + EDGE_CHUNK // 16], counts[i:i + EDGE_CHUNK // 16].astype(np.int64)
+        chunk_links = int(chunk_counts.sum())
+        run_starts = np.cumsum(chunk_counts) - chunk_counts
+        positions = np.repeat(offsets[chunk_pages] - run_starts, chunk_counts) + np.arange(chunk_links)
+        adjacency[positions] = links[record_start:record_start + chunk_links]
+        record_start += chunk_links
+
+    # Incoming links: count them, then place each chunk of rows, keeping every in-row sorted by source
+    in_offsets = _open_array(output('in_offsets.npy'), node_count + 1, np.int64)
+    for i in range(0, len(adjacency), EDGE_CHUNK):
+        np.add.at(in_offsets, adjacency[i:i + EDGE_CHUNK].astype(np.int64) + 1, 1)
+    _cumsum_in_place(in_offsets)
+    in_adjacency = _open_array(output('in_adjacency.npy'), len(adjacency))
+    # in_offsets[node] serves as the next free slot of the node's row, and ends up one row ahead
+    for i in range(0, len(adjacency), EDGE_CHUNK):
+        destinations = np.asarray(adjacency[i:i + EDGE_CHUNK])
+        end = i + len(destinations)
+        first_row = int(np.searchsorted(offsets, i, side='right')) - 1
+        last_row = int(np.searchsorted(offsets, end - 1, side='right')) - 1
+        sources = np.repeat(np.arange(first_row, last_row + 1, dtype=np.int32),
+                            np.diff(np.clip(offsets[first_row:last_row + 2], i, end)))
+        order = np.argsort(destinations, kind='stable')
+        destinations, sources = destinations[order], sources[order]
+        positions = np.arange(len(destinations))
+        run_starts = np.maximum.accumulate(np.where(np.r_[True, destinations[1:] != destinations[:-1]], positions, 0))
+        in_adjacency[in_offsets[destinations] + positions - run_starts] = sources
+        np.add.at(in_offsets, destinations, 1)
+    for i in range(node_count, 0, -EDGE_CHUNK):
+        start = max(0, i - EDGE_CHUNK)
+        in_offsets[start + 1:i + 1] = in_offsets[start:i].copy()
+    in_offsets[0] = 0
+
+    title_offsets = _open_array(output('title_offsets.npy'), node_count + 1, np.int64)
+    with open(output('titles.bin'), 'wb') as file:
+        position = 0
+        for node, title in enumerate(title_ids.iter_titles(), 1):
+            encoded = title.encode('utf-8')
+            file.write(encoded)
+            position += len(encoded)
+            title_offsets[node] = position
+    title_index = _open_array(output('title_index.npy'), node_count)
+    sorted_ids = title_ids.iter_sorted_ids()
+    for i in range(0, node_count, EDGE_CHUNK):
+        title_index[i:i + EDGE_CHUNK] = np.fromiter(islice(sorted_ids, EDGE_CHUNK), dtype=np.int32)
+    for array_file in (offsets, adjacency, in_offsets, in_adjacency, title_offsets, title_index):
+        if isinstance(array_file, np.memmap):
+            array_file.flush()
+    with open(output('meta.json'), 'w') as file:
+        json.dump({'version': STORE_VERSION, 'nodes': node_count, 'edges': len(links)}, file)
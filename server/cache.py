@@ -1,58 +1,220 @@
 import os
 import json
-import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
 from threading import Lock
+from metrics import CACHE_REQUESTS, CACHE_SECONDS
 
-class FileCache:
-    def __init__(self, cache_dir="cache"):
-        self.cache_dir = cache_dir
+# Constants
+DEFAULT_CACHE_PATH = os.path.join("cache", "cache.db")
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024  # JSON-encoded bytes of the decoded values kept in memory
+COMPRESSION_LEVEL = 3
+SQLITE_BATCH_SIZE = 500  # stays under SQLite's bound-parameter limit
+
+class KVCache:
+    """Key-value cache in a single SQLite file (WAL mode) with an in-memory LRU tier in front of it.
+
+    Values are JSON-serializable and stored zlib-compressed. Entries may carry a time-to-live. The
+    memory tier keeps decoded values, sized by their uncompressed JSON encoding rather than the much
+    smaller compressed blob, and evicts least recently used entries once that exceeds `memory_limit`.
+    Values returned from the memory tier are shared, so callers must not mutate them.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=None, memory_limit=DEFAULT_MEMORY_LIMIT):
+        self.path = path
+        self.ttl = ttl
+        self.memory_limit = memory_limit
+        self.memory = OrderedDict()  # key -> (value, size, expires_at)
+        self.memory_size = 0
         self.lock = Lock()
+        self.local = threading.local()
+        self.connections = []  # every thread's connection, so close() can reach them
+        directory = os.path.dirname(path)
         try:
-            os.makedirs(cache_dir, exist_ok=True)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
         except Exception as e:
-            print(f"Error creating cache directory {cache_dir}: {e}")
+            print(f"Error creating cache directory {directory}: {e}")
+        self._connection()
+
+    def _connection(self):
+        """One connection per thread; WAL lets readers proceed while another thread or process writes."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)")
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def close(self):
+        """Closes every thread's SQLite connection; a later call opens a new one for its thread."""
+        with self.lock:
+            connections, self.connections = self.connections, []
+            self.local = threading.local()
+        for connection in connections:
+            connection.close()
+
+    def _expires_at(self, ttl):
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() + ttl if ttl else None
+
+    def _remember(self, key, value, size, expires_at):
+        if size > self.memory_limit:
+            return
+        with self.lock:
+            previous = self.memory.pop(key, None)
+            if previous is not None:
+                self.memory_size -= previous[1]
+            self.memory[key] = (value, size, expires_at)
+            self.memory_size += size
+            while self.memory_size > self.memory_limit:
+                _, (_, evicted_size, _) = self.memory.popitem(last=False)
+                self.memory_size -= evicted_size
 
-    def _get_cache_path(self, key):
-        """Creates a file path safe from the key using MD5 hash."""
-        hash_key = hashlib.md5(key.encode('utf-8')).hexdigest()
-        return os.path.join(self.cache_dir, f"{hash_key}.json")
+    def _recall(self, key, now):
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is None:
+                return None
+            if entry[2] is not None and entry[2] <= now:
+                del self.memory[key]
+                self.memory_size -= entry[1]
+                return None
+            self.memory.move_to_end(key)
+            return entry
+
+    def get_many(self, keys):
+        """Returns {key: value} for the keys that are cached and unexpired."""
+        with CACHE_SECONDS.time(operation='get'):
+            return self._get_many(keys)
+
+    def _get_many(self, keys):
+        now = time.time()
+        found, missing = {}, []
+        for key in dict.fromkeys(keys):
+            entry = self._recall(key, now)
+            if entry is not None:
+                found[key] = entry[0]
+            else:
+                missing.append(key)
+        memory_hits = len(found)
+        connection = self._connection()
+        for i in range(0, len(missing), SQLITE_BATCH_SIZE):
+            batch = missing[i:i + SQLITE_BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            rows = connection.execute(
+                f"SELECT key, value, expires_at FROM kv WHERE key IN ({placeholders}) AND (expires_at IS NULL OR expires_at > ?)",
+                (*batch, now),
+            ).fetchall()
+            for key, blob, expires_at in rows:
+                try:
+                    encoded = zlib.decompress(blob)
+                    value = json.loads(encoded)
+                except (zlib.error, ValueError) as e:
+                    print(f"Error decoding cached value for key {key}: {e}")
+                    continue
+                found[key] = value
+                self._remember(key, value, len(encoded), expires_at)
+        disk_hits = len(found) - memory_hits
+        CACHE_REQUESTS.inc(memory_hits, tier='memory', result='hit')
+        CACHE_REQUESTS.inc(disk_hits, tier='sqlite', result='hit')
+        CACHE_REQUESTS.inc(len(missing) - disk_hits, tier='sqlite', result='miss')
+        return found
+
+    def put_many(self, items, ttl=None):
+        """Stores every (key, value) of `items` in one transaction."""
+        with CACHE_SECONDS.time(operation='put'):
+            self._put_many(items, ttl)
+
+    def _put_many(self, items, ttl):
+        expires_at = self._expires_at(ttl)
+        rows = []
+        for key, value in items.items():
+            encoded = json.dumps(value).encode('utf-8')
+            rows.append((key, zlib.compress(encoded, COMPRESSION_LEVEL), expires_at))
+            self._remember(key, value, len(encoded), expires_at)
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", rows)
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def put(self, key, value, ttl=None):
+        self.put_many({key: value}, ttl)
 
     def exists(self, key):
-        """Checks if the cached file exists for the given key."""
-        try:
-            return os.path.exists(self._get_cache_path(key))
-        except Exception as e:
-            print(f"Error checking existence of cache file for key {key}: {e}")
-            return False
+        return key in self.get_many([key])
+
+    def delete(self, key):
+        with self.lock:
+            entry = self.memory.pop(key, None)
+            if entry is not None:
+                self.memory_size -= entry[1]
+        self._connection().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def keys(self, prefix=''):
+        """Yields unexpired keys starting with `prefix`."""
+        rows = self._connection().execute(
+            "SELECT key FROM kv WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)",
+            (prefix, prefix + '\U0010ffff', time.time()),
+        )
+        for (key,) in rows:
+            yield key
+
+    def purge_expired(self):
+        """Deletes expired entries from disk and returns how many were removed."""
+        return self._connection().execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)).rowcount
 
+    # Same interface as the FileCache this replaces
     def read(self, key):
-        """Reads data from cache file if exists."""
-        try:
-            cache_file_path = self._get_cache_path(key)
-            if self.exists(key):
-                with self.lock, open(cache_file_path, 'r') as file:
-                    return json.load(file)
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON from cache file {cache_file_path}: {e}")
-        except Exception as e:
-            print(f"Error reading cache file {cache_file_path}: {e}")
-        return None
+        return self.get(key)
 
     def write(self, key, data):
-        """Writes data to a cache file, overwriting any existing file."""
-        try:
-            cache_file_path = self._get_cache_path(key)
-            with self.lock:
-                with open(cache_file_path, 'w') as file:
-                    json.dump(data, file)
-        except json.JSONEncodeError as e:
-            print(f"Error encoding data to JSON for cache file {cache_file_path}: {e}")
-        except Exception as e:
-            print(f"Error writing to cache file {cache_file_path}: {e}")
+        self.put(key, data)
+
+class TTLCache:
+    """In-memory LRU mapping with at most `maxsize` entries, each expiring `ttl` seconds after it was stored."""
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (value, expires_at)
+        self.lock = Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            CACHE_REQUESTS.inc(tier='results', result='miss' if entry is None else 'hit')
+            if entry is None:
+                return default
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
 
-# Example usage of the FileCache
+# Example usage of the KVCache
 if __name__ == "__main__":
-    cache = FileCache()
+    cache = KVCache()
     url = "http://example.com"
     cache_data = {"content": "Example content", "links": ["http://example.com/page1", "http://example.com/page2"]}
 
@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+from graph_store import normalize_title
+from link_sources import API_URL
+
+# Constants
+CANONICAL_CACHE_PREFIX = 'canonical:'
+CANONICAL_TTL = 30 * 24 * 3600  # seconds; redirects change far less often than links
+TITLES_PER_REQUEST = 50  # MediaWiki's limit on titles per query
+
+class TitleResolver:
+    """Maps titles to the canonical title and page id of the article they lead to.
+
+    Titles are first normalized locally, then redirects and the API's own normalization are resolved
+    50 titles per request (`redirects=1`). Answers are kept in memory and, given a KVCache, in the
+    persistent title table. Missing pages resolve to their normalized title with no page id and
+    are not stored, since they may be created later. A failed lookup also falls back to the
+    normalized title, so resolution never stops a search. With `max_entries`, the in-memory table is
+    emptied whenever it grows past that size, leaving the persistent table to answer repeats.
+
+    Link targets cannot be resolved by the link fetch itself, since `redirects=1` on a prop=links query
+    only follows the requested pages, so a crawl spends one extra request per 50 new titles to merge
+    redirect pages into their articles.
+    """
+
+    def __init__(self, client, api_url=API_URL, cache=None, max_entries=None):
+        self.client = client
+        self.api_url = api_url
+        self.cache = cache
+        self.max_entries = max_entries
+        self.table = {}  # normalized title -> [canonical title, page id]
+
+    async def resolve(self, titles):
+        """Returns {title: canonical title} for every title."""
+        return {title: canonical for title, (canonical, _) in (await self.resolve_ids(titles)).items()}
+
+    async def resolve_ids(self, titles):
+        """Returns {title: [canonical title, page id or None]} for every title."""
+        normalized = {title: normalize_title(title) for title in dict.fromkeys(titles)}
+        if self.max_entries and len(self.table) > self.max_entries:
+            self.table.clear()
+        pending = [title for title in dict.fromkeys(normalized.values()) if title and title not in self.table]
+        if pending and self.cache is not None:
+            cached = self.cache.get_many(CANONICAL_CACHE_PREFIX + title for title in pending)
+            for title in pending:
+                if CANONICAL_CACHE_PREFIX + title in cached:
+                    self.table[title] = cached[CANONICAL_CACHE_PREFIX + title]
+            pending = [title for title in pending if title not in self.table]
+        if pending:
+            batches = [pending[i:i + TITLES_PER_REQUEST] for i in range(0, len(pending), TITLES_PER_REQUEST)]
+            resolved = {}
+            for batch_resolved in await asyncio.gather(*(self._lookup(batch) for batch in batches)):
+                resolved.update(batch_resolved)
+            self.table.update(resolved)
+            if self.cache is not None:
+                self.cache.put_many({CANONICAL_CACHE_PREFIX + title: entry for title, entry in resolved.items() if entry[1]},
+                                    ttl=CANONICAL_TTL)
+        return {title: self.table.get(normal, [normal, None]) for title, normal in normalized.items()}
+
+    async def _lookup(self, titles):
+        from network import follow_title_changes, iter_api_query
+        resolved = {title: title for title in titles}
+        page_ids = {}
+        try:
+            async for query in iter_api_query(self.client, self.api_url, {'titles': '|'.join(titles), 'redirects': 1}):
+                follow_title_changes(resolved, query)
+                for page in query.get('pages', []):
+                    if not page.get('missing') and not page.get('invalid'):
+                        page_ids[page['title']] = page.get('pageid')
+        except Exception as e:
+            print(f"Error resolving titles {titles[:3]}...: {e}")
+            return {}
+        return {title: [canonical, page_ids.get(canonical)] for title, canonical in resolved.items()}
+
+    async def canonicalize_links(self, links_by_page):
+        """Rewrites {page: [linked titles]} onto canonical titles; links that collapse onto one page,
+        or onto the page itself through a redirect, are dropped."""
+        canonical = await self.resolve(title for links in links_by_page.values() for title in links)
+        rewritten = {}
+        for page, links in links_by_page.items():
+            targets = dict.fromkeys(canonical[title] for title in links)
+            targets.pop(page, None)
+            rewritten[page] = list(targets)
+        return rewritten
+
+async def resolve_titles(titles, api_url=API_URL, cache=None):
+    """One-off resolution over its own HTTP client; returns {title: canonical title}."""
+    from network import AsyncHTTPClient
+    async with AsyncHTTPClient() as client:
+        return await TitleResolver(client, api_url, cache).resolve(titles)
+
+def main():
+    parser = argparse.ArgumentParser(description='Resolve Wikipedia titles and redirects to canonical titles')
+    parser.add_argument('titles', nargs='+', help='Titles to resolve')
+    parser.add_argument('--api_url', default=API_URL, help='MediaWiki API endpoint')
+    args = parser.parse_args()
+    from network import AsyncHTTPClient
+
+    async def run():
+        async with AsyncHTTPClient() as client:
+            return await TitleResolver(client, args.api_url).resolve_ids(args.titles)
+    for title, (canonical, page_id) in asyncio.run(run()).items():
+        print(f"{title} -> {canonical}" + (f" (page {page_id})" if page_id else " (missing)"))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import time
+from metrics import CACHE_REQUESTS
+
+# Constants
+DEFAULT_STORE_PATH = os.path.join("cache", "crawl")
+DEFAULT_TTL = 7 * 24 * 3600  # seconds before a stored page's revision is checked again
+LOG_NAME = 'edges.jsonl'
+CHECKPOINT_NAME = 'checkpoint.json'
+
+class CrawlStore:
+    """Crawled adjacency in an append-only log, keyed by page and the revision its links were read from.
+
+    Each line of the log is {"title", "revid", "fetched_at", "links"}. A line without "links" records
+    that the page was checked again and had not been edited. Later lines win, so the log is replayed
+    on open, and a line torn by a crash is dropped. Pages fetched more than `ttl` seconds ago are
+    revalidated with one batched revision-id query and only refetched if their revision changed.
+    New pages are stored without a revision id ("revid": null), so no query is spent on a cold crawl;
+    they are refetched at their first expiry, which records the revision.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.pages = {}  # title -> latest record with links
+        self.log_path = os.path.join(path, LOG_NAME)
+        self.checkpoint_path = os.path.join(path, CHECKPOINT_NAME)
+        os.makedirs(path, exist_ok=True)
+        self._replay()
+        self.log = open(self.log_path, 'a', encoding='utf-8')
+
+    def __contains__(self, title):
+        return title in self.pages
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.log.close()
+
+    def _replay(self):
+        if not os.path.exists(self.log_path):
+            return
+        valid_bytes = 0
+        with open(self.log_path, 'rb') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                self._apply(record)
+                valid_bytes += len(line)
+        if valid_bytes < os.path.getsize(self.log_path):
+            print(f"Dropping a partly written record at the end of {self.log_path}")
+            with open(self.log_path, 'r+b') as file:
+                file.truncate(valid_bytes)
+
+    def _apply(self, record):
+        title = record['title']
+        if 'links' in record:
+            self.pages[title] = record
+        elif title in self.pages and self.pages[title]['revid'] == record['revid']:
+            self.pages[title]['fetched_at'] = record['fetched_at']
+
+    def _append(self, records):
+        for record in records:
+            self._apply(record)
+        self.log.write(''.join(json.dumps(record) + '\n' for record in records))
+        self.log.flush()
+
+    def links(self, title, default=None):
+        record = self.pages.get(title)
+        return record['links'] if record is not None else default
+
+    async def fetch_links(self, titles, source):
+        """Returns {title: links} for every title, fetching through `source` only pages that are new or edited.
+
+        `source` is a link source; its `revisions` method answers the batched revision check.
+        """
+        now = time.time()
+        titles = list(dict.fromkeys(titles))
+        links, stale, missing = {}, [], []
+        for title in titles:
+            record = self.pages.get(title)
+            if record is None:
+                missing.append(title)
+            elif self.ttl and now - record['fetched_at'] > self.ttl:
+                stale.append(title)
+            else:
+                links[title] = record['links']
+        fresh = len(links)
+        # Revisions are read before links, so an edit in between is caught by the next check
+        revisions = {}
+        if stale:
+            try:
+                revisions = await source.revisions(stale)
+            except Exception as e:
+                print(f"Failed to check the revisions of {len(stale)} stored pages, refetching them: {e}")
+
+        records = []
+        for title in stale:
+            record = self.pages[title]
+            if record['revid'] is not None and revisions.get(title) == record['revid']:
+                records.append({'title': title, 'revid': record['revid'], 'fetched_at': now})
+                links[title] = record['links']
+            else:
+                missing.append(title)
+        revalidated = len(records)
+        fetched = await source.forward(missing) if missing else {}
+        # An empty list usually means the fetch failed, so only pages with links are stored
+        records += [{'title': title, 'revid': revisions.get(title), 'fetched_at': now, 'links': page_links}
+                    for title, page_links in fetched.items() if page_links]
+        if records:
+            self._append(records)
+        links.update(fetched)
+        for title in titles:
+            links.setdefault(title, [])
+
+        CACHE_REQUESTS.inc(fresh, tier='crawl_store', result='hit')
+        CACHE_REQUESTS.inc(revalidated, tier='crawl_store', result='revalidated')
+        CACHE_REQUESTS.inc(len(missing), tier='crawl_store', result='miss')
+        return links
+
+    def save_checkpoint(self, state):
+        """Atomically records a crawl's progress, after syncing the log lines it depends on to disk."""
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        temporary_path = self.checkpoint_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            print(f"Ignoring unreadable crawl checkpoint {self.checkpoint_path}: {e}")
+            return None
+
+    def clear_checkpoint(self):
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+    def compact(self):
+        """Rewrites the log with one line per page, dropping superseded records."""
+        self.log.close()
+        temporary_path = self.log_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            for record in self.pages.values():
+                file.write(json.dumps(record) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.log_path)
+        self.log = open(self.log_path, 'a', encoding='utf-8')
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or compact a crawl store')
+    parser.add_argument('--path', default=DEFAULT_STORE_PATH, help='Crawl store directory')
+    parser.add_argument('--compact', action='store_true', help='Rewrite the edge log with one line per page')
+    args = parser.parse_args()
+
+    with CrawlStore(args.path) as store:
+        size = os.path.getsize(store.log_path)
+        edges = sum(len(record['links']) for record in store.pages.values())
+        print(f"{len(store)} pages, {edges} links, {size / 2**20:.1f}MB log")
+        if store.load_checkpoint():
+            print("An unfinished crawl can be resumed")
+        if args.compact:
+            store.compact()
+            print(f"Compacted the log to {os.path.getsize(store.log_path) / 2**20:.1f}MB")
+
+if __name__ == '__main__':
+    main()
@@ -1,68 +1,467 @@
 import argparse
 import asyncio
-from search_algorithms import bfs, dfs, dijkstra, a_star_search
-from network import AsyncHTTPClient
-from utils import parse_links, extract_title
-from heuristic import compute_textual_similarity
-from tqdm import tqdm
+import heapq
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+from search_algorithms import bfs, bfs_many, batch_bfs, bidirectional_bfs, dfs, dijkstra, a_star_search
+from scheduler import FetchScheduler
+from graph_store import LinkGraph, normalize_title
+from heuristic import EmbeddingIndex, title_overlap_estimates
+from landmarks import LandmarkIndex
+from minhash import SketchIndex, sketch_graph_store
+import metrics
+from metrics import SEARCH_EXPANDED, SEARCH_FRONTIER
+from cache import KVCache, DEFAULT_CACHE_PATH, DEFAULT_MEMORY_LIMIT
+from crawl_store import CrawlStore
+from bounded_crawl import TITLES_TABLE, BloomFilter, CrawlEdges, IdBitmap, SpillingFrontier, TitleIds, write_crawled_store
+from canonical import TitleResolver, resolve_titles
+from link_sources import WIKI_BASE_URL, APILinkSource, HTMLLinkSource
 
-async def fetch_and_parse_links(page_url):
-    try:
-        async with AsyncHTTPClient() as client:
-            content = await client.get(page_url)
-        links = []
-        for link in parse_links(content, base_url="https://en.wikipedia.org"):
-            try:
-                title = extract_title(link)
-                links.append(title)
-            except Exception as e:
-                print(f"Failed to parse link {link} for {page_url}: {e}")
-        return links
-    except Exception as e:
-        print(f"Failed to fetch content for {page_url}: {e}")
-        return []
+MAX_IN_FLIGHT = 10
+ONLINE_BATCH_SIZE = 20  # pages an online search fetches per round
+LINKS_CACHE_PREFIX = 'links:'
+LINKS_TTL = 7 * 24 * 3600  # seconds before a page's cached links are fetched again
+BOUNDED_BATCH_PAGES = 500  # pages a memory-bounded crawl fetches together
+DEFAULT_BOUNDED_GRAPH = os.path.join("cache", "crawl_graph")
 
-async def build_graph(start_page, end_page, max_depth=2, max_links_per_page=20, max_pages=1000):
-    try:
-        async with AsyncHTTPClient() as client:
-            start_page_exists = await client.get(f"https://en.wikipedia.org/wiki/{start_page}")
-            end_page_exists = await client.get(f"https://en.wikipedia.org/wiki/{end_page}")
-            if start_page_exists.status_code != 200 or end_page_exists.status_code != 200:
-                raise ValueError("Start or end page does not exist in Wikipedia")
-    except Exception as e:
-        print(f"An error occurred while checking start and end pages: {e}")
-        return None
+def make_link_source(kind, client, base_url=WIKI_BASE_URL, parse_pool=None, parse_workers=None):
+    if kind == 'api':
+        return APILinkSource(client, f"{base_url}/w/api.php")
+    return HTMLLinkSource(client, base_url, parse_pool, parse_workers)
 
-    queue = [(start_page, 0)]
-    graph = {}
-    visited = set()
-    pbar = tqdm(desc="Building Graph", unit="pages", total=max_pages)
-
-    while queue:
-        current_page, current_depth = queue.pop(0)
-        pbar.update(1)
-        if current_page not in visited:
-            visited.add(current_page)
-            if current_depth < max_depth:
-                links = await fetch_and_parse_links(f"https://en.wikipedia.org/wiki/{current_page}")
-                if links:
-                    sampled_links = links[:max_links_per_page] if len(links) > max_links_per_page else links
-                    graph[current_page] = sampled_links
-                    for link in sampled_links:
-                        title = extract_title(link)
-                        if title not in visited:
-                            queue.insert(0, (title, current_depth + 1))  # Insert at the beginning for DFS order
+async def fetch_links_cached(pages, fetch_many, cache=None):
+    """Returns {page: links}, serving pages from `cache` where possible and storing what had to be fetched."""
+    cached = cache.get_many(LINKS_CACHE_PREFIX + page for page in pages) if cache is not None else {}
+    links = {page: cached[LINKS_CACHE_PREFIX + page] for page in pages if LINKS_CACHE_PREFIX + page in cached}
+    missing = [page for page in pages if page not in links]
+    fetched = await fetch_many(missing) if missing else {}
+    if cache is not None:
+        # An empty list usually means the fetch failed, so only pages with links are cached
+        cache.put_many({LINKS_CACHE_PREFIX + page: page_links for page, page_links in fetched.items() if page_links}, ttl=LINKS_TTL)
+    links.update(fetched)
+    for page in missing:
+        links.setdefault(page, [])
+    return links
+
+async def fetch_links(pages, source, cache=None, store=None):
+    """Returns {page: links} from the crawl store when there is one, otherwise through the links cache."""
+    if store is not None:
+        return await store.fetch_links(pages, source)
+    return await fetch_links_cached(pages, source.forward, cache)
+
+async def build_graph(start_page, end_page, max_depth=2, max_links_per_page=20, max_pages=1000,
+                      concurrency=None, base_url=WIKI_BASE_URL, cache=None, link_source='html', parse_processes=None,
+                      store=None, canonicalize=False, memory_budget=None, out_dir=DEFAULT_BOUNDED_GRAPH, sketches=None):
+    """Crawls outward from start_page into a {page: [linked pages]} dict.
+
+    `link_source` is 'html' (parse article pages) or 'api' (MediaWiki prop=links), or a link source
+    object bound to an open client. Concurrent HTML crawls parse pages in `parse_processes` worker
+    processes (one per core by default; 0 parses on the event loop). Given a CrawlStore as `store`,
+    known pages are served from it instead of the cache, and a concurrent crawl checkpoints each depth
+    level there so an interrupted crawl resumes where it stopped. With `canonicalize`, titles are
+    resolved through redirects as they are ingested, so a page reached under several names is one node.
+    With a `memory_budget` in bytes, the crawl runs in build_graph_bounded instead and returns a LinkGraph.
+    Given a SketchIndex as `sketches`, every page's full link list is merged into it as it is fetched.
+    """
+    if memory_budget:
+        graph = await build_graph_bounded(start_page, end_page, out_dir, max_depth, max_links_per_page, max_pages,
+                                          concurrency or MAX_IN_FLIGHT, base_url, cache, link_source, parse_processes,
+                                          canonicalize, memory_budget)
+        if graph is not None and sketches is not None:
+            sketch_graph_store(sketches, graph)
+        return graph
+    if concurrency:
+        return await build_graph_concurrent(start_page, end_page, max_depth, max_links_per_page,
+                                            max_pages, concurrency, base_url, cache, link_source, parse_processes, store,
+                                            canonicalize, sketches)
+
+    from network import AsyncHTTPClient
+    from tqdm import tqdm
+    async with AsyncHTTPClient() as client:
+        source = make_link_source(link_source, client, base_url) if isinstance(link_source, str) else link_source
+        resolver = TitleResolver(client, f"{base_url}/w/api.php", cache) if canonicalize else None
+        if resolver is not None:
+            canonical = await resolver.resolve([start_page, end_page])
+            start_page, end_page = canonical[start_page], canonical[end_page]
+        if not await source.exists([start_page, end_page]):
+            return None
+
+        queue = deque([(start_page, 0)])
+        graph = {}
+        visited = set()
+        pbar = tqdm(desc="Building Graph", unit="pages", total=max_pages)
+
+        while queue:
+            current_page, current_depth = queue.popleft()
+            pbar.update(1)
+            if current_page not in visited:
+                visited.add(current_page)
+                if current_depth < max_depth:
+                    links = await fetch_links([current_page], source, cache, store)
+                    if resolver is not None:
+                        links = await resolver.canonicalize_links(links)
+                    links = links[current_page]
+                    if sketches is not None:
+                        sketches.add({current_page: links})
+                    if links:
+                        sampled_links = links[:max_links_per_page] if len(links) > max_links_per_page else links
+                        graph[current_page] = sampled_links
+                        for title in sampled_links:
+                            if title not in visited:
+                                queue.appendleft((title, current_depth + 1))  # Insert at the beginning for DFS order
+                    else:
+                        graph[current_page] = []
                 else:
                     graph[current_page] = []
-            else:
-                graph[current_page] = []
-        if len(visited) >= max_pages:
-            print(f"Stopping early due to reaching the maximum number of pages ({max_pages})")
-            break
-    pbar.close()
+            if len(visited) >= max_pages:
+                print(f"Stopping early due to reaching the maximum number of pages ({max_pages})")
+                break
+        pbar.close()
     return graph
 
-def find_path(graph, start_page, end_page, algorithm):
+async def build_graph_concurrent(start_page, end_page, max_depth=2, max_links_per_page=20, max_pages=1000,
+                                 concurrency=MAX_IN_FLIGHT, base_url=WIKI_BASE_URL, cache=None, link_source='html',
+                                 parse_processes=None, store=None, canonicalize=False, sketches=None):
+    """Level-synchronous crawl: each depth is fetched as one concurrent batch over a shared client."""
+    from network import AsyncHTTPClient
+    from tqdm import tqdm
+    parse_in_pool = link_source == 'html' and parse_processes != 0
+    with ProcessPoolExecutor(parse_processes) if parse_in_pool else nullcontext() as parse_pool:
+        async with AsyncHTTPClient(max_parallel_requests=concurrency, max_connections_per_host=concurrency) as client:
+            source = (make_link_source(link_source, client, base_url, parse_pool, parse_processes)
+                      if isinstance(link_source, str) else link_source)
+            resolver = TitleResolver(client, f"{base_url}/w/api.php", cache) if canonicalize else None
+            if resolver is not None:
+                canonical = await resolver.resolve([start_page, end_page])
+                start_page, end_page = canonical[start_page], canonical[end_page]
+            if not await source.exists([start_page, end_page]):
+                return None
+
+            graph = {}
+            visited = {start_page}
+            frontier = deque([start_page])
+            depth = 0
+            crawl = {'start': start_page, 'end': end_page, 'max_depth': max_depth, 'max_links_per_page': max_links_per_page}
+            checkpoint = store.load_checkpoint() if store is not None else None
+            if checkpoint and checkpoint['crawl'] == crawl:
+                graph = {page: store.links(page, [])[:max_links_per_page] for page in checkpoint['pages']}
+                frontier = deque(checkpoint['frontier'])
+                visited = set(graph) | set(frontier)
+                depth = checkpoint['depth']
+                print(f"Resuming the crawl at depth {depth} with {len(graph)} pages done")
+            pbar = tqdm(desc="Building Graph", unit="pages", total=max_pages, initial=len(graph))
+
+            while frontier and len(graph) < max_pages:
+                if depth >= max_depth:
+                    # Pages past the depth limit are kept unfetched, as the sequential crawl keeps them, and
+                    # count against max_pages; the end page goes first so the search can still reach it
+                    leaves = sorted(frontier, key=lambda page: page != end_page)
+                    for page in leaves[:max_pages - len(graph)]:
+                        graph.setdefault(page, [])
+                    break
+
+                batch = []
+                while frontier and len(graph) + len(batch) < max_pages:
+                    batch.append(frontier.popleft())
+                next_frontier = deque()
+
+                batch_links = await fetch_links(batch, source, cache, store)
+                if resolver is not None:
+                    batch_links = await resolver.canonicalize_links(batch_links)
+                if sketches is not None:
+                    sketches.add(batch_links)
+                for page in batch:
+                    links = batch_links[page]
+                    pbar.update(1)
+                    sampled_links = links[:max_links_per_page]
+                    graph[page] = sampled_links
+                    for title in sampled_links:
+                        if title not in visited:
+                            visited.add(title)
+                            next_frontier.append(title)
+
+                frontier = next_frontier
+                depth += 1
+                if store is not None:
+                    store.save_checkpoint({'crawl': crawl, 'depth': depth, 'frontier': list(frontier), 'pages': list(graph)})
+
+            if len(graph) >= max_pages:
+                print(f"Stopping early due to reaching the maximum number of pages ({max_pages})")
+            pbar.close()
+            if store is not None:
+                store.clear_checkpoint()
+        return graph
+
+async def online_search(start_page, end_page, max_pages=1000, batch_size=ONLINE_BATCH_SIZE, base_url=WIKI_BASE_URL,
+                        cache=None, link_source='api', store=None, canonicalize=False, score=None, max_depth=None,
+                        stats=None, client=None, sketches=None):
+    """Best-first search that fetches pages as it expands them and stops as soon as a path is confirmed.
+
+    Pages are handed to a FetchScheduler in order of `score(titles, target)`, lowest first (the
+    batch_heuristic signature of a_star_search; WGIP's title word overlap by default), one page per
+    request for HTML and `batch_size` pages per request for the API. Every link that finished
+    fetches discover is scored in one call. Queued fetches that have fallen behind better pages are
+    cancelled and their pages requeued. A path is confirmed once a fetched page links to the target,
+    or, for sources with incoming links, to a page that links to it. Everything still outstanding is
+    then cancelled. Paths come back quickly but are not guaranteed shortest. `stats` receives pages
+    fetched, pages discovered and seconds. Returns the path, or None when no path is found within
+    `max_pages` fetches. An open `client` is used, and left open, instead of a new one. Fetched links
+    are merged into a SketchIndex given as `sketches`, and the target's backlinks widen its neighborhood.
+    """
+    from network import AsyncHTTPClient
+    started = time.perf_counter()
+    score = score or title_overlap_estimates
+    if client is None:
+        client = AsyncHTTPClient(max_parallel_requests=batch_size, max_connections_per_host=batch_size)
+    else:
+        client = nullcontext(client)
+    async with client as client, FetchScheduler(client) as scheduler:
+        source = make_link_source(link_source, scheduler, base_url) if isinstance(link_source, str) else link_source
+        resolver = TitleResolver(scheduler, f"{base_url}/w/api.php", cache) if canonicalize else None
+        if resolver is not None:
+            canonical = await resolver.resolve([start_page, end_page])
+            start_page, end_page = canonical[start_page], canonical[end_page]
+        if not await source.exists([start_page, end_page]):
+            return None
+
+        parents = {start_page: None}
+        depths = {start_page: 0}
+        estimates = {start_page: 0.0}
+        queue = [(0.0, 0, start_page)]  # (estimate, depth, title)
+        expanded = set()
+        in_flight = {}  # fetch task -> (FetchGroup, titles)
+        # The API answers many titles per request, so it is fed batches; HTML is fetched page by page
+        unit_size = batch_size if hasattr(source, 'TITLES_PER_REQUEST') else 1
+        window = 2 * max(1, batch_size // unit_size)
+        # Pages one link short of the target; reaching any of them confirms a path
+        before_target = set()
+        if source.supports_backward:
+            backlinks = {end_page: (await source.backward([end_page])).get(end_page, [])}
+            if resolver is not None:
+                backlinks = await resolver.canonicalize_links(backlinks)
+            before_target = set(backlinks[end_page])
+            if sketches is not None:
+                sketches.add_backlinks(backlinks)
+
+        def record_stats():
+            if stats is not None:
+                stats.update(fetched=len(expanded), discovered=len(parents),
+                             elapsed=round(time.perf_counter() - started, 3))
+
+        def confirmed_path(page):
+            path = []
+            while page is not None:
+                path.append(page)
+                page = parents[page]
+            path.reverse()
+            return path if path[-1] == end_page else path + [end_page]
+
+        async def expand(titles):
+            links = await fetch_links(titles, source, cache, store)
+            if resolver is not None:
+                links = await resolver.canonicalize_links(links)
+            if sketches is not None:
+                sketches.add(links)
+            return links
+
+        def next_unit():
+            unit = []
+            while queue and len(unit) < min(unit_size, max_pages - len(expanded)):
+                _, depth, title = heapq.heappop(queue)
+                if title not in expanded and (max_depth is None or depth < max_depth):
+                    expanded.add(title)
+                    unit.append(title)
+            return unit
+
+        if start_page == end_page or start_page in before_target:
+            record_stats()
+            return confirmed_path(start_page)
+        try:
+            while True:
+                while queue and len(in_flight) < window and len(expanded) < max_pages:
+                    unit = next_unit()
+                    if not unit:
+                        break
+                    group = scheduler.group(min(estimates[title] for title in unit))
+                    with group:
+                        in_flight[asyncio.ensure_future(expand(unit))] = (group, unit)
+                    SEARCH_EXPANDED.inc(len(unit), algorithm='online')
+                if not in_flight:
+                    break
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                discovered = []
+                for task in done:
+                    _, unit = in_flight.pop(task)
+                    try:
+                        links = task.result()
+                    except Exception as e:
+                        print(f"Failed to fetch links for {unit[:3]}: {e}")
+                        continue
+                    for page in unit:
+                        for link in links.get(page, []):
+                            if link in parents:
+                                continue
+                            parents[link] = page
+                            depths[link] = depths[page] + 1
+                            if link == end_page or link in before_target:
+                                record_stats()
+                                return confirmed_path(link)
+                            discovered.append(link)
+                if discovered:
+                    for link, estimate in zip(discovered, score(discovered, end_page)):
+                        estimates[link] = float(estimate)
+                        heapq.heappush(queue, (estimates[link], depths[link], link))
+                # Requeue pages whose fetches have not started but now rank below the best waiting page
+                for task, (group, unit) in list(in_flight.items()):
+                    if queue and not group.started and group.priority > queue[0][0]:
+                        task.cancel()
+                        group.cancel()
+                        del in_flight[task]
+                        for title in unit:
+                            expanded.discard(title)
+                            heapq.heappush(queue, (estimates[title], depths[title], title))
+                SEARCH_FRONTIER.set(len(queue), algorithm='online')
+            record_stats()
+            return None
+        finally:
+            for task in in_flight:
+                task.cancel()
+            scheduler.cancel_all()
+
+class LazyGraph:
+    """Adjacency mapping whose pages are fetched the first time they are looked up.
+
+    `fetch_links` takes a list of titles and returns {title: [linked titles]} for those that exist.
+    Searches call `prefetch` with a whole frontier so those pages are fetched in one batch.
+    """
+
+    def __init__(self, fetch_links):
+        self.fetch_links = fetch_links
+        self.adjacency = {}
+        self.missing = set()
+
+    def prefetch(self, titles):
+        pending = [title for title in dict.fromkeys(titles) if title not in self.adjacency and title not in self.missing]
+        if not pending:
+            return
+        fetched = self.fetch_links(pending)
+        for title in pending:
+            if title in fetched:
+                self.adjacency[title] = fetched[title]
+            else:
+                self.missing.add(title)
+
+    def __contains__(self, title):
+        self.prefetch([title])
+        return title in self.adjacency
+
+    def __getitem__(self, title):
+        if title not in self:
+            raise KeyError(title)
+        return self.adjacency[title]
+
+    def get(self, title, default=None):
+        return self[title] if title in self else default
+
+    def __len__(self):
+        return len(self.adjacency)
+
+async def build_graph_bounded(start_page, end_page, out_dir=DEFAULT_BOUNDED_GRAPH, max_depth=2, max_links_per_page=20,
+                              max_pages=1000, concurrency=MAX_IN_FLIGHT, base_url=WIKI_BASE_URL, cache=None,
+                              link_source='html', parse_processes=None, canonicalize=False, memory_budget=256 * 2**20,
+                              bloom=True, stats=None):
+    """Level-synchronous crawl held to about `memory_budget` bytes, for crawls of millions of pages.
+
+    Titles are interned as integer ids in an on-disk table, with a Bloom filter in front of it unless
+    `bloom` is False. Queued pages are marked in a bitmap over those ids. Each level's frontier spills
+    to segment files once it outgrows its share of the budget, and links go straight to edge
+    files. Pages are fetched BOUNDED_BATCH_PAGES at a time. The crawl reaches the same pages and
+    links as build_graph_concurrent, though a `max_pages` cut may fall on other pages of the last
+    level. The result is written as a graph store to `out_dir` and returned as a LinkGraph. `stats`
+    receives pages expanded, nodes, links, frontier spills and the table lookups the filter saved.
+    """
+    from network import AsyncHTTPClient
+    from tqdm import tqdm
+    work_dir = os.path.join(out_dir, 'crawl')
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    share = memory_budget // 4  # each for the Bloom filter, the title table's page cache and the frontiers
+    bloom_filter = BloomFilter(max_pages * max_links_per_page, max_bytes=share) if bloom else None
+    title_ids = TitleIds(os.path.join(work_dir, TITLES_TABLE), bloom_filter, cache_bytes=share)
+    edges = CrawlEdges(work_dir)
+    visited = IdBitmap()
+    frontier_items = share // 16  # int64 ids, for the level being expanded and the next one
+    spills = expanded = 0
+    parse_in_pool = link_source == 'html' and parse_processes != 0
+    try:
+        with ProcessPoolExecutor(parse_processes) if parse_in_pool else nullcontext() as parse_pool:
+            async with AsyncHTTPClient(max_parallel_requests=concurrency, max_connections_per_host=concurrency) as client:
+                source = (make_link_source(link_source, client, base_url, parse_pool, parse_processes)
+                          if isinstance(link_source, str) else link_source)
+                resolver = None
+                if canonicalize:
+                    resolver = TitleResolver(client, f"{base_url}/w/api.php", cache, max_entries=share // 200)
+                    canonical = await resolver.resolve([start_page, end_page])
+                    start_page, end_page = canonical[start_page], canonical[end_page]
+                if not await source.exists([start_page, end_page]):
+                    return None
+
+                frontier = SpillingFrontier(work_dir, frontier_items)
+                start_id, = title_ids.intern([start_page])
+                visited.add(start_id)
+                frontier.append(start_id)
+                depth = 0
+                pbar = tqdm(desc="Building Graph", unit="pages", total=max_pages)
+                while len(frontier) and expanded < max_pages and depth < max_depth:
+                    next_frontier = SpillingFrontier(work_dir, frontier_items)
+                    pages = iter(frontier)
+                    while expanded < max_pages:
+                        batch = list(islice(pages, min(BOUNDED_BATCH_PAGES, max_pages - expanded)))
+                        if not batch:
+                            break
+                        titles = title_ids.titles(batch)
+                        batch_links = await fetch_links([titles[node] for node in batch], source, cache)
+                        if resolver is not None:
+                            batch_links = await resolver.canonicalize_links(batch_links)
+                        sampled = [batch_links[titles[node]][:max_links_per_page] for node in batch]
+                        link_ids = iter(title_ids.intern([title for links in sampled for title in links]))
+                        for node, links in zip(batch, sampled):
+                            page_link_ids = sorted(set(islice(link_ids, len(links))))
+                            edges.add(node, page_link_ids)
+                            for link in page_link_ids:
+                                if visited.add(link):
+                                    next_frontier.append(link)
+                        expanded += len(batch)
+                        pbar.update(len(batch))
+                    pages.close()  # drops the rest of the level and its segment files
+                    spills += frontier.spills
+                    frontier = next_frontier
+                    depth += 1
+                spills += frontier.spills
+                if expanded >= max_pages:
+                    print(f"Stopping early due to reaching the maximum number of pages ({max_pages})")
+                pbar.close()
+        write_crawled_store(out_dir, title_ids, edges)
+    finally:
+        edges.close()
+        title_ids.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if stats is not None:
+        stats.update(pages=expanded, nodes=len(title_ids), links=edges.links, spills=spills,
+                     skipped_lookups=title_ids.skipped_lookups, lookups=title_ids.lookups)
+    return LinkGraph(out_dir)
+
+def lazy_graph(fetch_many, loop):
+    """A LazyGraph over an async `fetch_many(titles)`, such as a link source's forward or backward,
+    whose event loop `loop` runs in another thread."""
+    return LazyGraph(lambda titles: asyncio.run_coroutine_threadsafe(fetch_many(titles), loop).result())
+
+def find_path(graph, start_page, end_page, algorithm, embedding_index=None, landmark_index=None, sketch_index=None):
     if not graph:
         print("Graph construction failed; cannot proceed with path finding.")
         return None
@@ -70,20 +469,28 @@ def find_path(graph, start_page, end_page, algorithm):
         print("Start or end page not found in the graph; cannot proceed with path finding.")
         return None
     
-    valid_algorithms = ['bfs', 'dfs', 'dijkstra', 'a_star']
+    valid_algorithms = ['bfs', 'bidirectional', 'dfs', 'dijkstra', 'a_star']
     if algorithm not in valid_algorithms:
         raise ValueError(f"Invalid search algorithm specified. Valid choices are: {', '.join(valid_algorithms)}")
     
     try:
         if algorithm == 'bfs':
             path = bfs(graph, start_page, end_page)
+        elif algorithm == 'bidirectional':
+            path = bidirectional_bfs(graph, start_page, end_page)
         elif algorithm == 'dfs':
             path = dfs(graph, start_page, end_page)
         elif algorithm == 'dijkstra':
             path, _ = dijkstra(graph, start_page, end_page)
         elif algorithm == 'a_star':
-            heuristic_func = lambda x, y: compute_textual_similarity(x, y)
-            path, _ = a_star_search(graph, start_page, end_page, heuristic_func)
+            if landmark_index is not None:
+                path, _ = a_star_search(graph, start_page, end_page, batch_heuristic=landmark_index.distance_estimates)
+            elif embedding_index is not None:
+                path, _ = a_star_search(graph, start_page, end_page, batch_heuristic=embedding_index.distance_estimates)
+            elif sketch_index is not None:
+                path, _ = a_star_search(graph, start_page, end_page, batch_heuristic=sketch_index.distance_estimates)
+            else:
+                path, _ = a_star_search(graph, start_page, end_page)
         
         if path is None:
             print(f"No path found between {start_page} and {end_page} using {algorithm} algorithm.")
@@ -93,26 +500,194 @@ def find_path(graph, start_page, end_page, algorithm):
         print(f"An error occurred during path finding: {e}")
         return None
 
+def read_pairs(path, start_page=None):
+    """(start, end) pairs from a file of tab-separated lines; a line holding only an end page pairs it with `start_page`."""
+    pairs = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            titles = [title.strip() for title in line.rstrip('\n').split('\t')]
+            if not titles[0]:
+                continue
+            if len(titles) == 1:
+                if start_page is None:
+                    raise ValueError(f"{path} lists an end page without a start page; pass --start_page")
+                titles.insert(0, start_page)
+            pairs.append((titles[0], titles[1]))
+    return pairs
+
+def batch_find_paths(pairs, graph=None, build=None, algorithm='bfs'):
+    """Yields (start, end, path) for many pairs as each resolves, sharing one BFS tree among pairs with a common page.
+
+    Over a whole `graph`, pairs are grouped by start or end through batch_bfs. Otherwise `build(start)`
+    crawls a graph from each distinct start once, and a single tree over it answers all that start's ends.
+    With the 'bidirectional' algorithm, every pair runs its own bidirectional_bfs over the same graphs.
+    """
+    if graph is not None:
+        if algorithm == 'bidirectional':
+            for start_page, end_page in dict.fromkeys(pairs):
+                yield start_page, end_page, _bidirectional_or_empty(graph, start_page, end_page)
+            return
+        yield from batch_bfs(graph, pairs)
+        return
+    ends_by_start = {}
+    for start_page, end_page in dict.fromkeys(pairs):
+        ends_by_start.setdefault(start_page, []).append(end_page)
+    for start_page, end_pages in ends_by_start.items():
+        crawled = build(start_page)
+        if crawled is None:
+            for end_page in end_pages:
+                yield start_page, end_page, []
+            continue
+        if algorithm == 'bidirectional':
+            for end_page in end_pages:
+                yield start_page, end_page, _bidirectional_or_empty(crawled, start_page, end_page)
+            continue
+        for end_page, path in bfs_many(crawled, start_page, end_pages):
+            yield start_page, end_page, path
+
+def _bidirectional_or_empty(graph, start_page, end_page):
+    try:
+        return bidirectional_bfs(graph, start_page, end_page)
+    except ValueError:
+        return []
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--start_page', type=str, required=True, help='Start Wikipedia page title')
-    parser.add_argument('--end_page', type=str, required=True, help='End Wikipedia page title')
-    parser.add_argument('--algorithm', choices=['bfs', 'dfs', 'dijkstra', 'a_star'], required=True, help='Search algorithm to use')
+    parser.add_argument('--start_page', type=str, default=None, help='Start Wikipedia page title')
+    parser.add_argument('--end_page', type=str, default=None, help='End Wikipedia page title')
+    parser.add_argument('--pairs', type=str, default=None,
+                        help='Answer every tab-separated start/end pair in this file (lines with only an end page start at --start_page); '
+                             'bfs shares BFS trees among pairs, bidirectional searches each pair on its own')
+    parser.add_argument('--algorithm', choices=['bfs', 'bidirectional', 'dfs', 'dijkstra', 'a_star', 'online'], required=True,
+                        help="Search algorithm to use; 'online' fetches pages best-first while searching instead of crawling first")
+    parser.add_argument('--max_pages', type=int, default=1000, help='Most pages to crawl, or for online search to fetch')
+    parser.add_argument('--max_depth', type=int, default=2, help='Link depth to crawl from the start page')
+    parser.add_argument('--concurrency', type=int, default=None, help='Crawl each depth level with up to this many requests in flight')
+    parser.add_argument('--link_source', choices=['html', 'api'], default='html', help='Read links from article HTML or the MediaWiki API')
+    parser.add_argument('--parse_processes', type=int, default=None, help='Processes parsing article HTML in a concurrent crawl (default: one per core; 0 parses in the event loop)')
+    parser.add_argument('--raw_titles', action='store_true', help='Keep titles as linked instead of resolving redirects to canonical titles')
+    parser.add_argument('--crawl_store', type=str, default=None, help='Keep crawled links in this directory, reuse them later and resume interrupted crawls')
+    parser.add_argument('--memory_budget', type=int, default=None, help='Crawl within about this many MB, writing the graph to --graph_out, for crawls of millions of pages')
+    parser.add_argument('--graph_out', type=str, default=DEFAULT_BOUNDED_GRAPH, help='Graph store a --memory_budget crawl writes')
+    parser.add_argument('--graph_store', type=str, default=None, help='Search a graph store built by graph_store.py instead of crawling')
+    parser.add_argument('--cache_path', type=str, default=DEFAULT_CACHE_PATH, help="Cache file for fetched links; pass '' to disable")
+    parser.add_argument('--embedding_index', type=str, default=None, help='Guide a_star with an index built by heuristic.py')
+    parser.add_argument('--landmarks', type=str, default=None, help='Guide a_star with a landmark index built by landmarks.py (needs --graph_store)')
+    parser.add_argument('--sketch_index', type=str, default=None,
+                        help='Guide a_star and online search by link similarity to the target, from MinHash sketches that crawls keep up to date (see minhash.py)')
+    parser.add_argument('--trace', type=str, default=None, help='Append timings, cache hits and frontier sizes to this JSON-lines file')
     args = parser.parse_args()
+    if args.pairs and args.algorithm not in ('bfs', 'bidirectional'):
+        parser.error('--pairs runs bfs or bidirectional searches; use --algorithm bfs or --algorithm bidirectional')
+    if not args.pairs and not (args.start_page and args.end_page):
+        parser.error('--start_page and --end_page are required without --pairs')
+    if args.landmarks and not args.graph_store:
+        parser.error('--landmarks needs the --graph_store it was built from')
+    if args.algorithm == 'online' and args.graph_store:
+        parser.error('--algorithm online fetches pages as it searches and cannot use a --graph_store')
+    if args.memory_budget and args.crawl_store:
+        parser.error('--crawl_store keeps its index in memory; use the --cache_path cache with --memory_budget')
+    if args.trace:
+        metrics.start_trace(args.trace)
+    sketch_index = SketchIndex.open(args.sketch_index) if args.sketch_index else None
     
     try:
-        graph = asyncio.run(build_graph(args.start_page, args.end_page))
+        if args.pairs:
+            run_batch(args, read_pairs(args.pairs, args.start_page))
+            return
+        if args.graph_store:
+            graph = LinkGraph(args.graph_store)
+            args.start_page, args.end_page = normalize_title(args.start_page), normalize_title(args.end_page)
+        else:
+            cache = None
+            if args.cache_path:
+                memory_limit = args.memory_budget * 2**20 // 8 if args.memory_budget else DEFAULT_MEMORY_LIMIT
+                cache = KVCache(args.cache_path, memory_limit=memory_limit)
+            store = CrawlStore(args.crawl_store) if args.crawl_store else None
+            if not args.raw_titles:
+                canonical = asyncio.run(resolve_titles([args.start_page, args.end_page], cache=cache))
+                args.start_page, args.end_page = canonical[args.start_page], canonical[args.end_page]
+            try:
+                if args.algorithm == 'online':
+                    embedding_index = EmbeddingIndex.load(args.embedding_index) if args.embedding_index else None
+                    heuristic = embedding_index if embedding_index is not None else sketch_index
+                    score = heuristic.distance_estimates if heuristic is not None else None
+                    stats = {}
+                    path = asyncio.run(online_search(args.start_page, args.end_page, args.max_pages, cache=cache,
+                                                     link_source=args.link_source, store=store,
+                                                     canonicalize=not args.raw_titles, stats=stats, score=score,
+                                                     sketches=sketch_index))
+                    if path:
+                        print("Path found:", " -> ".join(path))
+                    else:
+                        print(f"No path found between {args.start_page} and {args.end_page} within {args.max_pages} pages.")
+                    if stats:
+                        print(f"Fetched {stats['fetched']} pages ({stats['discovered']} discovered) in {stats['elapsed']:.2f}s")
+                    return
+                started = time.perf_counter()
+                graph = asyncio.run(build_graph(args.start_page, args.end_page, args.max_depth, max_pages=args.max_pages,
+                                                concurrency=args.concurrency, cache=cache,
+                                                link_source=args.link_source, parse_processes=args.parse_processes,
+                                                store=store, canonicalize=not args.raw_titles,
+                                                memory_budget=args.memory_budget and args.memory_budget * 2**20,
+                                                out_dir=args.graph_out, sketches=sketch_index))
+                if graph is not None:
+                    print(f"Crawled {len(graph)} pages in {time.perf_counter() - started:.2f}s")
+            finally:
+                if store is not None:
+                    store.close()
         if graph is None:
             print("Graph could not be constructed. Please check if the start and end pages are valid.")
             return
         
-        path = find_path(graph, args.start_page, args.end_page, args.algorithm)
+        embedding_index = EmbeddingIndex.load(args.embedding_index) if args.embedding_index else None
+        landmark_index = LandmarkIndex.load(args.landmarks, graph) if args.landmarks else None
+        path = find_path(graph, args.start_page, args.end_page, args.algorithm, embedding_index, landmark_index,
+                         sketch_index)
         if path:
             print("Path found:", " -> ".join(path))
         else:
             print(f"No path found between {args.start_page} and {args.end_page} using {args.algorithm} algorithm.")
     except (ValueError, TypeError) as e:
         print(f"An error occurred during the execution: {e}")
+    finally:
+        if sketch_index is not None:
+            sketch_index.save()
+        metrics.stop_trace()
+
+def run_batch(args, pairs):
+    """Prints each pair's path as it resolves, from the graph store or from one crawl per distinct start."""
+    started = time.perf_counter()
+    graph = cache = store = None
+    if args.graph_store:
+        graph = LinkGraph(args.graph_store)
+        pairs = [(normalize_title(start_page), normalize_title(end_page)) for start_page, end_page in pairs]
+    else:
+        if args.cache_path:
+            memory_limit = args.memory_budget * 2**20 // 8 if args.memory_budget else DEFAULT_MEMORY_LIMIT
+            cache = KVCache(args.cache_path, memory_limit=memory_limit)
+        store = CrawlStore(args.crawl_store) if args.crawl_store else None
+        if not args.raw_titles:
+            canonical = asyncio.run(resolve_titles([page for pair in pairs for page in pair], cache=cache))
+            pairs = [(canonical[start_page], canonical[end_page]) for start_page, end_page in pairs]
+    build = lambda start_page: asyncio.run(build_graph(start_page, start_page, args.max_depth, max_pages=args.max_pages,
+                                                       concurrency=args.concurrency, cache=cache,
+                                                       link_source=args.link_source, parse_processes=args.parse_processes,
+                                                       store=store, canonicalize=not args.raw_titles,
+                                                       memory_budget=args.memory_budget and args.memory_budget * 2**20,
+                                                       out_dir=args.graph_out))
+    found = 0
+    try:
+        for start_page, end_page, path in batch_find_paths(pairs, graph, build, args.algorithm):
+            if path:
+                found += 1
+                print("Path found:", " -> ".join(path))
+            else:
+                print(f"No path found between {start_page} and {end_page}.")
+    finally:
+        if store is not None:
+            store.close()
+    print(f"Found {found} of {len(set(pairs))} paths in {time.perf_counter() - started:.2f}s")
 
 if __name__ == '__main__':
     main()
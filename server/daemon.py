@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from cache import KVCache, TTLCache, DEFAULT_CACHE_PATH
+from canonical import TitleResolver
+from crawl_store import CrawlStore
+from crawler import find_path, online_search
+from daemon_client import DEFAULT_SOCKET_PATH
+from graph_store import LinkGraph, normalize_title
+from link_sources import WIKI_BASE_URL
+
+# Constants
+RESULT_CACHE_SIZE = 4096
+RESULT_CACHE_TTL = 3600  # seconds
+GRAPH_ALGORITHMS = ('bfs', 'bidirectional', 'dfs', 'dijkstra', 'a_star')
+
+class SearchDaemon:
+    """Search state kept warm between CLI invocations: the graph store, link caches, loaded heuristic
+    indexes and one HTTP connection pool, plus the answers to pairs already solved.
+
+    With a graph store, queries run any crawler.py algorithm over it in a worker thread. Without one,
+    they run an online search against the live wiki through the shared client and caches.
+    """
+
+    def __init__(self, graph_store=None, cache_path=DEFAULT_CACHE_PATH, crawl_store=None, embedding_index=None,
+                 landmarks=None, base_url=WIKI_BASE_URL, raw_titles=False, sketch_index=None):
+        self.graph_store = graph_store
+        self.cache_path = cache_path
+        self.crawl_store = crawl_store
+        self.embedding_index_path = embedding_index
+        self.landmarks_path = landmarks
+        self.sketch_index_path = sketch_index
+        self.base_url = base_url
+        self.raw_titles = raw_titles
+        self.results = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+    async def start(self):
+        from network import AsyncHTTPClient
+        started = time.perf_counter()
+        self.graph = LinkGraph(self.graph_store) if self.graph_store else None
+        self.cache = KVCache(self.cache_path) if self.cache_path else None
+        self.store = CrawlStore(self.crawl_store) if self.crawl_store else None
+        self.embedding_index = self.landmark_index = None
+        if self.embedding_index_path:
+            from heuristic import EmbeddingIndex
+            self.embedding_index = EmbeddingIndex.load(self.embedding_index_path)
+        if self.landmarks_path:
+            from landmarks import LandmarkIndex
+            self.landmark_index = LandmarkIndex.load(self.landmarks_path, self.graph)
+        self.sketch_index = None
+        if self.sketch_index_path:
+            from minhash import SketchIndex
+            self.sketch_index = SketchIndex.open(self.sketch_index_path)
+        self.client = await AsyncHTTPClient().__aenter__()
+        self.resolver = None
+        if self.graph is None and not self.raw_titles:
+            self.resolver = TitleResolver(self.client, f"{self.base_url}/w/api.php", self.cache)
+        print(f"Search state loaded in {time.perf_counter() - started:.2f}s")
+
+    async def stop(self):
+        await self.client.close()
+        if self.sketch_index is not None:
+            self.sketch_index.save()
+        if self.store is not None:
+            self.store.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    async def query(self, request):
+        """Answers {'start', 'end', 'algorithm', 'max_pages'} with the path found, or with an 'error'."""
+        started = time.perf_counter()
+        algorithm = request.get('algorithm') or ('bidirectional' if self.graph is not None else 'online')
+        max_pages = int(request.get('max_pages') or 1000)
+        start, end = request['start'], request['end']
+        if self.graph is not None:
+            if algorithm not in GRAPH_ALGORITHMS:
+                raise ValueError(f"Valid algorithms over a graph store are: {', '.join(GRAPH_ALGORITHMS)}")
+            start, end = normalize_title(start), normalize_title(end)
+        else:
+            if algorithm != 'online':
+                raise ValueError("Without a --graph_store the daemon only runs the 'online' algorithm")
+            if self.resolver is not None:
+                canonical = await self.resolver.resolve([start, end])
+                start, end = canonical[start], canonical[end]
+
+        key = (algorithm, start, end, max_pages)
+        answer = self.results.get(key)
+        if answer is None:
+            if self.graph is not None:
+                if start not in self.graph or end not in self.graph:
+                    raise ValueError("Start or end page not found in the graph")
+                path = await asyncio.get_running_loop().run_in_executor(
+                    None, find_path, self.graph, start, end, algorithm, self.embedding_index, self.landmark_index,
+                    self.sketch_index)
+            else:
+                heuristic = self.embedding_index if self.embedding_index is not None else self.sketch_index
+                score = heuristic.distance_estimates if heuristic is not None else None
+                path = await online_search(start, end, max_pages, base_url=self.base_url, cache=self.cache,
+                                           store=self.store, canonicalize=not self.raw_titles, score=score,
+                                           client=self.client, sketches=self.sketch_index)
+            answer = {'start': start, 'end': end, 'algorithm': algorithm, 'path': path or None}
+            # A live search that found nothing may have hit a failed fetch or max_pages, so only a
+            # graph store, which never changes under the daemon, answers "no path" for good
+            if path or self.graph is not None:
+                self.results.put(key, answer)
+        return dict(answer, time=round(time.perf_counter() - started, 3))
+
+    async def handle(self, reader, writer):
+        """Answers JSON-lines requests on one connection until the client closes it."""
+        try:
+            while line := await reader.readline():
+                try:
+                    answer = await self.query(json.loads(line))
+                except (KeyError, TypeError, ValueError) as e:
+                    answer = {'error': str(e)}
+                except Exception as e:
+                    print(f"Error answering {line!r}: {e}")
+                    answer = {'error': 'An error occurred while finding path'}
+                writer.write(json.dumps(answer).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def serve(daemon, socket_path=DEFAULT_SOCKET_PATH):
+    """Listens on `socket_path` until cancelled, replacing a socket file left behind by a previous daemon."""
+    os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    await daemon.start()
+    server = await asyncio.start_unix_server(daemon.handle, socket_path)
+    print(f"Listening on {socket_path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        os.remove(socket_path)
+        await daemon.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Keep search state warm and answer daemon_client.py queries over a Unix socket')
+    parser.add_argument('--socket', type=str, default=DEFAULT_SOCKET_PATH, help='Unix socket to listen on')
+    parser.add_argument('--graph_store', type=str, default=None, help='Search this graph store; without one, queries run online searches')
+    parser.add_argument('--cache_path', type=str, default=DEFAULT_CACHE_PATH, help="Cache file for fetched links; pass '' to disable")
+    parser.add_argument('--crawl_store', type=str, default=None, help='Keep crawled links in this directory and reuse them')
+    parser.add_argument('--embedding_index', type=str, default=None, help='Guide a_star and online search with an index built by heuristic.py')
+    parser.add_argument('--landmarks', type=str, default=None, help='Guide a_star with a landmark index built by landmarks.py (needs --graph_store)')
+    parser.add_argument('--sketch_index', type=str, default=None, help='Guide a_star and online search with MinHash link sketches (see minhash.py)')
+    parser.add_argument('--base_url', type=str, default=WIKI_BASE_URL, help='Wiki to search when there is no graph store')
+    parser.add_argument('--raw_titles', action='store_true', help='Keep titles as linked instead of resolving redirects to canonical titles')
+    args = parser.parse_args()
+    if args.landmarks and not args.graph_store:
+        parser.error('--landmarks needs the --graph_store it was built from')
+
+    daemon = SearchDaemon(args.graph_store, args.cache_path, args.crawl_store, args.embedding_index, args.landmarks,
+                          args.base_url, args.raw_titles, args.sketch_index)
+    try:
+        asyncio.run(serve(daemon, args.socket))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+# Constants
+DEFAULT_SOCKET_PATH = os.path.join("cache", "daemon.sock")
+
+# Only the standard library is imported here, so a query costs an interpreter start and one round trip
+
+def query(request, socket_path=DEFAULT_SOCKET_PATH):
+    """Sends one request to a running daemon.py and returns its answer."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with connection.makefile('rb') as answer:
+            line = answer.readline()
+    if not line:
+        raise ConnectionError(f"The daemon at {socket_path} closed the connection without answering")
+    return json.loads(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Find a path through a running search daemon (see daemon.py)')
+    parser.add_argument('--start_page', type=str, required=True, help='Start Wikipedia page title')
+    parser.add_argument('--end_page', type=str, required=True, help='End Wikipedia page title')
+    parser.add_argument('--algorithm', choices=['bfs', 'bidirectional', 'dfs', 'dijkstra', 'a_star', 'online'], default=None,
+                        help="Search algorithm (default: 'bidirectional' over a graph store, otherwise 'online')")
+    parser.add_argument('--max_pages', type=int, default=1000, help='Most pages an online search may fetch')
+    parser.add_argument('--socket', type=str, default=DEFAULT_SOCKET_PATH, help='Unix socket the daemon listens on')
+    args = parser.parse_args()
+
+    request = {'start': args.start_page, 'end': args.end_page, 'algorithm': args.algorithm, 'max_pages': args.max_pages}
+    try:
+        answer = query(request, args.socket)
+    except (OSError, ValueError) as e:
+        print(f"Could not reach the search daemon at {args.socket}: {e}")
+        sys.exit(2)
+    if 'error' in answer:
+        print(f"An error occurred during path finding: {answer['error']}")
+        sys.exit(1)
+    if answer['path']:
+        print("Path found:", " -> ".join(answer['path']))
+    else:
+        print(f"No path found between {answer['start']} and {answer['end']} using {answer['algorithm']} algorithm.")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
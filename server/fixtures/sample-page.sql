@@ -0,0 +1,27 @@
+-- MySQL dump 10.19  Distrib 10.3.38-MariaDB, for debian-linux-gnu (x86_64)
+--
+-- Host: db1206    Database: enwiki
+-- ------------------------------------------------------
+-- A small excerpt in the layout of enwiki-latest-page.sql, for trying the graph store import offline.
+
+DROP TABLE IF EXISTS `page`;
+CREATE TABLE `page` (
+  `page_id` int(8) unsigned NOT NULL AUTO_INCREMENT,
+  `page_namespace` int(11) NOT NULL DEFAULT 0,
+  `page_title` varbinary(255) NOT NULL DEFAULT '',
+  `page_is_redirect` tinyint(1) unsigned NOT NULL DEFAULT 0,
+  `page_is_new` tinyint(1) unsigned NOT NULL DEFAULT 0,
+  `page_random` double unsigned NOT NULL DEFAULT 0,
+  `page_touched` binary(14) NOT NULL,
+  `page_links_updated` varbinary(14) DEFAULT NULL,
+  `page_latest` int(8) unsigned NOT NULL DEFAULT 0,
+  `page_len` int(8) unsigned NOT NULL DEFAULT 0,
+  `page_content_model` varbinary(32) DEFAULT NULL,
+  `page_lang` varbinary(35) DEFAULT NULL,
+  PRIMARY KEY (`page_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+
+/*!40000 ALTER TABLE `page` DISABLE KEYS */;
+INSERT INTO `page` VALUES (1001,0,'Martin_Wirsing',0,0,0.181,'20240401000000','20240401000000',1201,5120,'wikitext',NULL),(1002,0,'Ludwig_Maximilian_University_of_Munich',0,0,0.512,'20240401000000','20240401000000',1202,48000,'wikitext',NULL),(1003,0,'Computer_science',0,0,0.733,'20240401000000','20240401000000',1203,91000,'wikitext',NULL),(1004,0,'Algebraic_specification',0,0,0.094,'20240401000000','20240401000000',1204,7300,'wikitext',NULL),(1005,0,'Mathematical_logic',0,0,0.406,'20240401000000','20240401000000',1205,64000,'wikitext',NULL),(1006,0,'David_Hilbert',0,0,0.877,'20240401000000','20240401000000',1206,52000,'wikitext',NULL);
+INSERT INTO `page` VALUES (1007,0,'University_of_Göttingen',0,0,0.259,'20240401000000','20240401000000',1207,38000,'wikitext',NULL),(1008,0,'Hilbert\'s_problems',0,0,0.641,'20240401000000','20240401000000',1208,29000,'wikitext',NULL),(1009,0,'Munich',0,0,0.318,'20240401000000','20240401000000',1209,120000,'wikitext',NULL),(1010,0,'Germany',0,0,0.955,'20240401000000','20240401000000',1210,250000,'wikitext',NULL),(1011,4,'Contents',0,0,0.027,'20240401000000','20240401000000',1211,900,'wikitext',NULL),(1012,0,'Formal_methods',0,0,0.588,'20240401000000','20240401000000',1212,21000,'wikitext',NULL);
+/*!40000 ALTER TABLE `page` ENABLE KEYS */;
@@ -0,0 +1,19 @@
+-- MySQL dump 10.19  Distrib 10.3.38-MariaDB, for debian-linux-gnu (x86_64)
+--
+-- Host: db1206    Database: enwiki
+-- ------------------------------------------------------
+-- A small excerpt in the layout of enwiki-latest-pagelinks.sql, for trying the graph store import offline.
+
+DROP TABLE IF EXISTS `pagelinks`;
+CREATE TABLE `pagelinks` (
+  `pl_from` int(8) unsigned NOT NULL DEFAULT 0,
+  `pl_namespace` int(11) NOT NULL DEFAULT 0,
+  `pl_title` varbinary(255) NOT NULL DEFAULT '',
+  `pl_from_namespace` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`pl_from`,`pl_namespace`,`pl_title`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+
+/*!40000 ALTER TABLE `pagelinks` DISABLE KEYS */;
+INSERT INTO `pagelinks` VALUES (1001,0,'Ludwig_Maximilian_University_of_Munich',0),(1001,0,'Computer_science',0),(1001,0,'Algebraic_specification',0),(1001,0,'Formal_methods',0),(1001,4,'Contents',0),(1002,0,'Munich',0),(1002,0,'Germany',0),(1002,0,'Computer_science',0),(1003,0,'Mathematical_logic',0),(1003,0,'Formal_methods',0),(1004,0,'Formal_methods',0),(1004,0,'Mathematical_logic',0);
+INSERT INTO `pagelinks` VALUES (1005,0,'David_Hilbert',0),(1005,0,'Computer_science',0),(1006,0,'University_of_Göttingen',0),(1006,0,'Hilbert\'s_problems',0),(1006,0,'Mathematical_logic',0),(1006,0,'Germany',0),(1007,0,'David_Hilbert',0),(1007,0,'Germany',0),(1008,0,'David_Hilbert',0),(1009,0,'Germany',0),(1010,0,'Munich',0),(1012,0,'Computer_science',0),(1012,0,'Mathematical_logic',0),(1012,0,'Missing_article',0),(1011,0,'Germany',4);
+/*!40000 ALTER TABLE `pagelinks` ENABLE KEYS */;
@@ -0,0 +1,275 @@
+import argparse
+import bisect
+import gzip
+import json
+import mmap
+import os
+import re
+from array import array
+import numpy as np
+
+# Constants
+STORE_VERSION = 1
+ARTICLE_NAMESPACE = 0
+
+# One parenthesised row of an extended INSERT, and the fields inside it
+ROW_PATTERN = re.compile(r"\(((?:'(?:[^'\\]|\\.)*'|[^'()])*)\)")
+FIELD_PATTERN = re.compile(r"'((?:[^'\\]|\\.)*)'|([^,]+)")
+ESCAPE_PATTERN = re.compile(r"\\(.)")
+MYSQL_ESCAPES = {'0': '\0', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+
+def normalize_title(title):
+    """MediaWiki's form of a title: spaces for underscores, runs of whitespace collapsed, first letter upper case."""
+    title = ' '.join(title.replace('_', ' ').split())
+    return title[:1].upper() + title[1:]
+
+def _open_dump(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+def _parse_field(match):
+    quoted, bare = match.groups()
+    if quoted is not None:
+        return ESCAPE_PATTERN.sub(lambda m: MYSQL_ESCAPES.get(m.group(1), m.group(1)), quoted)
+    bare = bare.strip()
+    if bare == 'NULL':
+        return None
+    try:
+        return int(bare)
+    except ValueError:
+        return bare
+
+def iter_dump_rows(path):
+    """Streams the rows of every INSERT statement in a MySQL dump as tuples, one line at a time."""
+    with _open_dump(path) as dump:
+        for line in dump:
+            if not line.startswith('INSERT INTO'):
+                continue
+            for row in ROW_PATTERN.finditer(line, line.index(' VALUES ')):
+                yield tuple(_parse_field(field) for field in FIELD_PATTERN.finditer(row.group(1)))
+
+def read_pages(page_dump):
+    """Maps article titles to dense node ids in dump order. Redirect pages (page_is_redirect) get no
+    node; returns (titles, page_id -> node id, redirect page_id -> redirect title)."""
+    titles = []
+    node_of_page = {}
+    redirect_titles = {}
+    for row in iter_dump_rows(page_dump):
+        page_id, namespace, title, is_redirect = row[0], row[1], row[2], row[3]
+        if namespace != ARTICLE_NAMESPACE:
+            continue
+        if is_redirect:
+            redirect_titles[page_id] = normalize_title(title)
+            continue
+        node_of_page[page_id] = len(titles)
+        titles.append(normalize_title(title))
+    return titles, node_of_page, redirect_titles
+
+def read_redirects(redirect_dump):
+    """Maps redirect page ids to the article title they lead to, from a redirect table dump."""
+    targets = {}
+    for row in iter_dump_rows(redirect_dump):
+        page_id, namespace, title = row[0], row[1], row[2]
+        if namespace == ARTICLE_NAMESPACE:
+            targets[page_id] = normalize_title(title)
+    return targets
+
+def read_link_targets(linktarget_dump):
+    targets = {}
+    for lt_id, namespace, title in iter_dump_rows(linktarget_dump):
+        if namespace == ARTICLE_NAMESPACE:
+            targets[lt_id] = normalize_title(title)
+    return targets
+
+def read_links(pagelinks_dump, node_of_page, node_of_title, link_targets=None):
+    """Streams (source, destination) node id pairs from a pagelinks dump.
+
+    Handles both the classic (pl_from, pl_namespace, pl_title, pl_from_namespace) layout and the
+    newer (pl_from, pl_from_namespace, pl_target_id) layout, which needs the linktarget table.
+    """
+    sources, destinations = array('i'), array('i')
+    for row in iter_dump_rows(pagelinks_dump):
+        if len(row) == 3:
+            if link_targets is None:
+                raise ValueError("This pagelinks dump references pl_target_id; pass the linktarget dump as well")
+            page_id, from_namespace, target_id = row
+            title = link_targets.get(target_id)
+        else:
+            page_id, namespace, title, from_namespace = row[:4]
+            title = normalize_title(title) if namespace == ARTICLE_NAMESPACE else None
+        if from_namespace != ARTICLE_NAMESPACE or title is None:
+            continue
+        source = node_of_page.get(page_id)
+        destination = node_of_title.get(title)
+        if source is not None and destination is not None:
+            sources.append(source)
+            destinations.append(destination)
+    return np.frombuffer(sources, dtype=np.int32), np.frombuffer(destinations, dtype=np.int32)
+
+def _csr(sources, destinations, node_count):
+    """Sorted, de-duplicated CSR arrays: row i's neighbors are adjacency[offsets[i]:offsets[i + 1]]."""
+    keys = np.unique((sources.astype(np.int64) << 32) | destinations.astype(np.int64))
+    rows = (keys >> 32).astype(np.int32)
+    adjacency = (keys & 0xFFFFFFFF).astype(np.int32)
+    offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=node_count), out=offsets[1:])
+    return offsets, adjacency
+
+def gather_neighbors(offsets, adjacency, nodes):
+    """Concatenated CSR rows of every node in `nodes`, gathered with one fancy index instead of a Python loop."""
+    starts = np.asarray(offsets[nodes], dtype=np.int64)
+    counts = np.asarray(offsets[nodes + 1], dtype=np.int64) - starts
+    total = int(counts.sum())
+    if not total:
+        return np.empty(0, dtype=adjacency.dtype)
+    # Position k of the output is starts[j] + (k - first output position of row j)
+    row_starts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return adjacency[row_starts + np.arange(total)]
+
+def write_store(out_dir, titles, sources, destinations):
+    """Writes the memory-mappable graph files for `titles` and the edge list into `out_dir`."""
+    os.makedirs(out_dir, exist_ok=True)
+    node_count = len(titles)
+    offsets, adjacency = _csr(sources, destinations, node_count)
+    in_offsets, in_adjacency = _csr(destinations, sources, node_count)
+
+    encoded = [title.encode('utf-8') for title in titles]
+    title_offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum([len(title) for title in encoded], out=title_offsets[1:])
+    title_index = np.array(sorted(range(node_count), key=encoded.__getitem__), dtype=np.int32)
+
+    with open(os.path.join(out_dir, 'titles.bin'), 'wb') as file:
+        file.write(b''.join(encoded))
+    np.save(os.path.join(out_dir, 'title_offsets.npy'), title_offsets)
+    np.save(os.path.join(out_dir, 'title_index.npy'), title_index)
+    np.save(os.path.join(out_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(out_dir, 'adjacency.npy'), adjacency)
+    np.save(os.path.join(out_dir, 'in_offsets.npy'), in_offsets)
+    np.save(os.path.join(out_dir, 'in_adjacency.npy'), in_adjacency)
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as file:
+        json.dump({'version': STORE_VERSION, 'nodes': node_count, 'edges': int(len(adjacency))}, file)
+
+def import_dump(page_dump, pagelinks_dump, out_dir, linktarget_dump=None, redirect_dump=None):
+    titles, node_of_page, redirect_titles = read_pages(page_dump)
+    node_of_title = {title: node for node, title in enumerate(titles)}
+    if redirect_dump:
+        # Links to a redirect count as links to its article; without the dump they are dropped
+        for page_id, target in read_redirects(redirect_dump).items():
+            if page_id in redirect_titles and target in node_of_title:
+                node_of_title.setdefault(redirect_titles[page_id], node_of_title[target])
+    link_targets = read_link_targets(linktarget_dump) if linktarget_dump else None
+    sources, destinations = read_links(pagelinks_dump, node_of_page, node_of_title, link_targets)
+    write_store(out_dir, titles, sources, destinations)
+    return len(titles), len(sources)
+
+class _SortedTitles:
+    """Sequence view of the titles in sorted order, so bisect can search the index without loading it."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __len__(self):
+        return len(self.graph.title_index)
+
+    def __getitem__(self, position):
+        return self.graph._title_bytes(int(self.graph.title_index[position]))
+
+class LinkGraph:
+    """Read-only link graph over memory-mapped CSR arrays.
+
+    Behaves like the dict-of-lists produced by crawler.build_graph (title -> list of linked titles),
+    so the search algorithms can run on it unchanged, and also exposes integer-id access.
+    """
+
+    def __init__(self, store_dir, _arrays=None):
+        self.store_dir = store_dir
+        if _arrays is not None:
+            (self.offsets, self.adjacency, self.in_offsets, self.in_adjacency,
+             self.title_offsets, self.title_index, self._titles) = _arrays
+            return
+        load = lambda name: np.load(os.path.join(store_dir, name), mmap_mode='r')
+        self.offsets = load('offsets.npy')
+        self.adjacency = load('adjacency.npy')
+        self.in_offsets = load('in_offsets.npy')
+        self.in_adjacency = load('in_adjacency.npy')
+        self.title_offsets = load('title_offsets.npy')
+        self.title_index = load('title_index.npy')
+        with open(os.path.join(store_dir, 'titles.bin'), 'rb') as file:
+            self._titles = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b''
+
+    @property
+    def node_count(self):
+        return len(self.offsets) - 1
+
+    @property
+    def edge_count(self):
+        return len(self.adjacency)
+
+    def reversed(self):
+        """The same store with edge directions flipped (page -> pages linking to it)."""
+        return LinkGraph(self.store_dir, (self.in_offsets, self.in_adjacency, self.offsets, self.adjacency,
+                                          self.title_offsets, self.title_index, self._titles))
+
+    def _title_bytes(self, node):
+        return self._titles[self.title_offsets[node]:self.title_offsets[node + 1]]
+
+    def title_of(self, node):
+        return self._title_bytes(node).decode('utf-8')
+
+    def id_of(self, title):
+        key = normalize_title(title).encode('utf-8')
+        sorted_titles = _SortedTitles(self)
+        position = bisect.bisect_left(sorted_titles, key)
+        if position < len(sorted_titles) and sorted_titles[position] == key:
+            return int(self.title_index[position])
+        return None
+
+    def neighbor_ids(self, node):
+        return self.adjacency[self.offsets[node]:self.offsets[node + 1]]
+
+    def degree(self, node):
+        return int(self.offsets[node + 1] - self.offsets[node])
+
+    def __contains__(self, title):
+        return self.id_of(title) is not None
+
+    def __getitem__(self, title):
+        node = self.id_of(title)
+        if node is None:
+            raise KeyError(title)
+        return [self.title_of(int(neighbor)) for neighbor in self.neighbor_ids(node)]
+
+    def get(self, title, default=None):
+        try:
+            return self[title]
+        except KeyError:
+            return default
+
+    def __len__(self):
+        return self.node_count
+
+    def __iter__(self):
+        return (self.title_of(node) for node in range(self.node_count))
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        return ((self.title_of(node), [self.title_of(int(n)) for n in self.neighbor_ids(node)])
+                for node in range(self.node_count))
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a memory-mapped link graph from Wikipedia SQL dumps')
+    parser.add_argument('--page', required=True, help='page table dump (.sql or .sql.gz)')
+    parser.add_argument('--pagelinks', required=True, help='pagelinks table dump (.sql or .sql.gz)')
+    parser.add_argument('--linktarget', default=None, help='linktarget table dump, for dumps that use pl_target_id')
+    parser.add_argument('--redirect', default=None, help='redirect table dump, to count links to redirects as links to their articles')
+    parser.add_argument('--out', default='graph_store', help='Directory to write the graph store to')
+    args = parser.parse_args()
+
+    nodes, edges = import_dump(args.page, args.pagelinks, args.out, args.linktarget, args.redirect)
+    print(f"Imported {nodes} pages and {edges} links into {args.out}")
+
+if __name__ == '__main__':
+    main()
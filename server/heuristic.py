@@ -1,27 +1,31 @@
-import requests
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.decomposition import TruncatedSVD
+import argparse
+import asyncio
 import numpy as np
-from bs4 import BeautifulSoup
 import re
-from hashlib import md5
 import os
 import json
+import pickle
+from cache import KVCache
+from metrics import HEURISTIC_SECONDS
 
 class WikipediaTextFetcher:
     API_URL = "https://en.wikipedia.org/w/api.php"
+    TITLES_PER_REQUEST = 50  # MediaWiki's limit on titles per query
 
-    def __init__(self, cache_dir="cache"):
-        self.cache_dir = cache_dir
-        os.makedirs(cache_dir, exist_ok=True)
+    CACHE_PREFIX = 'text:'  # Full page text, from fetch_text
+    INTRO_CACHE_PREFIX = 'intro:'  # Lead section only, from fetch_texts
+
+    def __init__(self, cache_dir="cache", api_url=API_URL, cache=None):
+        self.cache = cache if cache is not None else KVCache(os.path.join(cache_dir, 'cache.db'))
+        self.api_url = api_url
+        self.in_flight = {}
 
     def fetch_text(self, title):
-        cache_file = self._cache_file_path(title)
+        import requests
         try:
-            if os.path.exists(cache_file):
-                with open(cache_file, 'r') as file:
-                    return json.load(file)['text']
+            cached = self.cache.get(self.CACHE_PREFIX + title)
+            if cached is not None:
+                return cached
             
             # Fetch from Wikipedia API if not cached
             params = {
@@ -32,7 +36,7 @@ class WikipediaTextFetcher:
                 'explaintext': True,
                 'exsectionformat': 'wiki'
             }
-            response = requests.get(self.API_URL, params=params)
+            response = requests.get(self.api_url, params=params)
             response.raise_for_status()  # Raises HTTPError for bad responses
             data = response.json()
             
@@ -46,19 +50,104 @@ class WikipediaTextFetcher:
             page = next(iter(pages.values()))
             text = page.get('extract', '')
             
-            with open(cache_file, 'w') as file:
-                json.dump({'text': text}, file)
+            self.cache.put(self.CACHE_PREFIX + title, text)
             
             return text
         except (requests.exceptions.RequestException, ValueError, KeyError) as e:
             raise Exception(f"Error while fetching text for {title}: {str(e)}") from e
 
-    def _cache_file_path(self, title):
-        filename = md5(title.encode('utf-8')).hexdigest() + '.json'
-        return os.path.join(self.cache_dir, filename)
+    async def fetch_texts(self, titles, client=None):
+        """Fetches {title: text} for many titles, TITLES_PER_REQUEST titles per API request.
+
+        Titles already being fetched by another call are awaited rather than requested again. Several
+        extracts per request are only served for the lead section, so pages fetched this way cache
+        their introduction under INTRO_CACHE_PREFIX, apart from the full text fetch_text stores.
+        """
+        texts, pending, requested = {}, {}, []
+        cached = self.cache.get_many(self.INTRO_CACHE_PREFIX + title for title in titles)
+        for title in dict.fromkeys(titles):
+            if self.INTRO_CACHE_PREFIX + title in cached:
+                texts[title] = cached[self.INTRO_CACHE_PREFIX + title]
+            elif title in self.in_flight:
+                pending[title] = self.in_flight[title]
+            else:
+                requested.append(title)
+
+        loop = asyncio.get_running_loop()
+        for title in requested:
+            self.in_flight[title] = pending[title] = loop.create_future()
+        if requested:
+            try:
+                if client is None:
+                    from network import AsyncHTTPClient
+                    async with AsyncHTTPClient() as client:
+                        fetched = await self._fetch_batches(requested, client)
+                else:
+                    fetched = await self._fetch_batches(requested, client)
+                self.cache.put_many({self.INTRO_CACHE_PREFIX + title: text for title, text in fetched.items()})
+                for title in requested:
+                    self.in_flight.pop(title).set_result(fetched.get(title, ''))
+            except Exception as e:
+                for title in requested:
+                    self.in_flight.pop(title).set_exception(e)
+                raise
+            finally:
+                # A cancelled fetch raises CancelledError, which is no Exception; cancel its waiters too
+                for title in requested:
+                    future = self.in_flight.pop(title, None)
+                    if future is not None:
+                        future.cancel()
+
+        for title, future in pending.items():
+            texts[title] = await future
+        return texts
+
+    async def _fetch_batches(self, titles, client):
+        batches = [titles[i:i + self.TITLES_PER_REQUEST] for i in range(0, len(titles), self.TITLES_PER_REQUEST)]
+        texts = {}
+        for batch_texts in await asyncio.gather(*(self._fetch_batch(batch, client) for batch in batches)):
+            texts.update(batch_texts)
+        return texts
+
+    async def _fetch_batch(self, titles, client):
+        with HEURISTIC_SECONDS.time(operation='fetch'):
+            return await self._query_extracts(titles, client)
+
+    async def _query_extracts(self, titles, client):
+        from network import follow_title_changes, iter_api_query
+        params = {
+            'titles': '|'.join(titles),
+            'prop': 'extracts',
+            'explaintext': 1,
+            'exintro': 1,
+            'exlimit': 'max',
+            'redirects': 1,
+        }
+        # The API answers under normalized/redirected titles; map those back to the titles asked for
+        resolved = {title: title for title in titles}
+        extracts = {}
+        async for query in iter_api_query(client, self.api_url, params):
+            follow_title_changes(resolved, query)
+            for page in query.get('pages', []):
+                if 'extract' in page:
+                    extracts[page['title']] = page['extract']
+        return {title: extracts[target] for title, target in resolved.items() if target in extracts}
+
+    def cached_texts(self):
+        """Yields (title, text) for every page whose text is in the cache, preferring the full text
+        over the introduction when both are."""
+        seen = set()
+        for prefix in (self.CACHE_PREFIX, self.INTRO_CACHE_PREFIX):
+            keys = [key for key in self.cache.keys(prefix) if key[len(prefix):] not in seen]
+            for i in range(0, len(keys), 1000):
+                for key, text in self.cache.get_many(keys[i:i + 1000]).items():
+                    if text:
+                        seen.add(key[len(prefix):])
+                        yield key[len(prefix):], text
 
 class TextPreprocessor:
     def preprocess_text(self, text):
+        from bs4 import BeautifulSoup
         try:
             soup = BeautifulSoup(text, 'html.parser')
             text = soup.get_text()
@@ -69,6 +158,8 @@ class TextPreprocessor:
 
 class TextSimilarity:
     def __init__(self, corpus=None):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.decomposition import TruncatedSVD
         self.vectorizer = TfidfVectorizer()
         self.svd = TruncatedSVD(n_components=100)
         self.is_fitted = False
@@ -78,6 +169,7 @@ class TextSimilarity:
     def compute_similarity(self, text1, text2):
         if not self.is_fitted:
             raise ValueError("Model is not fitted. Call fit() method first.")
+        from sklearn.metrics.pairwise import cosine_similarity
         try:
             transformed_texts = self.vectorizer.transform([text1, text2])
             transformed_texts = self.svd.transform(transformed_texts)
@@ -97,6 +189,154 @@ class TextSimilarity:
     def reset(self):
         self.is_fitted = False
 
-def compute_textual_similarity(text1, text2):
-    similarity_calculator = TextSimilarity()
-    return similarity_calculator.compute_similarity(text1, text2)
+class EmbeddingIndex:
+    """TF-IDF + SVD page vectors, fitted once and stored L2-normalized in a NumPy memmap, one row per page.
+
+    Because rows are unit length, scoring a whole list of pages against a target is one matrix-vector product.
+    """
+    MODEL_FILE = 'model.pkl'
+    VECTORS_FILE = 'vectors.f32'
+    META_FILE = 'index.json'
+
+    def __init__(self, index_dir='embeddings'):
+        self.index_dir = index_dir
+        self.vectorizer = None
+        self.svd = None
+        self.titles = []
+        self.rows = {}
+        self.vectors = None
+        self.capacity = 0
+
+    @property
+    def dimensions(self):
+        return self.svd.n_components
+
+    def fit(self, corpus, n_components=100):
+        """Fits the model on {title: text} and indexes every page in it."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.preprocessing import normalize
+        titles = list(corpus)
+        self.vectorizer = TfidfVectorizer(sublinear_tf=True, stop_words='english')
+        tfidf_matrix = self.vectorizer.fit_transform(corpus[title] for title in titles)
+        n_components = max(1, min(n_components, tfidf_matrix.shape[0] - 1, tfidf_matrix.shape[1] - 1))
+        self.svd = TruncatedSVD(n_components=n_components)
+        vectors = normalize(self.svd.fit_transform(tfidf_matrix)).astype(np.float32)
+        self.titles, self.rows = [], {}
+        self._open_vectors(len(titles), create=True)
+        self._append(titles, vectors)
+        self.save()
+
+    def transform(self, texts):
+        from sklearn.preprocessing import normalize
+        return normalize(self.svd.transform(self.vectorizer.transform(texts))).astype(np.float32)
+
+    def add(self, corpus):
+        """Indexes new {title: text} pages with the fitted model, without refitting."""
+        new_titles = [title for title in corpus if title not in self.rows]
+        if new_titles:
+            self._append(new_titles, self.transform([corpus[title] for title in new_titles]))
+            self.save()
+
+    def _open_vectors(self, capacity, create=False):
+        path = os.path.join(self.index_dir, self.VECTORS_FILE)
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+        capacity = max(capacity, 1)
+        with open(path, 'wb' if create else 'r+b') as file:
+            file.truncate(capacity * self.dimensions * 4)
+        self.vectors = np.memmap(path, dtype=np.float32, mode='r+', shape=(capacity, self.dimensions))
+        self.capacity = capacity
+
+    def _append(self, titles, vectors):
+        needed = len(self.titles) + len(titles)
+        if needed > self.capacity:
+            self._open_vectors(max(needed, 2 * self.capacity))
+        start = len(self.titles)
+        self.vectors[start:needed] = vectors
+        for row, title in enumerate(titles, start):
+            self.rows[title] = row
+        self.titles.extend(titles)
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.vectors.flush()
+        with open(os.path.join(self.index_dir, self.MODEL_FILE), 'wb') as file:
+            pickle.dump((self.vectorizer, self.svd), file)
+        with open(os.path.join(self.index_dir, self.META_FILE), 'w') as file:
+            json.dump({'capacity': self.capacity, 'titles': self.titles}, file)
+
+    @classmethod
+    def load(cls, index_dir='embeddings'):
+        index = cls(index_dir)
+        with open(os.path.join(index_dir, cls.MODEL_FILE), 'rb') as file:
+            index.vectorizer, index.svd = pickle.load(file)
+        with open(os.path.join(index_dir, cls.META_FILE), 'r') as file:
+            meta = json.load(file)
+        index.titles = meta['titles']
+        index.rows = {title: row for row, title in enumerate(index.titles)}
+        index.capacity = meta['capacity']
+        index.vectors = np.memmap(os.path.join(index_dir, cls.VECTORS_FILE), dtype=np.float32, mode='r+',
+                                  shape=(index.capacity, index.dimensions))
+        return index
+
+    def __contains__(self, title):
+        return title in self.rows
+
+    def similarities(self, titles, target):
+        """Cosine similarity of each page to `target`; pages missing from the index score 0."""
+        with HEURISTIC_SECONDS.time(operation='score'):
+            return self._similarities(titles, target)
+
+    def _similarities(self, titles, target):
+        scores = np.zeros(len(titles), dtype=np.float32)
+        target_row = self.rows.get(target)
+        if target_row is None:
+            return scores
+        rows = np.fromiter((self.rows.get(title, -1) for title in titles), dtype=np.int64, count=len(titles))
+        known = rows >= 0
+        scores[known] = self.vectors[rows[known]] @ self.vectors[target_row]
+        return scores
+
+    def distance_estimates(self, titles, target):
+        """Batch heuristic for a_star_search: 1 - similarity, so closer pages get lower estimates."""
+        return 1.0 - self.similarities(titles, target)
+
+def title_words(title):
+    return set(word.lower() for word in re.findall(r'\w+', title))
+
+def title_overlap_estimates(titles, target):
+    """Batch heuristic from WGIP.md: minus the number of words a title shares with the target's title.
+    Needs no fetching, so it can score every link an online search discovers."""
+    target_words = title_words(target)
+    return [-len(title_words(title) & target_words) for title in titles]
+
+def compute_textual_similarity(text1, text2, index=None):
+    if index is not None:
+        vectors = index.transform([text1, text2])
+        return float(vectors[0] @ vectors[1])
+    # Without a fitted index, compare the two texts by TF-IDF over just this pair
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+    tfidf_matrix = TfidfVectorizer().fit_transform([text1, text2])
+    return cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit the page embedding index over the cached page texts')
+    parser.add_argument('--cache_dir', default='cache', help='Directory holding the page text cache')
+    parser.add_argument('--index_dir', default='embeddings', help='Directory to write the index to')
+    parser.add_argument('--components', type=int, default=100, help='SVD dimensions per page vector')
+    args = parser.parse_args()
+
+    corpus = dict(WikipediaTextFetcher(args.cache_dir).cached_texts())
+    if len(corpus) < 2:
+        print(f"Need at least two cached pages in {args.cache_dir} to fit the index, found {len(corpus)}")
+        return
+    index = EmbeddingIndex(args.index_dir)
+    index.fit(corpus, n_components=args.components)
+    print(f"Indexed {len(index.titles)} pages with {index.dimensions}-dimensional vectors into {args.index_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from metrics import Counter, Gauge
+
+# Constants
+DEFAULT_WORKERS = 4
+MAX_QUEUED_PER_CLIENT = 5
+JOB_RETENTION_SECONDS = 600  # how long finished jobs stay readable
+TERMINAL_EVENTS = ('done', 'failed')  # not 'error', which EventSource also fires on a dropped connection
+
+JOBS_QUEUED = Gauge('wiki_jobs_queued', 'Search jobs waiting for a worker')
+JOBS_RUNNING = Gauge('wiki_jobs_running', 'Search jobs being run')
+JOBS_FINISHED = Counter('wiki_jobs_finished_total', 'Search jobs finished, by outcome')
+
+class Job:
+    """One search request and every event it has published so far."""
+
+    def __init__(self, client_id, start, finish):
+        self.id = uuid.uuid4().hex
+        self.client_id = client_id
+        self.start = start
+        self.finish = finish
+        self.status = 'queued'
+        self.events = []  # (event name, data)
+        self.finished_at = None
+        self._updated = asyncio.Event()
+
+    def publish(self, event, data):
+        self.events.append((event, data))
+        if event in TERMINAL_EVENTS:
+            self.status = event
+            self.finished_at = time.monotonic()
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def stream(self):
+        """Yields every event from the first one, waiting for new ones until the job finishes."""
+        position = 0
+        while True:
+            while position < len(self.events):
+                event = self.events[position]
+                position += 1
+                yield event
+                if event[0] in TERMINAL_EVENTS:
+                    return
+            await self._updated.wait()
+
+    def summary(self):
+        return {'id': self.id, 'status': self.status, 'start': self.start, 'finish': self.finish,
+                'last_event': dict(zip(('event', 'data'), self.events[-1])) if self.events else None}
+
+class JobManager:
+    """Runs search jobs on a fixed number of workers, taking jobs from each client in turn.
+
+    `search(start, finish, on_progress)` is a coroutine returning the result published with the
+    'done' event; `on_progress` is called with each progress report. A client with many queued
+    jobs therefore cannot hold every worker while another client's single job waits.
+    """
+
+    def __init__(self, search, workers=DEFAULT_WORKERS, max_queued_per_client=MAX_QUEUED_PER_CLIENT,
+                 retention=JOB_RETENTION_SECONDS):
+        self.search = search
+        self.worker_count = workers
+        self.max_queued_per_client = max_queued_per_client
+        self.retention = retention
+        self.jobs = {}
+        self.queues = OrderedDict()  # client id -> deque of queued jobs, in round-robin order
+        self.workers = []
+        self.running = 0
+        self.ready = asyncio.Event()  # set while any client has a queued job
+
+    async def start(self, app=None):
+        self.workers = [asyncio.ensure_future(self._work()) for _ in range(self.worker_count)]
+
+    async def stop(self, app=None):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+
+    def submit(self, client_id, start, finish):
+        """Queues a search and returns its Job; raises asyncio.QueueFull if the client has too many waiting."""
+        self._prune()
+        queue = self.queues.setdefault(client_id, deque())
+        if len(queue) >= self.max_queued_per_client:
+            raise asyncio.QueueFull(f"{client_id} already has {len(queue)} queued searches")
+        job = Job(client_id, start, finish)
+        self.jobs[job.id] = job
+        queue.append(job)
+        queued = sum(len(jobs) for jobs in self.queues.values())
+        JOBS_QUEUED.set(queued)
+        job.publish('queued', {'position': queued})
+        self.ready.set()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.retention
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    def _next_job(self):
+        client_id, queue = next(iter(self.queues.items()))
+        job = queue.popleft()
+        if queue:
+            self.queues.move_to_end(client_id)
+        else:
+            del self.queues[client_id]
+        if not self.queues:
+            self.ready.clear()
+        JOBS_QUEUED.set(sum(len(jobs) for jobs in self.queues.values()))
+        return job
+
+    async def _work(self):
+        while True:
+            await self.ready.wait()
+            if self.queues:
+                await self._run(self._next_job())
+
+    async def _run(self, job):
+        job.status = 'running'
+        self.running += 1
+        JOBS_RUNNING.set(self.running)
+        job.publish('started', {'start': job.start, 'finish': job.finish})
+        try:
+            result = await self.search(job.start, job.finish, lambda progress: job.publish('progress', progress))
+        except ValueError as e:
+            job.publish('failed', {'error': str(e)})
+        except Exception as e:
+            logging.error(f"Search job {job.id} failed: {e}")
+            job.publish('failed', {'error': 'An error occurred while finding path'})
+        else:
+            job.publish('done', result)
+        finally:
+            self.running -= 1
+            JOBS_RUNNING.set(self.running)
+            JOBS_FINISHED.inc(outcome=job.status)
@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import numpy as np
+from graph_store import LinkGraph, gather_neighbors
+
+# Constants
+INDEX_VERSION = 1
+UNREACHABLE = 255  # uint8 distances; real distances must stay below this
+DEFAULT_LANDMARKS = 16
+
+def bfs_distances(offsets, adjacency, source):
+    """Hop distance from `source` to every node as uint8, UNREACHABLE where there is no path.
+
+    Level-synchronous BFS over CSR arrays: each level is one gather of the frontier's rows.
+    """
+    distances = np.full(len(offsets) - 1, UNREACHABLE, dtype=np.uint8)
+    distances[source] = 0
+    frontier = np.array([source], dtype=np.int64)
+    depth = 0
+    while frontier.size:
+        depth += 1
+        neighbors = gather_neighbors(offsets, adjacency, frontier)
+        frontier = np.unique(neighbors[distances[neighbors] == UNREACHABLE]).astype(np.int64)
+        if frontier.size and depth >= UNREACHABLE:
+            raise ValueError(f"Paths from node {source} are longer than {UNREACHABLE - 1} links")
+        distances[frontier] = depth
+    return distances
+
+def degrees(graph):
+    return np.diff(graph.offsets) + np.diff(graph.in_offsets)
+
+def build_landmarks(graph, count=DEFAULT_LANDMARKS, strategy='degree'):
+    """Picks `count` landmarks and returns (landmarks, to_landmarks, from_landmarks).
+
+    to_landmarks[v, i] is the distance from v to landmark i and from_landmarks[v, i] the distance
+    from landmark i to v. 'degree' takes the best-connected pages; 'farthest' starts from the best
+    connected one and then repeatedly adds the page farthest from the landmarks chosen so far,
+    which spreads them across the graph.
+    """
+    node_degrees = degrees(graph)
+    count = min(count, graph.node_count)
+    reverse = graph.reversed()
+    if strategy == 'degree':
+        order = np.argsort(-node_degrees, kind='stable')[:count]
+    elif strategy != 'farthest':
+        raise ValueError(f"Unknown landmark strategy {strategy!r}; use 'degree' or 'farthest'")
+
+    landmarks, to_columns, from_columns = [], [], []
+    nearest = np.full(graph.node_count, UNREACHABLE, dtype=np.int64)
+    for i in range(count):
+        if strategy == 'degree':
+            landmark = int(order[i])
+        elif not landmarks:
+            landmark = int(np.argmax(node_degrees))
+        else:
+            # Farthest reachable page from every landmark so far, best connected among ties
+            candidates = np.where(nearest < UNREACHABLE, nearest, -1)
+            candidates[landmarks] = -1
+            landmark = int(np.lexsort((-node_degrees, -candidates))[0])
+        landmarks.append(landmark)
+        from_columns.append(bfs_distances(graph.offsets, graph.adjacency, landmark))
+        to_columns.append(bfs_distances(reverse.offsets, reverse.adjacency, landmark))
+        nearest = np.minimum(nearest, from_columns[-1])
+    # Node-major layout keeps the k distances of one page next to each other
+    return landmarks, np.stack(to_columns, axis=1), np.stack(from_columns, axis=1)
+
+def write_landmarks(out_dir, graph, landmarks, to_landmarks, from_landmarks):
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, 'to_landmarks.npy'), to_landmarks)
+    np.save(os.path.join(out_dir, 'from_landmarks.npy'), from_landmarks)
+    with open(os.path.join(out_dir, 'landmarks.json'), 'w') as file:
+        json.dump({'version': INDEX_VERSION, 'nodes': graph.node_count, 'landmarks': landmarks,
+                   'titles': [graph.title_of(landmark) for landmark in landmarks]}, file)
+
+class LandmarkIndex:
+    """ALT lower bounds on link distance from precomputed landmark distances.
+
+    For every landmark L, d(v, t) >= d(v, L) - d(t, L) and d(v, t) >= d(L, t) - d(L, v), so the
+    largest of these bounds is an admissible A* heuristic. It costs O(k) per page and no I/O.
+    """
+
+    def __init__(self, index_dir, graph):
+        with open(os.path.join(index_dir, 'landmarks.json')) as file:
+            meta = json.load(file)
+        if meta['nodes'] != graph.node_count:
+            raise ValueError(f"Landmark index {index_dir} was built for a graph with {meta['nodes']} pages, not {graph.node_count}")
+        self.graph = graph
+        self.landmarks = meta['landmarks']
+        self.to_landmarks = np.load(os.path.join(index_dir, 'to_landmarks.npy'), mmap_mode='r')
+        self.from_landmarks = np.load(os.path.join(index_dir, 'from_landmarks.npy'), mmap_mode='r')
+        self._target = None
+
+    @classmethod
+    def load(cls, index_dir, graph):
+        return cls(index_dir, graph)
+
+    @staticmethod
+    def _hops(distances):
+        distances = np.asarray(distances, dtype=np.float64)
+        distances[distances == UNREACHABLE] = np.inf
+        return distances
+
+    def lower_bounds(self, nodes, target):
+        """Lower bounds on the distance from each node id to the target id; inf where the target cannot be reached."""
+        if self._target is None or self._target[0] != target:
+            target_to, target_from = self._hops(self.to_landmarks[target]), self._hops(self.from_landmarks[target])
+            self._target = (target, np.isfinite(target_to), np.isfinite(target_from),
+                            np.where(np.isfinite(target_to), target_to, 0), np.where(np.isfinite(target_from), target_from, 0))
+        _, to_known, from_known, target_to, target_from = self._target
+        nodes = np.asarray(nodes, dtype=np.int64)
+        node_to = self._hops(self.to_landmarks[nodes])
+        node_from = self._hops(self.from_landmarks[nodes])
+        # A bound only holds when the landmark distance it subtracts is finite. If L reaches v but not t,
+        # v cannot reach t either; if v cannot reach L but t can, the same follows.
+        via_to = np.where(to_known, node_to - target_to, 0)
+        via_from = np.where(from_known, target_from - node_from, np.where(np.isfinite(node_from), np.inf, 0))
+        return np.maximum(np.maximum(via_to, via_from).max(axis=1), 0)
+
+    def distance_estimates(self, titles, target):
+        """Batch heuristic for a_star_search over graph titles; pages missing from the graph get 0."""
+        estimates = np.zeros(len(titles))
+        target_id = self.graph.id_of(target)
+        if target_id is None:
+            return estimates
+        node_ids = [self.graph.id_of(title) for title in titles]
+        known = [position for position, node in enumerate(node_ids) if node is not None]
+        if known:
+            estimates[known] = self.lower_bounds([node_ids[position] for position in known], target_id)
+        return estimates
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute landmark distances for the A* heuristic over a graph store')
+    parser.add_argument('--graph_store', required=True, help='Graph store built by graph_store.py')
+    parser.add_argument('--landmarks', type=int, default=DEFAULT_LANDMARKS, help='Number of landmark pages')
+    parser.add_argument('--strategy', choices=['degree', 'farthest'], default='degree', help='How landmarks are picked')
+    parser.add_argument('--out', default='landmarks', help='Directory to write the landmark index to')
+    args = parser.parse_args()
+
+    graph = LinkGraph(args.graph_store)
+    landmarks, to_landmarks, from_landmarks = build_landmarks(graph, args.landmarks, args.strategy)
+    write_landmarks(args.out, graph, landmarks, to_landmarks, from_landmarks)
+    print(f"Wrote {len(landmarks)} landmarks for {graph.node_count} pages to {args.out}: "
+          f"{', '.join(graph.title_of(landmark) for landmark in landmarks[:5])}{', ...' if len(landmarks) > 5 else ''}")
+
+if __name__ == '__main__':
+    main()
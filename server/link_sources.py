@@ -0,0 +1,179 @@
+import asyncio
+import os
+from urllib.parse import quote
+from utils import parse_links, parse_link_titles, extract_title
+
+WIKI_BASE_URL = "https://en.wikipedia.org"
+PARSE_QUEUE_SIZE = 16  # fetched pages allowed to wait for a parse worker
+API_URL = f"{WIKI_BASE_URL}/w/api.php"
+
+def article_url(title, base_url=WIKI_BASE_URL):
+    return f"{base_url}/wiki/{quote(title.replace(' ', '_'), safe=':/')}"
+
+async def fetch_and_parse_links(page_url, client=None, base_url=WIKI_BASE_URL):
+    try:
+        if client is None:
+            from network import AsyncHTTPClient
+            async with AsyncHTTPClient() as client:
+                content = await client.get(page_url)
+        else:
+            content = await client.get(page_url)
+        links = []
+        for link in parse_links(content, base_url=base_url):
+            try:
+                title = extract_title(link)
+                links.append(title)
+            except Exception as e:
+                print(f"Failed to parse link {link} for {page_url}: {e}")
+        return links
+    except Exception as e:
+        print(f"Failed to fetch content for {page_url}: {e}")
+        return []
+
+async def fetch_revisions(client, api_url, titles, batch_size=50):
+    """Returns {title: latest revision id} for the titles that exist, 50 titles per API request (prop=info)."""
+    from network import follow_title_changes, iter_api_query
+    titles = list(dict.fromkeys(titles))
+    revisions = {}
+    for i in range(0, len(titles), batch_size):
+        resolved = {title: title for title in titles[i:i + batch_size]}
+        params = {'prop': 'info', 'titles': '|'.join(resolved), 'redirects': 1}
+        current_revisions = {}
+        async for query in iter_api_query(client, api_url, params):
+            follow_title_changes(resolved, query)
+            for page in query.get('pages', []):
+                if 'lastrevid' in page:
+                    current_revisions[page['title']] = page['lastrevid']
+        revisions.update({title: current_revisions[current] for title, current in resolved.items() if current in current_revisions})
+    return revisions
+
+class HTMLLinkSource:
+    """Outgoing links parsed from each page's article HTML, one request per page. Has no incoming links.
+
+    Given a `parse_pool` (a ProcessPoolExecutor), pages go through a fetch -> parse pipeline: fetch
+    workers put HTML on a bounded queue and parse workers hand it to the pool, so parsing uses every
+    core and never blocks the event loop. Fetching pauses while the queue is full.
+    """
+    supports_backward = False
+
+    def __init__(self, client, base_url=WIKI_BASE_URL, parse_pool=None, parse_workers=None, queue_size=PARSE_QUEUE_SIZE):
+        self.client = client
+        self.base_url = base_url
+        self.parse_pool = parse_pool
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+
+    async def revisions(self, titles):
+        """Returns {title: latest revision id}, asked of the site's API since article HTML does not carry it."""
+        return await fetch_revisions(self.client, f"{self.base_url}/w/api.php", titles)
+
+    async def exists(self, titles):
+        try:
+            for title in titles:
+                await self.client.get(article_url(title, self.base_url))
+            return True
+        except Exception as e:
+            print(f"An error occurred while checking start and end pages: {e}")
+            return False
+
+    async def forward(self, titles):
+        """Returns {title: [linked titles]}."""
+        if self.parse_pool is None:
+            results = await asyncio.gather(*(
+                fetch_and_parse_links(article_url(title, self.base_url), self.client, self.base_url) for title in titles
+            ))
+            return dict(zip(titles, results))
+
+        loop = asyncio.get_running_loop()
+        titles = list(dict.fromkeys(titles))
+        pending = iter(titles)
+        pages = asyncio.Queue(maxsize=self.queue_size)
+        links = {}
+
+        async def fetch_stage():
+            for title in pending:
+                try:
+                    html = await self.client.get(article_url(title, self.base_url))
+                except Exception as e:
+                    print(f"Failed to fetch content for {article_url(title, self.base_url)}: {e}")
+                    html = None
+                await pages.put((title, html))
+
+        async def parse_stage():
+            while True:
+                title, html = await pages.get()
+                try:
+                    links[title] = await loop.run_in_executor(self.parse_pool, parse_link_titles, html, self.base_url) if html else []
+                except Exception as e:
+                    print(f"Failed to parse links for {article_url(title, self.base_url)}: {e}")
+                    links[title] = []
+                finally:
+                    pages.task_done()
+
+        fetchers = [asyncio.ensure_future(fetch_stage()) for _ in range(min(len(titles), self.client.max_parallel_requests))]
+        parsers = [asyncio.ensure_future(parse_stage()) for _ in range(min(len(titles), self.parse_workers))]
+        try:
+            await asyncio.gather(*fetchers)
+            await pages.join()
+        finally:
+            for task in fetchers + parsers:
+                task.cancel()
+        return {title: links.get(title, []) for title in titles}
+
+class APILinkSource:
+    """Outgoing (prop=links) and incoming (prop=linkshere) article links from the MediaWiki API.
+
+    Up to TITLES_PER_REQUEST pages are asked for per request and pagination is followed, so a whole
+    frontier costs a few small JSON responses instead of one HTML page per title.
+    """
+    supports_backward = True
+    TITLES_PER_REQUEST = 50  # MediaWiki's limit on titles per query
+
+    def __init__(self, client, api_url=API_URL):
+        self.client = client
+        self.api_url = api_url
+
+    async def exists(self, titles):
+        try:
+            found = await self._query(titles, {}, None)
+            return all(title in found for title in titles)
+        except Exception as e:
+            print(f"An error occurred while checking start and end pages: {e}")
+            return False
+
+    async def forward(self, titles):
+        """Returns {title: [linked titles]} for the titles that exist."""
+        return await self._query(titles, {'prop': 'links', 'plnamespace': 0, 'pllimit': 'max'}, 'links')
+
+    async def backward(self, titles):
+        """Returns {title: [titles linking to it]} for the titles that exist."""
+        params = {'prop': 'linkshere', 'lhnamespace': 0, 'lhlimit': 'max', 'lhprop': 'title'}
+        return await self._query(titles, params, 'linkshere')
+
+    async def revisions(self, titles):
+        """Returns {title: latest revision id} for the titles that exist."""
+        return await fetch_revisions(self.client, self.api_url, titles, self.TITLES_PER_REQUEST)
+
+    async def _query(self, titles, params, field):
+        titles = list(dict.fromkeys(titles))
+        batches = [titles[i:i + self.TITLES_PER_REQUEST] for i in range(0, len(titles), self.TITLES_PER_REQUEST)]
+        results = {}
+        for batch_results in await asyncio.gather(*(self._query_batch(batch, params, field) for batch in batches)):
+            results.update(batch_results)
+        return results
+
+    async def _query_batch(self, titles, params, field):
+        from network import follow_title_changes, iter_api_query
+        params = dict(params, titles='|'.join(titles), redirects=1)
+        resolved = {title: title for title in titles}
+        links = {}
+        async for query in iter_api_query(self.client, self.api_url, params):
+            follow_title_changes(resolved, query)
+            for page in query.get('pages', []):
+                if page.get('missing') or page.get('invalid'):
+                    continue
+                # Continued responses repeat every page, carrying the next slice of links
+                page_links = links.setdefault(page['title'], [])
+                if field:
+                    page_links.extend(link['title'] for link in page.get(field, []))
+        return {title: links[current] for title, current in resolved.items() if current in links}
@@ -0,0 +1,150 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Constants
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Every metric update returns at once while this is False, so instrumented hot paths cost one check
+ENABLED = os.getenv('METRICS') == '1'
+_trace_file = None
+_trace_lock = threading.Lock()
+_registry = {}
+_null_timer = nullcontext()
+
+def enable(enabled=True):
+    global ENABLED
+    ENABLED = enabled
+
+def start_trace(path):
+    """Enables metrics and appends every update to `path` as one JSON object per line."""
+    global _trace_file
+    stop_trace()
+    _trace_file = open(path, 'a', encoding='utf-8')
+    enable()
+
+def stop_trace():
+    global _trace_file
+    with _trace_lock:
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+
+def _trace(metric, value, labels):
+    with _trace_lock:
+        if _trace_file is not None:
+            _trace_file.write(json.dumps({'ts': time.time(), 'metric': metric, 'value': value, **labels}) + '\n')
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.lock = threading.Lock()
+        self.values = {}  # sorted label items -> value
+        _registry[name] = self
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items())) if labels else ()
+
+    def _samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        if _trace_file is not None:
+            _trace(self.name, amount, labels)
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        if not ENABLED:
+            return
+        with self.lock:
+            self.values[self._key(labels)] = value
+        if _trace_file is not None:
+            _trace(self.name, value, labels)
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+        if _trace_file is not None:
+            _trace(self.name, value, labels)
+
+    def time(self, **labels):
+        """Context manager observing the seconds its block takes."""
+        return self._timer(labels) if ENABLED else _null_timer
+
+    @contextmanager
+    def _timer(self, labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        samples = []
+        with self.lock:
+            for key, (counts, total) in self.values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", key + (('le', '+Inf' if bound == float('inf') else repr(bound)),), cumulative))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(key):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in key) + '}' if key else ''
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in list(_registry.values()):
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, value in metric._samples():
+            lines.append(f"{name}{_format_labels(key)} {value}")
+    return '\n'.join(lines) + '\n'
+
+# Metrics shared by the instrumented modules
+FETCH_SECONDS = Histogram('wiki_fetch_seconds', 'HTTP request latency, after any rate limiter wait')
+FETCH_RETRIES = Counter('wiki_fetch_retries_total', 'HTTP requests retried after a transient error')
+FETCH_THROTTLED = Counter('wiki_fetch_throttled_total', 'Responses with status 429 Too Many Requests')
+FETCH_ERRORS = Counter('wiki_fetch_errors_total', 'HTTP requests that failed')
+PARSE_SECONDS = Histogram('wiki_parse_seconds', 'Time spent extracting links from one article')
+CACHE_REQUESTS = Counter('wiki_cache_requests_total', 'Cache lookups by tier and result')
+CACHE_SECONDS = Histogram('wiki_cache_seconds', 'Time spent in cache reads and writes')
+HEURISTIC_SECONDS = Histogram('wiki_heuristic_seconds', 'Time spent fetching texts for and scoring heuristics')
+SEARCH_FRONTIER = Gauge('wiki_search_frontier', 'Pages in the current search frontier')
+SEARCH_EXPANDED = Counter('wiki_search_expanded_total', 'Pages expanded by the search algorithms')
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import zlib
+import numpy as np
+from graph_store import LinkGraph, gather_neighbors
+from metrics import HEURISTIC_SECONDS
+
+# Constants
+DEFAULT_PERMUTATIONS = 64
+DEFAULT_WEIGHT = 4.0  # hops a page sharing nothing with the target is estimated to be away
+MERSENNE_PRIME = (1 << 31) - 1  # hash values stay below 2**31, so they fit uint32
+TOKENS_PER_CHUNK = 1 << 15  # tokens hashed together, bounding the (permutations x tokens) temporary
+GRAPH_CHUNK = 4096  # graph store pages sketched per batch
+
+def title_tokens(titles):
+    """Stable 31-bit integer for each title, the same in every process and run."""
+    return np.fromiter((zlib.crc32(title.encode('utf-8')) for title in titles), dtype=np.uint64,
+                       count=len(titles)) % MERSENNE_PRIME
+
+class SketchIndex:
+    """MinHash signatures of each page's link neighborhood: the page itself and the pages it links to.
+
+    Pages linking to similar sets of pages tend to be close in the link graph, and the fraction of
+    equal signature entries of two pages estimates the Jaccard similarity of their neighborhoods.
+    Signatures are rows of a uint32 NumPy memmap, `permutations` values per page. The signature of a
+    union is the element-wise minimum of the signatures, so links found later are merged into a page's
+    row without the links seen before. Scoring a list of pages is one row gather and compare.
+    """
+    SIGNATURES_FILE = 'signatures.u32'
+    META_FILE = 'index.json'
+
+    def __init__(self, index_dir='sketches', permutations=DEFAULT_PERMUTATIONS, seed=0, weight=DEFAULT_WEIGHT):
+        self.index_dir = index_dir
+        self.permutations = permutations
+        self.seed = seed
+        self.weight = weight
+        rng = np.random.default_rng(seed)
+        # h(x) = (a * x + b) mod p, with a, b and x below 2**31, never overflows uint64
+        self.a = rng.integers(1, MERSENNE_PRIME, permutations, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, permutations, dtype=np.uint64)
+        self.titles = []
+        self.rows = {}
+        self.signatures = None
+        self.capacity = 0
+        self.backlinks = {}  # target -> signature of the pages linking to it, for this process only
+
+    @classmethod
+    def load(cls, index_dir='sketches', weight=DEFAULT_WEIGHT):
+        with open(os.path.join(index_dir, cls.META_FILE), 'r') as file:
+            meta = json.load(file)
+        index = cls(index_dir, meta['permutations'], meta['seed'], weight)
+        index.titles = meta['titles']
+        index.rows = {title: row for row, title in enumerate(index.titles)}
+        index.capacity = meta['capacity']
+        index.signatures = np.memmap(os.path.join(index_dir, cls.SIGNATURES_FILE), dtype=np.uint32, mode='r+',
+                                     shape=(index.capacity, index.permutations))
+        return index
+
+    @classmethod
+    def open(cls, index_dir='sketches', weight=DEFAULT_WEIGHT):
+        """Loads the index in `index_dir`, or starts an empty one there."""
+        if os.path.exists(os.path.join(index_dir, cls.META_FILE)):
+            return cls.load(index_dir, weight)
+        return cls(index_dir, weight=weight)
+
+    def __contains__(self, title):
+        return title in self.rows
+
+    def __len__(self):
+        return len(self.titles)
+
+    def sketch(self, tokens, counts):
+        """Signatures of consecutive token sets, `counts[i]` tokens each, as a (sets, permutations) array."""
+        signatures = np.empty((len(counts), self.permutations), dtype=np.uint32)
+        ends = np.cumsum(counts)
+        first = 0
+        while first < len(counts):
+            # Whole sets per chunk, at least one even if it alone exceeds TOKENS_PER_CHUNK
+            last = max(first + 1, int(np.searchsorted(ends, ends[first] - counts[first] + TOKENS_PER_CHUNK, 'right')))
+            begin = ends[first] - counts[first]
+            chunk = tokens[begin:ends[last - 1]]
+            hashed = (self.a[:, None] * chunk[None, :] + self.b[:, None]) % MERSENNE_PRIME
+            starts = (ends[first:last] - counts[first:last]) - begin
+            signatures[first:last] = np.minimum.reduceat(hashed, starts, axis=1).T
+            first = last
+        return signatures
+
+    def link_signatures(self, links_by_page):
+        """Signatures of {page: [linked pages]}, each over the page and its links."""
+        pages = list(links_by_page)
+        tokens = title_tokens([title for page in pages for title in [page, *links_by_page[page]]])
+        counts = np.fromiter((1 + len(links_by_page[page]) for page in pages), dtype=np.int64, count=len(pages))
+        return pages, self.sketch(tokens, counts)
+
+    def add(self, links_by_page):
+        """Merges the links of {page: [linked pages]} into the pages' signatures, adding new pages."""
+        if not links_by_page:
+            return
+        pages, signatures = self.link_signatures(links_by_page)
+        self._merge(pages, signatures)
+
+    def add_backlinks(self, links_by_page):
+        """Widens each target's neighborhood with {target: [pages linking to it]}. Only this process sees
+        it, so the stored signature of the target stays one of its own links."""
+        pages, signatures = self.link_signatures(links_by_page)
+        for page, signature in zip(pages, signatures):
+            known = self.backlinks.get(page)
+            self.backlinks[page] = signature if known is None else np.minimum(known, signature)
+
+    def _merge(self, pages, signatures):
+        """Writes the signatures of distinct `pages`, merged into the rows of pages already indexed."""
+        rows = np.fromiter((self.rows.get(page, -1) for page in pages), dtype=np.int64, count=len(pages))
+        known = rows >= 0
+        if known.any():
+            self.signatures[rows[known]] = np.minimum(self.signatures[rows[known]], signatures[known])
+        new_pages = [page for page, row in zip(pages, rows) if row < 0]
+        if new_pages:
+            start, needed = len(self.titles), len(self.titles) + len(new_pages)
+            if needed > self.capacity:
+                self._open_signatures(max(needed, 2 * self.capacity), create=self.signatures is None)
+            self.signatures[start:needed] = signatures[~known]
+            for row, page in enumerate(new_pages, start):
+                self.rows[page] = row
+            self.titles.extend(new_pages)
+
+    def _open_signatures(self, capacity, create=False):
+        path = os.path.join(self.index_dir, self.SIGNATURES_FILE)
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self.signatures is not None:
+            self.signatures.flush()
+            self.signatures = None
+        capacity = max(capacity, 1)
+        with open(path, 'wb' if create else 'r+b') as file:
+            file.truncate(capacity * self.permutations * 4)
+        self.signatures = np.memmap(path, dtype=np.uint32, mode='r+', shape=(capacity, self.permutations))
+        self.capacity = capacity
+
+    def save(self):
+        if self.signatures is None:
+            self._open_signatures(1, create=True)
+        self.signatures.flush()
+        with open(os.path.join(self.index_dir, self.META_FILE), 'w') as file:
+            json.dump({'permutations': self.permutations, 'seed': self.seed, 'capacity': self.capacity,
+                       'titles': self.titles}, file)
+
+    def neighborhood(self, target):
+        """The target's signature, widened by any backlinks added for it; None when nothing is known."""
+        row = self.rows.get(target)
+        signature = self.signatures[row] if row is not None else None
+        extra = self.backlinks.get(target)
+        if extra is None:
+            return signature
+        return extra if signature is None else np.minimum(signature, extra)
+
+    def similarities(self, titles, target):
+        """Estimated Jaccard similarity of each page's neighborhood to the target's; unknown pages score 0."""
+        with HEURISTIC_SECONDS.time(operation='score'):
+            scores = np.zeros(len(titles), dtype=np.float32)
+            target_signature = self.neighborhood(target)
+            if target_signature is None:
+                return scores
+            rows = np.fromiter((self.rows.get(title, -1) for title in titles), dtype=np.int64, count=len(titles))
+            known = rows >= 0
+            scores[known] = (self.signatures[rows[known]] == target_signature).mean(axis=1)
+            return scores
+
+    def distance_estimates(self, titles, target):
+        """Batch heuristic for a_star_search and online_search: `weight` * (1 - similarity)."""
+        return self.weight * (1.0 - self.similarities(titles, target))
+
+def sketch_graph_store(index, graph):
+    """Adds every page of a graph store to `index`, GRAPH_CHUNK pages per batch of CSR gathers."""
+    tokens = title_tokens([graph.title_of(node) for node in range(graph.node_count)])
+    for first in range(0, graph.node_count, GRAPH_CHUNK):
+        nodes = np.arange(first, min(first + GRAPH_CHUNK, graph.node_count), dtype=np.int64)
+        counts = graph.offsets[nodes + 1] - graph.offsets[nodes]
+        neighbors = gather_neighbors(graph.offsets, graph.adjacency, nodes)
+        # Each page's own token goes first, then its links
+        positions = np.cumsum(counts + 1) - (counts + 1)
+        page_tokens = np.empty(len(nodes) + len(neighbors), dtype=np.uint64)
+        page_tokens[positions] = tokens[nodes]
+        is_link = np.ones(len(page_tokens), dtype=bool)
+        is_link[positions] = False
+        page_tokens[is_link] = tokens[neighbors]
+        index._merge([graph.title_of(int(node)) for node in nodes], index.sketch(page_tokens, counts + 1))
+
+def main():
+    parser = argparse.ArgumentParser(description='Sketch each page\'s links with MinHash for the link-similarity heuristic')
+    parser.add_argument('--graph_store', type=str, default=None, help='Sketch every page of a graph store built by graph_store.py')
+    parser.add_argument('--crawl_store', type=str, default=None, help='Sketch every page kept in a crawl store')
+    parser.add_argument('--permutations', type=int, default=DEFAULT_PERMUTATIONS, help='Signature values per page')
+    parser.add_argument('--out', default='sketches', help='Directory to write the sketch index to')
+    args = parser.parse_args()
+    if not args.graph_store and not args.crawl_store:
+        parser.error('Pass --graph_store or --crawl_store to sketch')
+
+    if os.path.exists(os.path.join(args.out, SketchIndex.META_FILE)):
+        # New links are merged into the existing signatures
+        index = SketchIndex.load(args.out)
+        if index.permutations != args.permutations:
+            parser.error(f"{args.out} holds {index.permutations}-value signatures; pass --permutations {index.permutations}")
+    else:
+        index = SketchIndex(args.out, args.permutations)
+    if args.graph_store:
+        sketch_graph_store(index, LinkGraph(args.graph_store))
+    if args.crawl_store:
+        from crawl_store import CrawlStore
+        with CrawlStore(args.crawl_store) as store:
+            index.add({title: record['links'] for title, record in store.pages.items()})
+    index.save()
+    print(f"Sketched {len(index)} pages into {args.out} ({index.capacity * index.permutations * 4} bytes of signatures)")
+
+if __name__ == '__main__':
+    main()
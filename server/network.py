@@ -1,72 +1,203 @@
-import aiohttp
 import asyncio
-from aiohttp import ClientSession, ClientTimeout
+import json
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
 import backoff
 from aiohttp.client_exceptions import ClientError, ClientResponseError, ServerTimeoutError
+from metrics import FETCH_ERRORS, FETCH_RETRIES, FETCH_SECONDS, FETCH_THROTTLED
 
 # Constants
 MAX_RETRIES = 3
 TIMEOUT_SECONDS = 10
-RATE_LIMIT = 1  # requests per second
+RATE_LIMIT = 20  # requests per second
+RATE_BURST = 40  # requests allowed back to back after an idle period
+MAX_PARALLEL_REQUESTS = 10
+MAX_CONNECTIONS_PER_HOST = 10
+DNS_CACHE_SECONDS = 300
+KEEPALIVE_SECONDS = 30
+DEFAULT_RETRY_AFTER = 1.0
+USER_AGENT = "WikipediaGame/1.0 (https://github.com/jackmazac/WikipediaGame)"
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `burst` requests."""
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Stops handing out tokens for `seconds`, e.g. after the server answered 429."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+        # Refill starts when the pause ends, so the bucket is empty then rather than full
+        self.updated = self.blocked_until
+
+def retry_after_seconds(headers, default=DEFAULT_RETRY_AFTER):
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
 
 # Backoff strategy for retries
 def backoff_hdlr(details):
-    print(f"Backing off {details['wait']:0.1f} seconds after {details['tries']} tries calling function {details['target'].__name__} with args {details['args']} and kwargs {details['kwargs']}")
+    FETCH_RETRIES.inc()
+    logging.warning(f"Retrying {details['args'][0]} in {details['wait']:0.1f} seconds after {details['tries']} tries: {details['exception']}")
+
+def giveup_hdlr(details):
+    logging.error(f"Giving up on {details['args'][0]} after {details['tries']} tries: {details['exception']}")
+
+def is_permanent_error(e):
+    """Client errors other than 429 will not succeed on retry."""
+    return isinstance(e, ClientResponseError) and 400 <= e.status < 500 and e.status != 429
 
 # Exponential backoff retrying for transient issues
-@backoff.on_exception(backoff.expo, ClientError, max_tries=MAX_RETRIES, on_backoff=backoff_hdlr)
-async def fetch(url: str, session: ClientSession, method: str = 'GET', data=None, headers=None):
+@backoff.on_exception(backoff.expo, (ClientError, asyncio.TimeoutError), max_tries=MAX_RETRIES, giveup=is_permanent_error, on_backoff=backoff_hdlr,
+                      on_giveup=giveup_hdlr)
+async def fetch(url: str, session: ClientSession, method: str = 'GET', data=None, headers=None, params=None, limiter=None):
+    if limiter is not None:
+        await limiter.acquire()
     timeout = ClientTimeout(total=TIMEOUT_SECONDS)
     try:
-        async with session.request(method, url, data=data, headers=headers, timeout=timeout) as response:
-            response.raise_for_status()  # Raises exception for 400/500 status codes
-            return await response.text()
+        with FETCH_SECONDS.time(method=method):
+            async with session.request(method, url, data=data, headers=headers, params=params, timeout=timeout) as response:
+                if response.status == 429:
+                    FETCH_THROTTLED.inc()
+                    if limiter is not None:
+                        limiter.pause(retry_after_seconds(response.headers))
+                response.raise_for_status()  # Raises exception for 400/500 status codes
+                return await response.text()
     except (ClientResponseError, ServerTimeoutError) as e:
-        print(f"HTTP Error for URL {url}: {e}")
+        FETCH_ERRORS.inc(error=type(e).__name__)
+        logging.debug(f"HTTP Error for URL {url}: {e}")
         raise
     except asyncio.TimeoutError:
-        print(f"TimeoutError for URL {url}")
+        FETCH_ERRORS.inc(error='TimeoutError')
+        logging.debug(f"TimeoutError for URL {url}")
         raise
     except ClientError as e:
-        print(f"ClientError for URL {url}: {e}")
+        FETCH_ERRORS.inc(error=type(e).__name__)
+        logging.debug(f"ClientError for URL {url}: {e}")
         raise
     except Exception as e:
-        print(f"Unhandled exception for URL {url}: {e}")
+        FETCH_ERRORS.inc(error=type(e).__name__)
+        logging.error(f"Unhandled exception for URL {url}: {e}")
         raise
 
 class AsyncHTTPClient:
-    def __init__(self, rate_limit=RATE_LIMIT, max_parallel_requests=10):
+    def __init__(self, rate_limit=RATE_LIMIT, max_parallel_requests=MAX_PARALLEL_REQUESTS, burst=RATE_BURST,
+                 max_connections_per_host=MAX_CONNECTIONS_PER_HOST):
         self.rate_limit = rate_limit
-        self.semaphore = asyncio.Semaphore(rate_limit)
+        self.limiter = TokenBucket(rate_limit, burst) if rate_limit else None
         self.max_parallel_requests = max_parallel_requests
         self.parallel_semaphore = asyncio.Semaphore(max_parallel_requests)
+        self.max_connections_per_host = max_connections_per_host
         self.session = None
 
     async def __aenter__(self):
-        self.session = ClientSession()
+        connector = TCPConnector(
+            limit=self.max_parallel_requests,
+            limit_per_host=self.max_connections_per_host,
+            ttl_dns_cache=DNS_CACHE_SECONDS,
+            keepalive_timeout=KEEPALIVE_SECONDS,
+        )
+        self.session = ClientSession(connector=connector, headers={'User-Agent': USER_AGENT})
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
         if self.session:
             await self.session.close()
+            self.session = None
 
-    async def get(self, urls, **kwargs):
-        async with self.parallel_semaphore:
-            tasks = []
-            for url in urls:
-                async with self.semaphore:
-                    task = asyncio.create_task(fetch(url, self.session, 'GET', **kwargs))
-                    tasks.append(task)
-            return await asyncio.gather(*tasks)
-
-    async def post(self, urls, data=None, headers=None):
+    async def request(self, method, url, **kwargs):
         async with self.parallel_semaphore:
-            tasks = []
-            for url in urls:
-                async with self.semaphore:
-                    task = asyncio.create_task(fetch(url, self.session, 'POST', data=data, headers=headers))
-                    tasks.append(task)
-            return await asyncio.gather(*tasks)
+            return await fetch(url, self.session, method, limiter=self.limiter, **kwargs)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, data=None, headers=None):
+        return await self.request('POST', url, data=data, headers=headers)
+
+    async def get_many(self, urls, **kwargs):
+        """Yields (url, content) pairs as requests complete; failed requests yield the exception as content."""
+        urls = iter(urls)
+        pending = set()
+
+        async def fetch_one(url):
+            try:
+                return url, await self.get(url, **kwargs)
+            except Exception as e:
+                return url, e
+
+        try:
+            while True:
+                for url in urls:
+                    pending.add(asyncio.create_task(fetch_one(url)))
+                    if len(pending) >= self.max_parallel_requests:
+                        break
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+async def iter_api_query(client, api_url, params):
+    """Yields the `query` part of each MediaWiki API response, following `continue` until the result is complete."""
+    params = dict(params, action='query', format='json', formatversion=2)
+    while True:
+        data = json.loads(await client.get(api_url, params=params))
+        if 'error' in data:
+            raise ValueError(f"MediaWiki API error: {data['error'].get('info', data['error'])}")
+        if 'query' in data:
+            yield data['query']
+        if 'continue' not in data:
+            return
+        params = dict(params, **data['continue'])
+
+def follow_title_changes(resolved, query):
+    """Updates {requested title: title the API answers under} with the normalizations and redirects in `query`."""
+    changes = {change['from']: change['to'] for change in query.get('normalized', []) + query.get('redirects', [])}
+    for title, current in resolved.items():
+        # Bounded, since a redirect loop would otherwise never settle
+        for _ in range(len(changes)):
+            if current not in changes:
+                break
+            current = changes[current]
+        resolved[title] = current
+    return resolved
 
 # Utility function to use AsyncHTTPClient
 async def fetch_url(url):
@@ -0,0 +1,254 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import time
+from collections import deque
+from metrics import Counter, Gauge
+
+# Constants
+DEFAULT_PRIORITY = 0.0
+HEDGE_QUANTILE = 0.95  # a request slower than this share of recent requests gets a hedge
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_SECONDS = 0.05
+LATENCY_WINDOW = 200
+
+SCHEDULER_QUEUED = Gauge('wiki_scheduler_queued', 'Fetches waiting in the priority scheduler')
+SCHEDULER_CANCELLED = Counter('wiki_scheduler_cancelled_total', 'Scheduled fetches cancelled, by state when cancelled')
+SCHEDULER_HEDGES = Counter('wiki_scheduler_hedges_total', 'Hedged requests, by whether the hedge answered first')
+
+_current_group = contextvars.ContextVar('fetch_group', default=None)
+
+class ScheduledFetch:
+    """One URL waiting for or being fetched; awaiting it returns the response text."""
+
+    def __init__(self, key, url, kwargs, priority):
+        self.key = key
+        self.url = url
+        self.kwargs = kwargs
+        self.priority = priority
+        self.seq = None
+        self.state = 'queued'
+        self.future = asyncio.get_running_loop().create_future()
+        self.tasks = []
+        self.waiters = 0
+        self.groups = set()
+        # Marks a failure as seen even when every caller has gone away
+        self.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+    def finish(self):
+        for group in self.groups:
+            group.fetches.discard(self)
+
+    def __await__(self):
+        return asyncio.shield(self.future).__await__()
+
+class FetchGroup:
+    """The fetches made on behalf of one piece of search work, such as expanding one page.
+
+    Fetches made inside `with group:` (including by tasks created there) share the group's
+    priority, so the search can reprioritize or cancel all of them without knowing their URLs.
+    """
+
+    def __init__(self, scheduler, priority=DEFAULT_PRIORITY):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.fetches = set()
+        self.started = False
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_group.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_group.reset(self._token)
+
+    def reprioritize(self, priority):
+        self.priority = priority
+        for fetch in list(self.fetches):
+            self.scheduler.reprioritize(fetch, priority)
+
+    def cancel(self):
+        for fetch in list(self.fetches):
+            self.scheduler.cancel(fetch)
+
+class FetchScheduler:
+    """Runs fetches through an AsyncHTTPClient in priority order, lowest first, instead of arrival order.
+
+    Any link source can use it in place of the client, since `get` takes the same arguments. Identical
+    requests share one fetch. A request that is still queued can be reprioritized for free. Cancelling
+    a request drops it before it spends rate-limit budget, or aborts it in flight. When nothing is
+    queued, a request running longer than the HEDGE_QUANTILE of recent latencies is sent again, and
+    whichever copy answers first wins. Hedges are only sent into idle capacity, so they never delay
+    queued work.
+    """
+
+    def __init__(self, client, workers=None, hedge=True, hedge_after=None):
+        self.client = client
+        self.max_parallel_requests = workers or client.max_parallel_requests
+        self.hedge = hedge
+        self.hedge_after = hedge_after  # fixed hedge delay in seconds; adaptive when None
+        self.heap = []  # (priority, seq, fetch); entries whose seq no longer matches are stale
+        self.fetches = {}  # key -> queued or running ScheduledFetch
+        self.counter = itertools.count()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.queued = 0
+        self.workers = []
+
+    async def __aenter__(self):
+        self.ready = asyncio.Event()
+        self.workers = [asyncio.ensure_future(self._work()) for _ in range(self.max_parallel_requests)]
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        self.cancel_all()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def group(self, priority=DEFAULT_PRIORITY):
+        return FetchGroup(self, priority)
+
+    def submit(self, url, priority=None, **kwargs):
+        """Queues a GET and returns its ScheduledFetch; `priority` defaults to the current FetchGroup's."""
+        group = _current_group.get()
+        if priority is None:
+            priority = group.priority if group is not None else DEFAULT_PRIORITY
+        key = (url, json.dumps(kwargs, sort_keys=True, default=str))
+        fetch = self.fetches.get(key)
+        if fetch is None:
+            fetch = self.fetches[key] = ScheduledFetch(key, url, kwargs, priority)
+            self.queued += 1
+            self._push(fetch)
+        elif priority < fetch.priority:
+            self.reprioritize(fetch, priority)
+        if group is not None:
+            group.fetches.add(fetch)
+            fetch.groups.add(group)
+        return fetch
+
+    async def get(self, url, priority=None, **kwargs):
+        fetch = self.submit(url, priority, **kwargs)
+        fetch.waiters += 1
+        try:
+            return await fetch
+        except asyncio.CancelledError:
+            # Nobody else wants this response, so stop spending budget on it
+            if fetch.waiters == 1:
+                self.cancel(fetch)
+            raise
+        finally:
+            fetch.waiters -= 1
+
+    def reprioritize(self, fetch, priority):
+        """Moves a queued fetch to `priority`; running and finished fetches are left as they are."""
+        fetch.priority = priority
+        if fetch.state == 'queued':
+            self._push(fetch)
+
+    def cancel(self, fetch):
+        if fetch.future.done():
+            return
+        SCHEDULER_CANCELLED.inc(state=fetch.state)
+        if fetch.state == 'queued':
+            self.queued -= 1
+            SCHEDULER_QUEUED.set(self.queued)
+        fetch.state = 'cancelled'
+        fetch.finish()
+        fetch.future.cancel()
+        for task in fetch.tasks:
+            task.cancel()
+        if self.fetches.get(fetch.key) is fetch:
+            del self.fetches[fetch.key]
+
+    def cancel_all(self):
+        """Cancels every queued and running fetch, e.g. once the search has its answer."""
+        for fetch in list(self.fetches.values()):
+            self.cancel(fetch)
+
+    def _push(self, fetch):
+        fetch.seq = next(self.counter)
+        heapq.heappush(self.heap, (fetch.priority, fetch.seq, fetch))
+        SCHEDULER_QUEUED.set(self.queued)
+        self.ready.set()
+
+    async def _next(self):
+        while True:
+            while self.heap:
+                _, seq, fetch = heapq.heappop(self.heap)
+                if fetch.state == 'queued' and fetch.seq == seq:
+                    fetch.state = 'running'
+                    self.queued -= 1
+                    SCHEDULER_QUEUED.set(self.queued)
+                    return fetch
+            self.ready.clear()
+            await self.ready.wait()
+
+    async def _work(self):
+        while True:
+            fetch = await self._next()
+            try:
+                await self._run(fetch)
+            finally:
+                if self.fetches.get(fetch.key) is fetch:
+                    del self.fetches[fetch.key]
+
+    def _hedge_delay(self):
+        if not self.hedge:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self.latencies)
+        return max(HEDGE_MIN_SECONDS, latencies[int(HEDGE_QUANTILE * (len(latencies) - 1))])
+
+    def _start(self, fetch):
+        task = asyncio.ensure_future(self.client.get(fetch.url, **fetch.kwargs))
+        fetch.tasks.append(task)
+        return task
+
+    async def _run(self, fetch):
+        for group in fetch.groups:
+            group.started = True
+        started = time.monotonic()
+        pending = {self._start(fetch)}
+        delay = self._hedge_delay()
+        hedge = None
+        error = None
+        while pending and not fetch.future.done():
+            timeout = None if delay is None or hedge is not None else max(0.0, started + delay - time.monotonic())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if self.queued:
+                    delay = None  # queued work gets the capacity instead
+                else:
+                    hedge = self._start(fetch)
+                    pending.add(hedge)
+                continue
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                if not fetch.future.done():
+                    fetch.future.set_result(task.result())
+                    self.latencies.append(time.monotonic() - started)
+                    if hedge is not None:
+                        SCHEDULER_HEDGES.inc(outcome='won' if task is hedge else 'lost')
+        for task in pending:
+            task.cancel()
+        if not fetch.future.done():
+            if error is not None:
+                fetch.future.set_exception(error)
+            else:
+                fetch.future.cancel()
+        fetch.state = 'done'
+        fetch.finish()
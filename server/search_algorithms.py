@@ -1,79 +1,346 @@
-from collections import deque, defaultdict
+from array import array
+from collections import defaultdict
 import heapq
 import math
-from heuristic import WikipediaTextFetcher, TextPreprocessor, TextSimilarity
+from metrics import HEURISTIC_SECONDS, SEARCH_EXPANDED, SEARCH_FRONTIER
 
-fetcher = WikipediaTextFetcher()
-preprocessor = TextPreprocessor()
-similarity_calculator = TextSimilarity()
+_text_heuristic = None  # (fetcher, preprocessor, similarity_calculator), made on first use
+
+def _reconstruct_path(parents, target_page):
+    path = []
+    page = target_page
+    while page is not None:
+        path.append(page)
+        page = parents[page]
+    path.reverse()
+    return path
+
+def _bfs_ids(graph, start, target, max_depth):
+    """bfs over the integer ids of a graph store, with parent pointers in a flat int32 array."""
+    parents = array('i', [-1]) * graph.node_count
+    parents[start] = start
+    frontier = [start]
+    depth = 0
+    while frontier and depth <= max_depth:
+        SEARCH_FRONTIER.set(len(frontier), algorithm='bfs')
+        SEARCH_EXPANDED.inc(len(frontier), algorithm='bfs')
+        next_frontier = []
+        for node in frontier:
+            for neighbor in graph.neighbor_ids(node).tolist():
+                if neighbor == target:
+                    path = [neighbor, node]
+                    while path[-1] != start:
+                        path.append(parents[path[-1]])
+                    path.reverse()
+                    return path
+                if parents[neighbor] < 0 and depth + 1 <= max_depth:
+                    parents[neighbor] = node
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+        depth += 1
+    return []
 
 def bfs(graph, start_page, target_page, max_depth=10):
     if start_page not in graph or target_page not in graph:
         raise ValueError("Start or target page not found in the graph")
     if start_page == target_page:
         return [start_page]
-    queue = deque([(start_page, [start_page], 0)])
-    visited = set([start_page])
-    while queue:
-        current_page, path, depth = queue.popleft()
-        if depth > max_depth:
-            continue
-        for neighbor in graph.get(current_page, []):
-            if neighbor == target_page:
-                return path + [neighbor]
-            if neighbor not in visited:
+    if hasattr(graph, 'in_offsets'):
+        # Graph stores expose their CSR arrays, so whole layers are expanded at once
+        from sparse_bfs import sparse_bfs
+        path = sparse_bfs(graph, graph.id_of(start_page), graph.id_of(target_page), max_depth)
+        return [graph.title_of(node) for node in path]
+    if hasattr(graph, 'neighbor_ids'):
+        path = _bfs_ids(graph, graph.id_of(start_page), graph.id_of(target_page), max_depth)
+        return [graph.title_of(node) for node in path]
+    parents = {start_page: None}
+    frontier = [start_page]
+    depth = 0
+    while frontier and depth <= max_depth:
+        SEARCH_FRONTIER.set(len(frontier), algorithm='bfs')
+        SEARCH_EXPANDED.inc(len(frontier), algorithm='bfs')
+        next_frontier = []
+        for page in frontier:
+            for neighbor in graph.get(page, []):
+                if neighbor == target_page:
+                    parents[neighbor] = page
+                    return _reconstruct_path(parents, target_page)
+                if neighbor not in parents and depth + 1 <= max_depth:
+                    parents[neighbor] = page
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+        depth += 1
+    return []
+
+def bfs_many(graph, start_page, target_pages, max_depth=10):
+    """One bfs tree from `start_page` for many targets: yields (target, path) as each target is
+    reached, then (target, []) for the targets out of reach or not in the graph.
+
+    The tree only grows until every target is answered. Graph stores run it with sparse_bfs, and
+    graphs with a `prefetch(pages)` method get each layer requested in one batch.
+    """
+    targets = list(dict.fromkeys(target_pages))
+    if hasattr(graph, 'in_offsets'):
+        from sparse_bfs import sparse_bfs_many
+        start = graph.id_of(start_page)
+        ids = {graph.id_of(target): target for target in targets}
+        ids.pop(None, None)
+        answered = set()
+        if start is not None:
+            for node, path in sparse_bfs_many(graph, start, list(ids), max_depth):
+                answered.add(ids[node])
+                yield ids[node], [graph.title_of(page) for page in path]
+        for target in targets:
+            if target not in answered:
+                yield target, []
+        return
+
+    pending = set(targets)
+    if start_page in pending:
+        pending.discard(start_page)
+        yield start_page, [start_page]
+    parents = {start_page: None}
+    frontier = [start_page]
+    depth = 0
+    while pending and frontier and depth <= max_depth:
+        SEARCH_FRONTIER.set(len(frontier), algorithm='bfs')
+        SEARCH_EXPANDED.inc(len(frontier), algorithm='bfs')
+        if hasattr(graph, 'prefetch'):
+            graph.prefetch(frontier)
+        next_frontier = []
+        for page in frontier:
+            for neighbor in graph.get(page, []):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = page
                 if depth + 1 <= max_depth:
-                    visited.add(neighbor)
-                    queue.append((neighbor, path + [neighbor], depth + 1))
+                    next_frontier.append(neighbor)
+                if neighbor in pending:
+                    pending.discard(neighbor)
+                    yield neighbor, _reconstruct_path(parents, neighbor)
+        frontier = next_frontier
+        depth += 1
+    for target in targets:
+        if target in pending:
+            yield target, []
+
+def batch_bfs(graph, pairs, max_depth=10, reverse_graph=None):
+    """Answers many (start, finish) pairs with as few BFS trees as possible, yielding
+    (start, finish, path) as each pair resolves.
+
+    Pairs are grouped greedily under the page most unanswered pairs share: one bfs_many tree from a
+    start answers all of its finishes, and one over `reverse_graph` from a finish answers all of its
+    starts. Pairs left sharing no page run bidirectional_bfs, which explores far less than a tree.
+    The reverse graph is derived for dict graphs and graph stores; without one, only starts are
+    shared. Every path is a shortest one, though ties may break differently from bfs.
+    """
+    if reverse_graph is None:
+        if hasattr(graph, 'reversed'):
+            reverse_graph = graph.reversed()
+        elif isinstance(graph, dict):
+            reverse_graph = build_reverse_graph(graph)
+    pending = dict.fromkeys(pairs)
+    while pending:
+        by_start, by_finish = defaultdict(list), defaultdict(list)
+        for start_page, target_page in pending:
+            by_start[start_page].append(target_page)
+            by_finish[target_page].append(start_page)
+        start_page, target_pages = max(by_start.items(), key=lambda group: len(group[1]))
+        target_page, start_pages = max(by_finish.items(), key=lambda group: len(group[1]))
+        if reverse_graph is not None and len(target_pages) == len(start_pages) == 1:
+            for start_page, target_page in list(pending):
+                try:
+                    path = bidirectional_bfs(graph, start_page, target_page, max_depth, reverse_graph)
+                except ValueError:
+                    path = []
+                del pending[(start_page, target_page)]
+                yield start_page, target_page, path
+        elif reverse_graph is not None and len(start_pages) > len(target_pages):
+            for page, path in bfs_many(reverse_graph, target_page, start_pages, max_depth):
+                del pending[(page, target_page)]
+                yield page, target_page, path[::-1]
+        else:
+            for page, path in bfs_many(graph, start_page, target_pages, max_depth):
+                del pending[(start_page, page)]
+                yield start_page, page, path
+
+def build_reverse_graph(graph):
+    reverse_graph = defaultdict(list)
+    for page, links in graph.items():
+        for link in links:
+            reverse_graph[link].append(page)
+    return dict(reverse_graph)
+
+def _reconstruct_bidirectional_path(meeting_page, parents_from_start, parents_from_target):
+    path = []
+    page = meeting_page
+    while page is not None:
+        path.append(page)
+        page = parents_from_start[page]
+    path.reverse()
+    page = parents_from_target[meeting_page]
+    while page is not None:
+        path.append(page)
+        page = parents_from_target[page]
+    return path
+
+def bidirectional_bfs(graph, start_page, target_page, max_depth=10, reverse_graph=None, stats=None, on_progress=None,
+                      max_discovered=None):
+    """Shortest path found by growing BFS layers from both ends, always expanding the smaller frontier.
+
+    Searching backwards from the target needs incoming links: `reverse_graph` maps a page to the pages
+    linking to it. It is derived automatically for dict graphs and graph stores; lazily fetched graphs
+    must supply it. Graphs with a `prefetch(pages)` method get each layer requested in one batch.
+    If a `stats` dict is given, it is filled with the number of pages discovered and the depth reached.
+    `on_progress`, if given, is called after every layer with those figures and both frontier sizes.
+    With `max_discovered`, the search gives up and returns [] once it has discovered more pages than
+    that, which bounds the links a lazily fetched graph requests.
+    """
+    if start_page not in graph or target_page not in graph:
+        raise ValueError("Start or target page not found in the graph")
+    if start_page == target_page:
+        return [start_page]
+    if reverse_graph is None:
+        if hasattr(graph, 'reversed'):
+            reverse_graph = graph.reversed()
+        elif isinstance(graph, dict):
+            reverse_graph = build_reverse_graph(graph)
+        else:
+            raise ValueError("A reverse graph is required to search backwards from the target page")
+
+    parents_from_start, parents_from_target = {start_page: None}, {target_page: None}
+    depth_from_start, depth_from_target = {start_page: 0}, {target_page: 0}
+    frontier_from_start, frontier_from_target = [start_page], [target_page]
+    start_depth = target_depth = 0
+
+    def record_stats():
+        progress = {
+            'discovered': len(parents_from_start) + len(parents_from_target),
+            'depth': start_depth + target_depth,
+            'forward_frontier': len(frontier_from_start),
+            'backward_frontier': len(frontier_from_target),
+        }
+        SEARCH_FRONTIER.set(progress['forward_frontier'], algorithm='bidirectional', direction='forward')
+        SEARCH_FRONTIER.set(progress['backward_frontier'], algorithm='bidirectional', direction='backward')
+        if stats is not None:
+            stats.update(progress)
+        if on_progress is not None:
+            on_progress(progress)
+
+    while frontier_from_start and frontier_from_target and start_depth + target_depth < max_depth:
+        if len(frontier_from_start) <= len(frontier_from_target):
+            edges, frontier = graph, frontier_from_start
+            parents, depths, other_depths = parents_from_start, depth_from_start, depth_from_target
+            start_depth += 1
+            layer_depth = start_depth
+        else:
+            edges, frontier = reverse_graph, frontier_from_target
+            parents, depths, other_depths = parents_from_target, depth_from_target, depth_from_start
+            target_depth += 1
+            layer_depth = target_depth
+
+        SEARCH_EXPANDED.inc(len(frontier), algorithm='bidirectional')
+        if hasattr(edges, 'prefetch'):
+            edges.prefetch(frontier)
+        next_frontier = []
+        best_meeting, best_length = None, None
+        for page in frontier:
+            for neighbor in edges.get(page, []):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = page
+                depths[neighbor] = layer_depth
+                next_frontier.append(neighbor)
+                if neighbor in other_depths:
+                    length = layer_depth + other_depths[neighbor]
+                    if best_length is None or length < best_length:
+                        best_meeting, best_length = neighbor, length
+            discovered = len(parents_from_start) + len(parents_from_target)
+            if max_discovered is not None and best_meeting is None and discovered > max_discovered:
+                record_stats()
+                return []
+
+        if frontier is frontier_from_start:
+            frontier_from_start = next_frontier
+        else:
+            frontier_from_target = next_frontier
+        record_stats()
+        # Every meeting in this layer has been seen, so the shortest of them is a shortest path overall
+        if best_meeting is not None:
+            return _reconstruct_bidirectional_path(best_meeting, parents_from_start, parents_from_target)
+    if start_depth + target_depth == 0:
+        record_stats()
     return []
 
 def dfs(graph, start_page, target_page, max_depth=10):
     if start_page not in graph or target_page not in graph:
         raise ValueError("Start or target page not found in the graph")
+    if start_page == target_page:
+        return [start_page]
+    if max_depth <= 0:
+        return []
 
-    def dfs_util(current_page, path, depth, visited):
-        if current_page == target_page:
-            return path
-        if depth >= max_depth:
-            return None
-        visited.add(current_page)
-        for neighbor in graph.get(current_page, []):
+    # The stack holds the current path together with each page's unexplored links,
+    # so depth is bounded by max_depth rather than by Python's recursion limit
+    visited = {start_page}
+    stack = [(start_page, iter(graph.get(start_page, [])))]
+    while stack:
+        for neighbor in stack[-1][1]:
             if neighbor not in visited:
-                result = dfs_util(neighbor, path + [neighbor], depth + 1, visited)
-                if result is not None:
-                    return result
-        return None
-
-    visited = set()
-    result = dfs_util(start_page, [start_page], 0, visited)
-    return result if result is not None else []
+                break
+        else:
+            stack.pop()
+            continue
+        if neighbor == target_page:
+            return [page for page, _ in stack] + [neighbor]
+        if len(stack) >= max_depth:
+            continue
+        visited.add(neighbor)
+        stack.append((neighbor, iter(graph.get(neighbor, []))))
+    return []
 
 def dijkstra(graph, start_page, target_page):
     if start_page not in graph or target_page not in graph:
         raise ValueError("Start or target page not found in the graph")
-    priority_queue = []
-    heapq.heappush(priority_queue, (0, start_page, [start_page]))
-    distances = defaultdict(lambda: float('inf'))
-    distances[start_page] = 0
+    priority_queue = [(0, start_page)]
+    distances = {start_page: 0}
+    parents = {start_page: None}
     while priority_queue:
-        current_distance, current_node, path = heapq.heappop(priority_queue)
+        current_distance, current_node = heapq.heappop(priority_queue)
         if current_node == target_page:
-            return path, current_distance
+            return _reconstruct_path(parents, target_page), current_distance
         if current_distance > distances[current_node]:
             continue
-        for neighbor in graph[current_node]:
+        for neighbor in graph.get(current_node, []):
             distance = current_distance + 1  # Assuming unweighted graph
-            if distance < distances[neighbor]:
+            if distance < distances.get(neighbor, math.inf):
                 distances[neighbor] = distance
-                heapq.heappush(priority_queue, (distance, neighbor, path + [neighbor]))
+                parents[neighbor] = current_node
+                heapq.heappush(priority_queue, (distance, neighbor))
     return [], float('inf')
 
+def text_heuristic():
+    """The text fetcher and similarity model behind textual_similarity_heuristic. They pull in
+    scikit-learn and open the text cache, so they are only made when a search first needs them."""
+    global _text_heuristic
+    if _text_heuristic is None:
+        from heuristic import WikipediaTextFetcher, TextPreprocessor, TextSimilarity
+        _text_heuristic = WikipediaTextFetcher(), TextPreprocessor(), TextSimilarity()
+    return _text_heuristic
+
 def textual_similarity_heuristic(page_url1, page_url2):
+    """Text similarity of two pages. Without a fitted similarity model there is nothing to compare
+    with, so every page estimates 0 and a_star_search expands pages in plain shortest-path order."""
+    import requests
+    fetcher, preprocessor, similarity_calculator = text_heuristic()
+    if not similarity_calculator.is_fitted:
+        return 0
     try:
         page_title1 = page_url1.split('/')[-1].replace('_', ' ')
         page_title2 = page_url2.split('/')[-1].replace('_', ' ')
-        text1 = fetcher.fetch_text(page_title1)
-        text2 = fetcher.fetch_text(page_title2)
+        with HEURISTIC_SECONDS.time(operation='fetch'):
+            text1 = fetcher.fetch_text(page_title1)
+            text2 = fetcher.fetch_text(page_title2)
         
         if text1 is None or text2 is None or not text1.strip() or not text2.strip():
             raise ValueError("One or both pages have no text content")
@@ -84,33 +351,60 @@ def textual_similarity_heuristic(page_url1, page_url2):
         if not text1 or not text2:
             raise ValueError("One or both pages have no text content after preprocessing")
         
-        return similarity_calculator.compute_similarity(text1, text2)
+        with HEURISTIC_SECONDS.time(operation='score'):
+            return similarity_calculator.compute_similarity(text1, text2)
     except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Error calculating textual similarity between {page_url1} and {page_url2}: {e}")
-        return float('inf')
+        return 0
+
+def a_star_search(graph, start_page, target_page, heuristic=textual_similarity_heuristic, batch_heuristic=None,
+                  stats=None):
+    """A* over unit-weight links.
 
-def a_star_search(graph, start_page, target_page):
+    `batch_heuristic(pages, target)` returns estimates for a list of pages at once, e.g.
+    EmbeddingIndex.distance_estimates or LandmarkIndex.distance_estimates; each expansion then
+    scores all new neighbors in one call. Paths are only guaranteed shortest when the estimates
+    never exceed the true distance, as with landmarks. A `stats` dict receives the number of
+    pages expanded and discovered.
+    """
     if start_page not in graph or target_page not in graph:
         raise ValueError("Start or target page not found in the graph")
-    open_set = []
-    heapq.heappush(open_set, (0 + textual_similarity_heuristic(start_page, target_page), start_page, [start_page]))
-    g_scores = {node: float('inf') for node in graph}
-    g_scores[start_page] = 0
-    f_scores = {node: float('inf') for node in graph}
-    f_scores[start_page] = textual_similarity_heuristic(start_page, target_page)
-    heuristic_cache = {}
+    if batch_heuristic is None:
+        batch_heuristic = lambda pages, target: [heuristic(page, target) for page in pages]
+    # Score tables only hold pages the search has actually reached
+    heuristic_cache = {start_page: batch_heuristic([start_page], target_page)[0]}
+    g_scores = {start_page: 0}
+    parents = {start_page: None}
+    open_set = [(heuristic_cache[start_page], start_page)]
+    expanded = 0
+
+    def record_stats():
+        SEARCH_EXPANDED.inc(expanded, algorithm='a_star')
+        if stats is not None:
+            stats['expanded'] = expanded
+            stats['discovered'] = len(g_scores)
+
     while open_set:
-        current_f_score, current_node, current_path = heapq.heappop(open_set)
+        current_f_score, current_node = heapq.heappop(open_set)
+        current_g_score = g_scores[current_node]
         if current_node == target_page:
-            return current_path, current_f_score
-        for neighbor in graph[current_node]:
-            tentative_g_score = g_scores[current_node] + 1  # Assuming unweighted graph
-            if tentative_g_score < g_scores[neighbor]:
+            record_stats()
+            return _reconstruct_path(parents, target_page), current_g_score
+        if current_f_score > current_g_score + heuristic_cache[current_node]:
+            continue  # A cheaper route to this page was queued after this entry
+        expanded += 1
+        SEARCH_FRONTIER.set(len(open_set), algorithm='a_star')
+        improved = []
+        for neighbor in graph.get(current_node, []):
+            tentative_g_score = current_g_score + 1  # Assuming unweighted graph
+            if tentative_g_score < g_scores.get(neighbor, math.inf):
                 g_scores[neighbor] = tentative_g_score
-                if (neighbor, target_page) not in heuristic_cache:
-                    heuristic_cache[(neighbor, target_page)] = textual_similarity_heuristic(neighbor, target_page)
-                f_score = tentative_g_score + heuristic_cache[(neighbor, target_page)]
-                if f_score < f_scores[neighbor]:
-                    f_scores[neighbor] = f_score
-                    heapq.heappush(open_set, (f_score, neighbor, current_path + [neighbor]))
+                parents[neighbor] = current_node
+                improved.append(neighbor)
+        unscored = [neighbor for neighbor in improved if neighbor not in heuristic_cache]
+        if unscored:
+            heuristic_cache.update(zip(unscored, batch_heuristic(unscored, target_page)))
+        for neighbor in improved:
+            heapq.heappush(open_set, (g_scores[neighbor] + heuristic_cache[neighbor], neighbor))
+    record_stats()
     return [], float('inf')
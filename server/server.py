@@ -1,83 +1,379 @@
-from flask import Flask, request, jsonify, send_from_directory, Response
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from aiohttp import web
+import asyncio
+import json
 import logging
 import os
+import time
+from collections import defaultdict, deque
+from urllib.parse import quote, unquote
 from dotenv import load_dotenv
 from network import AsyncHTTPClient
-from search_algorithms import bidirectional_bfs, bfs
-from utils import normalize_text
-import asyncio
+from cache import KVCache, TTLCache, DEFAULT_CACHE_PATH
+from canonical import TitleResolver
+from crawler import lazy_graph
+from graph_store import LinkGraph, normalize_title
+from jobs import JobManager
+import metrics
+from link_sources import WIKI_BASE_URL, API_URL, APILinkSource
+from search_algorithms import batch_bfs, bidirectional_bfs
+from utils import extract_title
 
 load_dotenv()
 RATE_LIMIT = os.getenv('RATE_LIMIT', '5/minute')
+GRAPH_STORE = os.getenv('GRAPH_STORE')  # search this graph store instead of the live API when set
+CACHE_PATH = os.getenv('CACHE_PATH', DEFAULT_CACHE_PATH)
+WIKI_API_URL = os.getenv('WIKI_API_URL', API_URL)
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '4096'))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '3600'))
+MAX_SEARCH_DEPTH = int(os.getenv('MAX_SEARCH_DEPTH', '6'))
+MAX_SEARCH_PAGES = int(os.getenv('MAX_SEARCH_PAGES', '200000'))  # pages a live search may discover before giving up
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', '4'))
+MAX_BATCH_PAIRS = int(os.getenv('MAX_BATCH_PAIRS', '500'))
+RESOLVE_REDIRECTS = os.getenv('RESOLVE_REDIRECTS', '1') == '1'  # map requested titles to canonical ones via the API
+EMPTY_LINKS_TTL = float(os.getenv('EMPTY_LINKS_TTL', '300'))  # seconds an empty link list is cached, as it may be a failed fetch
+CLIENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'client')
 
 logging.basicConfig(filename='server.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-app = Flask(__name__, static_folder='../client')
-limiter = Limiter(app=app, key_func=get_remote_address)
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+def parse_rate_limit(limit):
+    """Parses limits written like '5/minute' or '100 per hour' into (requests, seconds)."""
+    count, period = limit.replace(' per ', '/').split('/')
+    return int(count), PERIODS[period.strip().rstrip('s')]
+
+class RateLimiter:
+    """Sliding-window request limit per client address. Addresses whose window has emptied are
+    dropped once per period, so clients that came and went do not accumulate."""
+
+    def __init__(self, limit):
+        self.max_requests, self.period = parse_rate_limit(limit)
+        self.requests = defaultdict(deque)
+        self.swept_at = time.monotonic()
+
+    def allow(self, key):
+        now = time.monotonic()
+        if now - self.swept_at > self.period:
+            self.requests = defaultdict(deque, {address: window for address, window in self.requests.items()
+                                                if now - window[-1] <= self.period})
+            self.swept_at = now
+        window = self.requests[key]
+        while window and now - window[0] > self.period:
+            window.popleft()
+        if len(window) >= self.max_requests:
+            return False
+        window.append(now)
+        return True
+
+def page_title(page):
+    """Accepts a page URL or a bare title."""
+    return normalize_title(unquote(extract_title(page) if '/' in page else page))
+
+def page_url(title):
+    return f"{WIKI_BASE_URL}/wiki/{quote(title.replace(' ', '_'))}"
+
+class PathFinder:
+    """Long-lived search state: one HTTP client, the link cache and graph handles, solved pairs and in-flight searches."""
+
+    def __init__(self, graph_store=GRAPH_STORE, cache_path=CACHE_PATH, api_url=WIKI_API_URL):
+        self.graph_store = graph_store
+        self.cache_path = cache_path
+        self.api_url = api_url
+        self.results = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+        self.in_flight = {}
+        self.listeners = {}  # (start, finish) -> progress callbacks of the requests awaiting that search
+
+    async def start(self, app):
+        self.loop = asyncio.get_running_loop()
+        self.client = await AsyncHTTPClient().__aenter__()
+        self.cache = KVCache(self.cache_path)
+        self.link_source = APILinkSource(self.client, self.api_url)
+        self.resolver = TitleResolver(self.client, self.api_url, self.cache) if RESOLVE_REDIRECTS else None
+        self.graph = LinkGraph(self.graph_store) if self.graph_store else None
+
+    async def stop(self, app):
+        await self.client.close()
+        self.cache.close()
+
+    async def find_path(self, start, finish, on_progress=None):
+        """Returns {'path', 'time', 'discovered'}; identical concurrent requests share one search.
+
+        `on_progress` is called on the event loop with each progress report of the search. Titles are
+        resolved through redirects first, so 'USA' and 'United States' share results and searches.
+        """
+        if self.resolver is not None:
+            canonical = await self.resolver.resolve([start, finish])
+            start, finish = canonical[start], canonical[finish]
+        key = (start, finish)
+        result = self.results.get(key)
+        if result is not None:
+            return result
+        if on_progress is not None:
+            self.listeners.setdefault(key, []).append(on_progress)
+        try:
+            if key not in self.in_flight:
+                self.in_flight[key] = asyncio.ensure_future(self._search(start, finish))
+                self.in_flight[key].add_done_callback(lambda _: self.in_flight.pop(key, None))
+            return await asyncio.shield(self.in_flight[key])
+        finally:
+            if on_progress is not None:
+                self.listeners[key].remove(on_progress)
+                if not self.listeners[key]:
+                    del self.listeners[key]
+
+    def _notify(self, key, progress):
+        for on_progress in list(self.listeners.get(key, ())):
+            on_progress(progress)
+
+    async def _search(self, start, finish):
+        started = time.perf_counter()
+        stats = {}
+        key = (start, finish)
+        # The search runs in a worker thread; hand its progress reports back to the event loop
+        on_progress = lambda progress: self.loop.call_soon_threadsafe(self._notify, key, progress)
+        graph, reverse_graph = self._graphs()
+        # A live search fetches every page it discovers, so it gets a page budget; a graph store needs none
+        max_discovered = MAX_SEARCH_PAGES if self.graph is None else None
+        path = await self.loop.run_in_executor(None, bidirectional_bfs, graph, start, finish, MAX_SEARCH_DEPTH,
+                                               reverse_graph, stats, on_progress, max_discovered)
+        result = {'path': path, 'time': round(time.perf_counter() - started, 3), 'discovered': stats.get('discovered', 0)}
+        self._remember(key, result)
+        return result
+
+    def _remember(self, key, result):
+        """Caches a result, unless it is a live search that found nothing: a failed fetch or the page
+        budget may be why, so the pair is searched again next time."""
+        if result['path'] or self.graph is not None:
+            self.results.put(key, result)
+
+    async def find_paths(self, pairs):
+        """Yields ((start, finish), result) for each requested pair as it resolves, pairs already solved first.
+
+        The rest share BFS trees through batch_bfs, so a start (or finish) common to many pairs is
+        expanded once. Results are cached like find_path's; pairs with a page missing from the graph
+        store get {'error'} instead.
+        """
+        canonical = {}
+        if self.resolver is not None:
+            canonical = await self.resolver.resolve([page for pair in pairs for page in pair])
+        unsolved = {}
+        for start, finish in pairs:
+            key = (canonical.get(start, start), canonical.get(finish, finish))
+            result = self.results.get(key)
+            if result is not None:
+                yield (start, finish), result
+            elif self.graph is not None and (key[0] not in self.graph or key[1] not in self.graph):
+                yield (start, finish), {'error': 'Start or end page not found in the graph'}
+            else:
+                unsolved.setdefault(key, []).append((start, finish))
+        if not unsolved:
+            return
+
+        started = time.perf_counter()
+        graph, reverse_graph = self._graphs()
+        solved = asyncio.Queue()
+        cancelled = False
+        def search():
+            try:
+                for start, finish, path in batch_bfs(graph, list(unsolved), MAX_SEARCH_DEPTH, reverse_graph):
+                    if cancelled:
+                        break
+                    self.loop.call_soon_threadsafe(solved.put_nowait, ((start, finish), path))
+            finally:
+                self.loop.call_soon_threadsafe(solved.put_nowait, None)
+        searching = self.loop.run_in_executor(None, search)
+        try:
+            while (item := await solved.get()) is not None:
+                key, path = item
+                result = {'path': path, 'time': round(time.perf_counter() - started, 3), 'discovered': None}
+                self._remember(key, result)
+                for requested in unsolved[key]:
+                    yield requested, result
+            await searching
+        finally:
+            # A client that hangs up mid-stream stops the search at the next resolved pair
+            cancelled = True
+
+    def _graphs(self):
+        """The forward and reverse graphs searched: the graph store, or lazily fetched live links."""
+        if self.graph is not None:
+            return self.graph, self.graph.reversed()
+        return (lazy_graph(self._cached(self.link_source.forward, 'links:'), self.loop),
+                lazy_graph(self._cached(self.link_source.backward, 'backlinks:'), self.loop))
+
+    def _cached(self, fetch_many, prefix):
+        async def fetch_cached(titles):
+            cached = self.cache.get_many(prefix + title for title in titles)
+            links = {title: cached[prefix + title] for title in titles if prefix + title in cached}
+            missing = [title for title in titles if title not in links]
+            if missing:
+                fetched = await fetch_many(missing)
+                self.cache.put_many({prefix + title: page_links for title, page_links in fetched.items() if page_links})
+                # A page with no links may have failed to fetch, so it is asked again soon
+                empty = {prefix + title: [] for title, page_links in fetched.items() if not page_links}
+                if empty:
+                    self.cache.put_many(empty, ttl=EMPTY_LINKS_TTL)
+                links.update(fetched)
+            return links
+        return fetch_cached
+
+routes = web.RouteTableDef()
 
-@app.route('/', methods=['GET'])
-def home():
-    return send_from_directory(app.static_folder, 'index.html')
+@routes.get('/')
+async def home(request):
+    return web.FileResponse(os.path.join(CLIENT_DIR, 'index.html'))
 
-@app.route('/find_path', methods=['POST'])
-@limiter.limit(RATE_LIMIT)
-def find_path():
+@routes.post('/find_path')
+async def find_path(request):
+    if not request.app['rate_limiter'].allow(request.remote):
+        return web.json_response({'error': 'Rate limit exceeded', 'logs': [], 'time': 0, 'discovered': 0}, status=429)
     try:
-        data = request.get_json()
-        start_page = data['start']
-        finish_page = data['finish']
-
-        async def get_links_graph():
-            async with AsyncHTTPClient() as client:
-                return {
-                    'Start_Page': ['Link_1', 'Link_2'],
-                    'Link_1': ['Link_3', 'Link_4'],
-                    'Link_2': ['Link_3'],
-                    'Link_3': ['Target_Page'],
-                    'Link_4': [],
-                    'Target_Page': []
-                }
-
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        graph = loop.run_until_complete(get_links_graph())
-
-        path = bidirectional_bfs(graph, start_page, finish_page)
-        if path:
-            logging.info(f"Path found: {path}")
-            return jsonify({'path': path, 'logs': [], 'time': 0, 'discovered': len(graph)}), 200
+        data = await request.json()
+        start_page = page_title(data['start'])
+        finish_page = page_title(data['finish'])
+    except (KeyError, TypeError, ValueError) as e:
+        logging.error(f"Key error in JSON parsing: {e}")
+        return web.json_response({'error': 'Improper data format', 'logs': [], 'time': 0, 'discovered': 0}, status=400)
+
+    try:
+        result = await request.app['path_finder'].find_path(start_page, finish_page)
+    except ValueError as e:
+        logging.warning(f"Could not search between {start_page} and {finish_page}: {e}")
+        return web.json_response({'error': str(e), 'logs': [], 'time': 0, 'discovered': 0}, status=404)
+    except Exception as e:
+        logging.error(f"Error occurred: {e}")
+        return web.json_response({'error': 'An error occurred while finding path', 'logs': [], 'time': 0, 'discovered': 0}, status=500)
+
+    if result['path']:
+        logging.info(f"Path found: {result['path']}")
+        return web.json_response({'path': [page_url(title) for title in result['path']], 'logs': [],
+                                  'time': result['time'], 'discovered': result['discovered']}, status=200)
+    logging.warning(f"No path found between {start_page} and {finish_page}")
+    return web.json_response({'error': 'No path found within the specified depth limit.', 'logs': [],
+                              'time': result['time'], 'discovered': result['discovered']}, status=404)
+
+@routes.post('/batch')
+async def find_paths(request):
+    """Answers {'pairs': [[start, finish], ...]} or {'start', 'finishes'} as newline-delimited JSON,
+    one line per pair in the order the pairs resolve."""
+    if not request.app['rate_limiter'].allow(request.remote):
+        return web.json_response({'error': 'Rate limit exceeded'}, status=429)
+    try:
+        data = await request.json()
+        if 'pairs' in data:
+            pairs = [(page_title(start), page_title(finish)) for start, finish in data['pairs']]
         else:
-            logging.warning(f"No path found between {start_page} and {finish_page}")
-            return jsonify({'error': 'No path found within the specified depth limit.', 'logs': [], 'time': 0, 'discovered': len(graph)}), 404
+            start_page = page_title(data['start'])
+            pairs = [(start_page, page_title(finish)) for finish in data['finishes']]
+    except (KeyError, TypeError, ValueError) as e:
+        logging.error(f"Key error in JSON parsing: {e}")
+        return web.json_response({'error': 'Improper data format'}, status=400)
+    if len(pairs) > MAX_BATCH_PAIRS:
+        return web.json_response({'error': f"At most {MAX_BATCH_PAIRS} pairs per batch"}, status=400)
+
+    response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson', 'Cache-Control': 'no-cache'})
+    await response.prepare(request)
+    try:
+        async for (start_page, finish_page), result in request.app['path_finder'].find_paths(pairs):
+            line = {'start': start_page, 'finish': finish_page}
+            if result.get('path'):
+                line.update(path=[page_url(title) for title in result['path']], time=result['time'])
+            else:
+                line.update(error=result.get('error', 'No path found within the specified depth limit.'),
+                            time=result.get('time', 0))
+            await response.write(json.dumps(line).encode('utf-8') + b'\n')
+    except ConnectionError:
+        pass
+    except Exception as e:
+        logging.error(f"Error occurred in batch search: {e}")
+        await response.write(json.dumps({'error': 'An error occurred while finding paths'}).encode('utf-8') + b'\n')
+    return response
 
-    except KeyError as e:
+@routes.post('/jobs')
+async def create_job(request):
+    """Queues a search and returns its id at once; progress and the result are streamed from /jobs/<id>/events."""
+    if not request.app['rate_limiter'].allow(request.remote):
+        return web.json_response({'error': 'Rate limit exceeded'}, status=429)
+    try:
+        data = await request.json()
+        start_page = page_title(data['start'])
+        finish_page = page_title(data['finish'])
+    except (KeyError, TypeError, ValueError) as e:
         logging.error(f"Key error in JSON parsing: {e}")
-        return jsonify({'error': 'Improper data format', 'logs': [], 'time': 0, 'discovered': 0}), 400
+        return web.json_response({'error': 'Improper data format'}, status=400)
+    try:
+        job = request.app['jobs'].submit(request.remote, start_page, finish_page)
+    except asyncio.QueueFull as e:
+        logging.warning(f"Rejected search job: {e}")
+        return web.json_response({'error': 'Too many searches queued; wait for one to finish'}, status=429)
+    logging.info(f"Queued search job {job.id} from {start_page} to {finish_page}")
+    return web.json_response({'id': job.id, 'events': f"/jobs/{job.id}/events"}, status=202)
+
+@routes.get('/jobs/{job_id}')
+async def job_status(request):
+    job = request.app['jobs'].get(request.match_info['job_id'])
+    if job is None:
+        return web.json_response({'error': 'Unknown job'}, status=404)
+    return web.json_response(job.summary())
+
+@routes.get('/jobs/{job_id}/events')
+async def job_events(request):
+    """Server-Sent Events: queued, started, one progress event per search layer, then done or failed."""
+    job = request.app['jobs'].get(request.match_info['job_id'])
+    if job is None:
+        return web.json_response({'error': 'Unknown job'}, status=404)
+    response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+    await response.prepare(request)
+    async for event, data in job.stream():
+        await response.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+    return response
+
+async def run_job(path_finder, start, finish, on_progress):
+    result = await path_finder.find_path(start, finish, on_progress)
+    if result['path']:
+        logging.info(f"Path found: {result['path']}")
+        return dict(result, path=[page_url(title) for title in result['path']])
+    logging.warning(f"No path found between {start} and {finish}")
+    return dict(result, error='No path found within the specified depth limit.')
+
+@routes.get('/metrics')
+async def metrics_endpoint(request):
+    return web.Response(body=metrics.render().encode('utf-8'),
+                        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+@routes.get('/logs')
+async def stream_logs(request):
+    response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+    await response.prepare(request)
+    with open('server.log', 'r') as log_file:
+        for line in log_file:
+            await response.write(f"data: {line}\n\n".encode('utf-8'))
+    return response
+
+@web.middleware
+async def handle_error(request, handler):
+    try:
+        return await handler(request)
+    except web.HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"Error occurred: {e}")
-        return jsonify({'error': 'An error occurred while finding path', 'logs': [], 'time': 0, 'discovered': 0}), 500
-
-@app.route('/static/<path:path>')
-def send_static(path):
-    return send_from_directory(app.static_folder, path)
-
-@app.route('/logs', methods=['GET'])
-def stream_logs():
-    def generate():
-        with open('server.log', 'r') as log_file:
-            while True:
-                line = log_file.readline()
-                if not line:
-                    break
-                yield f"data: {line}\n\n"
-    return Response(generate(), mimetype='text/event-stream')
-
-@app.errorhandler(Exception)
-def handle_error(e):
-    logging.error(f"Unhandled exception occurred: {e}")
-    return jsonify({'error': 'An internal server error occurred'}), 500
+        logging.error(f"Unhandled exception occurred: {e}")
+        return web.json_response({'error': 'An internal server error occurred'}, status=500)
+
+def create_app(path_finder=None, rate_limit=RATE_LIMIT):
+    metrics.enable()
+    app = web.Application(middlewares=[handle_error])
+    app['rate_limiter'] = RateLimiter(rate_limit)
+    app['path_finder'] = path_finder = path_finder or PathFinder()
+    app['jobs'] = JobManager(lambda start, finish, on_progress: run_job(path_finder, start, finish, on_progress),
+                             SEARCH_WORKERS)
+    app.on_startup.append(path_finder.start)
+    app.on_startup.append(app['jobs'].start)
+    app.on_cleanup.append(app['jobs'].stop)
+    app.on_cleanup.append(path_finder.stop)
+    app.add_routes(routes)
+    app.router.add_static('/static/', CLIENT_DIR)
+    return app
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, threaded=True)
+    web.run_app(create_app(), host='0.0.0.0', port=5001)
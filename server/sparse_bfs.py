@@ -0,0 +1,122 @@
+import time
+import numpy as np
+from graph_store import gather_neighbors
+from metrics import SEARCH_EXPANDED, SEARCH_FRONTIER
+
+# Constants
+BOTTOM_UP_FACTOR = 1.0  # expand bottom-up once unvisited pages have at most this many in-links per frontier out-link
+DIRECTIONS = ('auto', 'top-down', 'bottom-up')
+
+def _top_down(graph, frontier, visited):
+    """Pages first reached from `frontier` along out-links, in discovery order, with their parents."""
+    counts = graph.offsets[frontier + 1] - graph.offsets[frontier]
+    neighbors = gather_neighbors(graph.offsets, graph.adjacency, frontier)
+    sources = np.repeat(frontier, counts)
+    fresh = ~visited[neighbors]
+    neighbors, sources = neighbors[fresh], sources[fresh]
+    nodes, first = np.unique(neighbors, return_index=True)
+    order = np.argsort(first, kind='stable')
+    return nodes[order], sources[first[order]]
+
+def _bottom_up(graph, frontier, visited, rank):
+    """The same pages and parents as _top_down, found by scanning the in-links of every unvisited page.
+
+    `rank` holds, for each frontier page, how early it comes in the frontier (larger is earlier), so a
+    page's parent is the earliest frontier page linking to it, as in a top-down pass. Discovery order
+    is then parent order, and within a parent ascending id, which is its row order in a graph store.
+    """
+    size = len(frontier)
+    rank[frontier] = np.arange(size, 0, -1, dtype=rank.dtype)
+    candidates = np.flatnonzero(~visited)
+    counts = graph.in_offsets[candidates + 1] - graph.in_offsets[candidates]
+    linked = counts > 0
+    candidates, counts = candidates[linked], counts[linked]
+    ranks = rank[gather_neighbors(graph.in_offsets, graph.in_adjacency, candidates)]
+    rank[frontier] = 0
+    if not len(ranks):
+        return candidates[:0], candidates[:0]
+    best = np.maximum.reduceat(ranks, np.cumsum(counts) - counts)
+    reached = best > 0
+    nodes, positions = candidates[reached], size - best[reached].astype(np.int64)
+    order = np.lexsort((nodes, positions))
+    return nodes[order], frontier[positions[order]]
+
+def sparse_bfs(graph, start, target, max_depth=10, direction='auto', stats=None):
+    """BFS over a graph store's CSR arrays that expands each layer with whole-array gathers.
+
+    `start` and `target` are node ids; returns the path as node ids, or [] when there is none. The
+    frontier is an id array and the visited set a boolean array. Each layer runs top-down (gathering
+    the frontier's out-links) or bottom-up (gathering the in-links of every unvisited page), whichever
+    touches fewer links when `direction` is 'auto'. Bottom-up layers win once hub pages make the
+    frontier explode. Parents are chosen as search_algorithms.bfs chooses them, so for stores with
+    sorted rows, as graph_store.py writes them, the paths are the same, max_depth quirk included.
+    If a `stats` dict is given, it receives the pages discovered and, per layer, the frontier size,
+    direction, links touched and seconds.
+    """
+    for _, path in sparse_bfs_many(graph, start, [target], max_depth, direction, stats):
+        return path
+
+def sparse_bfs_many(graph, start, targets, max_depth=10, direction='auto', stats=None):
+    """One sparse_bfs tree from `start` for many targets: yields (target, path) as each target is
+    reached, then (target, []) for the targets out of reach. Stops once every target is answered."""
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Unknown direction {direction}; choose one of {', '.join(DIRECTIONS)}")
+    node_count = graph.node_count
+    if not 0 <= start < node_count:
+        raise ValueError(f"Start id {start} is not a page of this graph")
+    # Ids outside the graph can never be reached; a negative one would otherwise index from the end
+    pending = {target for target in targets if 0 <= target < node_count}
+    if start in pending:
+        pending.discard(start)
+        yield start, [start]
+    # Zeroed arrays are mapped lazily, so a search that stops early only touches the pages it uses
+    visited = np.zeros(node_count, dtype=bool)
+    parents = np.zeros(node_count, dtype=np.int32)  # parent id + 1, so zero means none
+    rank = np.zeros(node_count, dtype=np.int32)
+    visited[start] = True
+    frontier = np.array([start], dtype=np.int64)
+    unvisited_in_links = len(graph.in_adjacency) - int(graph.in_offsets[start + 1] - graph.in_offsets[start])
+    wanted = np.zeros(node_count, dtype=bool)
+    wanted[list(pending)] = True
+    layers = []
+    depth = 0
+    while pending and len(frontier) and depth <= max_depth:
+        started = time.perf_counter()
+        SEARCH_FRONTIER.set(len(frontier), algorithm='bfs')
+        SEARCH_EXPANDED.inc(len(frontier), algorithm='bfs')
+        frontier_links = int((graph.offsets[frontier + 1] - graph.offsets[frontier]).sum())
+        bottom_up = direction == 'bottom-up' or (direction == 'auto' and
+                                                  unvisited_in_links <= frontier_links * BOTTOM_UP_FACTOR)
+        if bottom_up:
+            nodes, node_parents = _bottom_up(graph, frontier, visited, rank)
+        else:
+            nodes, node_parents = _top_down(graph, frontier, visited)
+        layers.append({'depth': depth, 'frontier': len(frontier), 'direction': 'bottom-up' if bottom_up else 'top-down',
+                       'links': unvisited_in_links if bottom_up else frontier_links})
+        found = []
+        for hit in np.flatnonzero(wanted[nodes]).tolist():
+            path = [int(nodes[hit]), int(node_parents[hit])]
+            while path[-1] != start:
+                path.append(int(parents[path[-1]]) - 1)
+            path.reverse()
+            found.append(path)
+        if pending.difference(path[-1] for path in found) and depth + 1 <= max_depth:
+            visited[nodes] = True
+            parents[nodes] = node_parents + 1
+            unvisited_in_links -= int((graph.in_offsets[nodes + 1] - graph.in_offsets[nodes]).sum())
+        layers[-1]['seconds'] = time.perf_counter() - started
+        if stats is not None:
+            stats.update(discovered=int(visited.sum()), layers=layers)
+        for path in found:
+            pending.discard(path[-1])
+            yield path[-1], path
+        frontier = nodes
+        depth += 1
+    if stats is not None:
+        stats.update(discovered=int(visited.sum()), layers=layers)
+    answered = set()
+    for target in targets:
+        if target in pending or not 0 <= target < node_count:
+            if target not in answered:
+                answered.add(target)
+                yield target, []
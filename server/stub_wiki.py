@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+from html import escape
+from urllib.parse import quote
+from aiohttp import web
+
+# Constants
+DEFAULT_PAGES = 2000
+DEFAULT_MEAN_LINKS = 25
+API_MAX_TITLES = 50
+API_MAX_EXTRACTS = 20
+API_MAX_LINKS = 500  # what 'max' means for pllimit/lhlimit without bot rights
+FILLER_PARAGRAPH = (
+    '<p>The <b>subject</b> has been studied extensively<sup class="reference"><a href="#cite_note-1">[1]</a></sup>, '
+    'with <i>several</i> accounts describing its history, reception and influence in considerable detail. '
+    '<span class="nowrap">Later work</span> revisited these findings<sup class="reference"><a href="#cite_note-2">[2]</a></sup>.</p>'
+)
+NAV_LINKS = ['Main_Page', 'Wikipedia:Contents', 'Portal:Current_events', 'Special:Random', 'Help:Contents']
+
+def normalize_stub_title(title):
+    return title.replace(' ', '_')
+
+def wiki_href(title):
+    # Wikipedia leaves namespace colons unescaped in article hrefs
+    return '/wiki/' + quote(title, safe=':')
+
+class SyntheticWiki:
+    """A deterministic link graph with a heavy-tailed in-degree distribution, standing in for Wikipedia."""
+
+    def __init__(self, n_pages=DEFAULT_PAGES, mean_links=DEFAULT_MEAN_LINKS, seed=0, titles=None, links=None):
+        if links is not None:
+            self.links = {normalize_stub_title(t): [normalize_stub_title(l) for l in ls] for t, ls in links.items()}
+            self.titles = list(self.links)
+            self.page_ids = {title: page_id for page_id, title in enumerate(self.titles, 1)}
+            self.revisions = {title: 1 for title in self.titles}
+            self.redirects = {}
+            return
+        rng = random.Random(seed)
+        self.titles = [normalize_stub_title(t) for t in (titles or [])]
+        self.titles += [f"Article_{i}" for i in range(len(self.titles), n_pages)]
+        # Zipf-like weights make a handful of pages hubs, as on Wikipedia
+        ranks = list(range(len(self.titles)))
+        rng.shuffle(ranks)
+        hub_weights = [1.0 / (rank + 1) for rank in ranks]
+        self.links = {}
+        for title in self.titles:
+            # exp(0.8 ** 2 / 2) ~= 1.377 is the mean of the lognormal, so degrees average `mean_links`
+            degree = max(1, int(rng.lognormvariate(0, 0.8) * mean_links / 1.377))
+            targets = rng.choices(self.titles, weights=hub_weights, k=degree)
+            self.links[title] = list(dict.fromkeys(t for t in targets if t != title))
+        self.page_ids = {title: page_id for page_id, title in enumerate(self.titles, 1)}
+        self.revisions = {title: 1 for title in self.titles}
+        self.redirects = {}  # redirect title -> article title
+
+    def __contains__(self, title):
+        title = normalize_stub_title(title)
+        return title in self.links or title in self.redirects
+
+    def resolve(self, title):
+        """The article a title leads to, following a redirect."""
+        title = normalize_stub_title(title)
+        return self.redirects.get(title, title)
+
+    def add_redirects(self, count, seed=0):
+        """Adds redirects to the `count` most linked articles and points about half of the links to each
+        of those articles at its redirect instead, as links to 'USA' lead to 'United States'."""
+        if not count:
+            return
+        rng = random.Random(seed)
+        targets = sorted(self.titles, key=lambda title: -len(self.backlinks(title)))[:count]
+        alias_of = {target: f"{target}_alias" for target in targets}
+        for target, alias in alias_of.items():
+            self.redirects[alias] = target
+            self.page_ids[alias] = len(self.page_ids) + 1
+            self.revisions[alias] = 1
+        for title in self.titles:
+            self.links[title] = list(dict.fromkeys(
+                alias_of[link] if link in alias_of and rng.random() < 0.5 else link for link in self.links[title]
+            ))
+        del self._backlinks
+
+    def outlinks(self, title):
+        return self.links.get(normalize_stub_title(title), [])
+
+    def render_html(self, title, paragraphs=0):
+        """Article HTML laid out like Wikipedia's; `paragraphs` adds that much filler prose to approach real page sizes."""
+        title = normalize_stub_title(title)
+        nav = ''.join(f'<li><a href="{wiki_href(t)}">{escape(t)}</a></li>' for t in NAV_LINKS)
+        body = ''.join(
+            f'<p>See <a href="{wiki_href(t)}" title="{escape(t)}">{escape(t.replace("_", " "))}</a>.</p>'
+            for t in self.links[title]
+        )
+        body += FILLER_PARAGRAPH * paragraphs
+        return (
+            f'<!DOCTYPE html><html><head><title>{escape(title)} - Wikipedia</title></head><body>'
+            f'<div id="mw-navigation"><ul>{nav}</ul></div>'
+            f'<div id="content"><h1>{escape(title.replace("_", " "))}</h1>'
+            f'<div id="mw-content-text" class="mw-body-content"><div class="mw-parser-output">{body}'
+            f'<p><a href="#References">References</a></p></div></div>'
+            f'<div id="catlinks"><a href="/wiki/Category:Stub">Category:Stub</a></div></div>'
+            f'<div id="footer"><a href="/wiki/Wikipedia:About">About</a></div></body></html>'
+        )
+
+    def backlinks(self, title):
+        if not hasattr(self, '_backlinks'):
+            self._backlinks = {page: [] for page in self.titles}
+            for page in self.titles:
+                for link in self.links[page]:
+                    self._backlinks.setdefault(link, []).append(page)
+        return self._backlinks.get(normalize_stub_title(title), [])
+
+    def page_id(self, title):
+        return self.page_ids[normalize_stub_title(title)]
+
+    def revision_id(self, title):
+        return self.revisions[normalize_stub_title(title)]
+
+    def edit(self, title, links):
+        """Replaces a page's links and gives it a new revision id, as an edit on Wikipedia would."""
+        title = normalize_stub_title(title)
+        self.links[title] = [normalize_stub_title(link) for link in links]
+        self.revisions[title] += 1
+        if hasattr(self, '_backlinks'):
+            del self._backlinks
+
+    def extract(self, title):
+        title = normalize_stub_title(title)
+        topics = ', '.join(link.replace('_', ' ') for link in self.links.get(title, [])[:10])
+        return f"{title.replace('_', ' ')} is an article related to {topics}."
+
+    def shortest_path_length(self, start, finish):
+        start, finish = self.resolve(start), self.resolve(finish)
+        depth = {start: 0}
+        queue = deque([start])
+        while queue:
+            page = queue.popleft()
+            if page == finish:
+                return depth[page]
+            for link in self.links.get(page, []):
+                link = self.redirects.get(link, link)
+                if link not in depth:
+                    depth[link] = depth[page] + 1
+                    queue.append(link)
+        return None
+
+def _api_extracts(wiki, params, pages, result):
+    offset = int(params.get('excontinue', 0))
+    existing = [page for page in pages if 'missing' not in page]
+    for page in existing[offset:offset + API_MAX_EXTRACTS]:
+        page['extract'] = wiki.extract(page['title'])
+    if offset + API_MAX_EXTRACTS < len(existing):
+        result['continue'] = {'excontinue': offset + API_MAX_EXTRACTS, 'continue': '||'}
+
+def _api_info(wiki, params, pages, result):
+    for page in pages:
+        if 'missing' not in page:
+            page['lastrevid'] = wiki.revision_id(page['title'])
+
+def _api_link_list(field, prefix, get_links):
+    """A prop handler listing linked pages for every requested page, API_MAX_LINKS per response across all pages."""
+    def handler(wiki, params, pages, result):
+        limit = params.get(f'{prefix}limit', '10')
+        limit = API_MAX_LINKS if limit == 'max' else min(int(limit), API_MAX_LINKS)
+        offset = int(params.get(f'{prefix}continue', 0))
+        position = 0
+        for page in pages:
+            if 'missing' in page:
+                continue
+            for title in get_links(wiki, page['title']):
+                if offset <= position < offset + limit:
+                    page.setdefault(field, []).append({'ns': 0, 'title': title.replace('_', ' ')})
+                position += 1
+        if offset + limit < position:
+            result['continue'] = {f'{prefix}continue': str(offset + limit), 'continue': '||'}
+    return handler
+
+API_PROPS = {
+    'extracts': _api_extracts,
+    'info': _api_info,
+    'links': _api_link_list('links', 'pl', lambda wiki, title: wiki.outlinks(title)),
+    'linkshere': _api_link_list('linkshere', 'lh', lambda wiki, title: wiki.backlinks(title)),
+}
+
+def api_query(wiki, params):
+    """Answers an action=query request (formatversion=2) the way the MediaWiki API would, for the supported props."""
+    if params.get('action') != 'query':
+        return {'error': {'code': 'badvalue', 'info': 'Only action=query is supported by the stub'}}
+    titles = [title for title in params.get('titles', '').split('|') if title]
+    if len(titles) > API_MAX_TITLES:
+        return {'error': {'code': 'toomanyvalues', 'info': f"Too many values supplied for parameter \"titles\". The limit is {API_MAX_TITLES}."}}
+
+    query = {}
+    pages = {}
+    normalized = []
+    redirects = []
+    for title in titles:
+        display_title = title.replace('_', ' ')
+        if display_title != title:
+            normalized.append({'from': title, 'to': display_title})
+        if params.get('redirects') and wiki.resolve(display_title) != normalize_stub_title(display_title):
+            redirect_title = display_title
+            display_title = wiki.resolve(display_title).replace('_', ' ')
+            redirects.append({'from': redirect_title, 'to': display_title})
+        if display_title in wiki:
+            pages[display_title] = {'pageid': wiki.page_id(display_title), 'ns': 0, 'title': display_title}
+            if wiki.resolve(display_title) != normalize_stub_title(display_title):
+                pages[display_title]['redirect'] = True
+        else:
+            pages[display_title] = {'ns': 0, 'title': display_title, 'missing': True}
+    pages = list(pages.values())
+    if normalized:
+        query['normalized'] = normalized
+    if redirects:
+        query['redirects'] = redirects
+    if titles:
+        query['pages'] = pages
+
+    result = {'batchcomplete': True, 'query': query}
+    for prop in params.get('prop', '').split('|'):
+        if prop in API_PROPS:
+            API_PROPS[prop](wiki, params, pages, result)
+    if 'continue' in result:
+        del result['batchcomplete']
+    return result
+
+class RequestLog:
+    def __init__(self):
+        self.times = []
+        self.throttled = 0
+        self.bytes_sent = 0
+
+    def record(self):
+        self.times.append(time.monotonic())
+
+    def peak_rate(self, window=1.0):
+        """Largest number of requests seen in any `window`-second interval, per second."""
+        peak, first = 0, 0
+        for last, t in enumerate(self.times):
+            while t - self.times[first] > window:
+                first += 1
+            peak = max(peak, last - first + 1)
+        return peak / window
+
+    def mean_rate(self):
+        if len(self.times) < 2:
+            return float(len(self.times))
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0])
+
+def make_app(wiki, latency=0.0, jitter=0.0, rate_limit=None, seed=0, paragraphs=0, slow_fraction=0.0, slow_latency=0.0):
+    rng = random.Random(seed)
+    log = RequestLog()
+    recent = deque()
+
+    async def delay():
+        # `slow_fraction` of responses take `slow_latency` longer, the tail that hedged requests cut off
+        slow = slow_latency if slow_fraction and rng.random() < slow_fraction else 0.0
+        if latency or jitter or slow:
+            await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)) + slow)
+
+    @web.middleware
+    async def throttle(request, handler):
+        if request.path == '/stats':
+            return await handler(request)
+        now = time.monotonic()
+        while recent and now - recent[0] > 1.0:
+            recent.popleft()
+        if rate_limit and len(recent) >= rate_limit:
+            log.throttled += 1
+            return web.Response(status=429, headers={'Retry-After': '1'})
+        recent.append(now)
+        log.record()
+        await delay()
+        response = await handler(request)
+        log.bytes_sent += len(response.body or b'')
+        return response
+
+    async def article(request):
+        # Wikipedia serves the article itself at a redirect's URL
+        title = wiki.resolve(request.match_info['title'])
+        if title not in wiki:
+            raise web.HTTPNotFound()
+        return web.Response(text=wiki.render_html(title, paragraphs), content_type='text/html')
+
+    async def api(request):
+        return web.json_response(api_query(wiki, request.query))
+
+    async def stats(request):
+        return web.json_response({
+            'requests': len(log.times),
+            'throttled': log.throttled,
+            'bytes_sent': log.bytes_sent,
+            'peak_rate': log.peak_rate(),
+            'mean_rate': log.mean_rate(),
+        })
+
+    app = web.Application(middlewares=[throttle])
+    app['wiki'] = wiki
+    app['request_log'] = log
+    app.router.add_get('/wiki/{title:.+}', article)
+    app.router.add_get('/w/api.php', api)
+    app.router.add_get('/stats', stats)
+    return app
+
+async def start_stub(wiki, host='127.0.0.1', port=0, **kwargs):
+    """Starts the stub in the running event loop and returns (runner, base_url)."""
+    app = make_app(wiki, **kwargs)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://{host}:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic Wikipedia for offline crawling')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--pages', type=int, default=DEFAULT_PAGES)
+    parser.add_argument('--mean_links', type=int, default=DEFAULT_MEAN_LINKS)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds added to every response')
+    parser.add_argument('--rate_limit', type=int, default=None, help='Answer 429 above this many requests per second')
+    parser.add_argument('--paragraphs', type=int, default=0, help='Filler paragraphs added to every article page')
+    parser.add_argument('--redirects', type=int, default=0, help='Redirects added to the most linked articles')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    wiki = SyntheticWiki(args.pages, args.mean_links, seed=args.seed)
+    wiki.add_redirects(args.redirects, seed=args.seed)
+    app = make_app(wiki, latency=args.latency, rate_limit=args.rate_limit, seed=args.seed,
+                   paragraphs=args.paragraphs)
+    web.run_app(app, host='127.0.0.1', port=args.port)
+
+if __name__ == '__main__':
+    main()
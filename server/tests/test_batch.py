@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from benchmarks import synthetic_graph
+from crawler import batch_find_paths
+from graph_store import LinkGraph, write_store
+from search_algorithms import batch_bfs, bfs, bfs_many
+
+def assert_valid_path(graph, path, start, target):
+    assert path[0] == start and path[-1] == target
+    assert all(b in graph[a] for a, b in zip(path, path[1:]))
+
+def pairs_sharing_pages(nodes, seed=0):
+    rng = np.random.default_rng(seed)
+    pairs = [(0, int(target)) for target in rng.integers(0, nodes, 15)]  # one shared start
+    pairs += [(int(start), 7) for start in rng.integers(0, nodes, 15)]  # one shared finish
+    pairs += [tuple(int(page) for page in rng.integers(0, nodes, 2)) for _ in range(15)]
+    return pairs + pairs[:3]  # repeats are answered once
+
+def test_bfs_many_matches_bfs_per_target():
+    graph = synthetic_graph(300, 700)
+    targets = list(range(0, 300, 7)) + [0]
+    answers = dict(bfs_many(graph, 0, targets, max_depth=4))
+    assert set(answers) == set(targets)
+    for target in targets:
+        expected = bfs(graph, 0, target, max_depth=4)
+        assert len(answers[target]) == len(expected)
+        if expected:
+            assert_valid_path(graph, answers[target], 0, target)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_batch_bfs_matches_bfs_per_pair(seed):
+    graph = synthetic_graph(300, 900, seed)
+    pairs = pairs_sharing_pages(300, seed)
+    answers = {(start, finish): path for start, finish, path in batch_bfs(graph, pairs)}
+    assert set(answers) == set(pairs)
+    for (start, finish), path in answers.items():
+        expected = bfs(graph, start, finish)
+        assert len(path) == len(expected)
+        if expected:
+            assert_valid_path(graph, path, start, finish)
+
+def test_batch_bfs_on_a_graph_store_matches_the_dict_graph(tmp_path):
+    graph = synthetic_graph(300, 900)
+    write_store(str(tmp_path), [f"Page {node}" for node in graph],
+                np.array([node for node, links in graph.items() for _ in links]),
+                np.array([link for links in graph.values() for link in links]))
+    store = LinkGraph(str(tmp_path))
+    pairs = pairs_sharing_pages(300) + [(1, 300)]
+    named = [(f"Page {start}", f"Page {finish}") for start, finish in pairs]
+    answers = {(start, finish): path for start, finish, path in batch_bfs(store, named)}
+    assert answers[('Page 1', 'Page 300')] == []
+    for start, finish in pairs[:-1]:
+        assert len(answers[f"Page {start}", f"Page {finish}"]) == len(bfs(graph, start, finish))
+
+@pytest.mark.parametrize('algorithm', ['bfs', 'bidirectional'])
+def test_batch_find_paths_honours_the_algorithm(algorithm, monkeypatch):
+    import crawler
+    graph = synthetic_graph(200, 600)
+    calls = []
+    bidirectional = crawler.bidirectional_bfs
+    monkeypatch.setattr(crawler, 'bidirectional_bfs', lambda *args, **kwargs: calls.append(args[1:3]) or bidirectional(*args, **kwargs))
+    pairs = [(0, 5), (0, 9), (3, 9)]
+    for use_graph in (True, False):
+        calls.clear()
+        build = lambda start: graph
+        answers = {(start, finish): path for start, finish, path in
+                   batch_find_paths(pairs, graph if use_graph else None, None if use_graph else build, algorithm)}
+        for (start, finish), path in answers.items():
+            assert len(path) == len(bfs(graph, start, finish))
+        assert (calls == pairs) == (algorithm == 'bidirectional')
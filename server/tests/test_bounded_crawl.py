@@ -0,0 +1,71 @@
+import asyncio
+import os
+import random
+from bounded_crawl import BloomFilter, SpillingFrontier
+from crawler import build_graph_bounded, build_graph_concurrent
+from stub_wiki import SyntheticWiki, start_stub
+
+def test_bloom_filter_has_no_false_negatives():
+    rng = random.Random(0)
+    keys = [f"Page {rng.random()}" for _ in range(5000)]
+    bloom = BloomFilter(len(keys))
+    bloom.add_many(keys[:2500])
+    bloom.add_many(keys[2500:])
+    assert bloom.contains_many(keys).all()
+    unseen = [f"Other {rng.random()}" for _ in range(5000)]
+    # About 1% at capacity with 10 bits per key
+    assert bloom.contains_many(unseen).mean() < 0.03
+
+def test_bloom_filter_capped_in_bytes_still_has_no_false_negatives():
+    keys = [f"Page {i}" for i in range(5000)]
+    bloom = BloomFilter(len(keys), max_bytes=256)
+    assert bloom.bits.nbytes <= 256
+    bloom.add_many(keys)
+    assert bloom.contains_many(keys).all()
+
+def test_frontier_spills_and_reloads_in_fifo_order(tmp_path):
+    frontier = SpillingFrontier(str(tmp_path), max_items=4)
+    nodes = [9, 3, 7, 1, 8, 2, 6, 0, 5, 4, 11]
+    for node in nodes:
+        frontier.append(node)
+    assert frontier.spills == 2
+    assert len(os.listdir(tmp_path)) == 2
+    assert len(frontier) == len(nodes)
+    assert list(frontier) == nodes
+    # Reading the level consumes it and removes its segments
+    assert len(frontier) == 0 and not os.listdir(tmp_path)
+
+def test_frontier_closed_early_removes_its_segments(tmp_path):
+    frontier = SpillingFrontier(str(tmp_path), max_items=2)
+    for node in range(7):
+        frontier.append(node)
+    pages = iter(frontier)
+    assert [next(pages) for _ in range(3)] == [0, 1, 2]
+    pages.close()
+    assert not os.listdir(tmp_path)
+
+def test_bounded_crawl_writes_the_same_graph_as_the_concurrent_crawl(tmp_path):
+    wiki = SyntheticWiki(1500)
+
+    async def run():
+        runner, base_url = await start_stub(wiki)
+        try:
+            options = dict(max_depth=2, max_links_per_page=10**6, max_pages=10**6, concurrency=10,
+                           base_url=base_url, link_source='api')
+            concurrent = await build_graph_concurrent('Article 0', 'Article 1', **options)
+            stats = {}
+            # A budget this small spills every level's frontier
+            bounded = await build_graph_bounded('Article 0', 'Article 1', str(tmp_path), memory_budget=4096,
+                                                stats=stats, **options)
+            return concurrent, bounded, stats
+        finally:
+            await runner.cleanup()
+
+    concurrent, bounded, stats = asyncio.run(run())
+    assert stats['spills'] > 0
+    assert bounded.node_count == len(concurrent)
+    assert {title: sorted(links) for title, links in bounded.items()} == \
+        {title: sorted(set(links)) for title, links in concurrent.items()}
+    for title in list(concurrent)[:50]:
+        assert sorted(bounded.reversed().get(title, [])) == sorted(
+            page for page, links in concurrent.items() if title in links)
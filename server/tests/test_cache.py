@@ -0,0 +1,28 @@
+import json
+import threading
+from cache import KVCache
+
+def test_memory_tier_is_sized_by_decoded_values(tmp_path):
+    cache = KVCache(str(tmp_path / 'cache.db'), memory_limit=5000)
+    values = {f"page {i}": [f"Link {i} {j}" for j in range(100)] for i in range(20)}
+    cache.put_many(values)
+    assert 0 < cache.memory_size <= 5000
+    # Each value's JSON encoding, not its much smaller compressed blob, counts against the limit
+    assert cache.memory_size == sum(len(json.dumps(values[key]).encode('utf-8')) for key in cache.memory)
+    assert len(cache.memory) < len(values)
+    # Evicted entries are still answered from disk
+    assert cache.get('page 0') == values['page 0']
+
+def test_close_closes_every_thread_connection(tmp_path):
+    cache = KVCache(str(tmp_path / 'cache.db'))
+    cache.put('page', ['A'])
+    thread = threading.Thread(target=lambda: cache.put('other', ['B']))
+    thread.start()
+    thread.join()
+    assert len(cache.connections) == 2
+    cache.close()
+    assert not cache.connections
+    # A closed cache reopens its connection when used again
+    cache.memory.clear()
+    assert cache.get_many(['page', 'other']) == {'page': ['A'], 'other': ['B']}
+    cache.close()
@@ -0,0 +1,72 @@
+import asyncio
+from cache import KVCache
+from canonical import CANONICAL_CACHE_PREFIX, TitleResolver
+from network import AsyncHTTPClient, follow_title_changes
+from stub_wiki import SyntheticWiki, start_stub
+
+async def with_resolver(wiki, run, cache=None):
+    runner, base_url = await start_stub(wiki)
+    try:
+        async with AsyncHTTPClient(rate_limit=None) as client:
+            return await run(TitleResolver(client, f"{base_url}/w/api.php", cache), runner.app['request_log'])
+    finally:
+        await runner.cleanup()
+
+def spaced(title):
+    return title.replace('_', ' ')
+
+def test_redirects_and_spellings_collapse_to_one_title(tmp_path):
+    wiki = SyntheticWiki(300)
+    wiki.add_redirects(20, seed=1)
+    aliases = list(wiki.redirects)
+
+    async def run(resolver, log):
+        titles = []
+        for alias in aliases:
+            article = wiki.redirects[alias]
+            # The article, its redirect, and the forms MediaWiki normalizes to them
+            titles.append([spaced(article), article, spaced(article).lower(), f" {spaced(alias)} ", alias.lower()])
+        resolved = await resolver.resolve_ids([title for forms in titles for title in forms])
+        return titles, resolved
+
+    titles, resolved = asyncio.run(with_resolver(wiki, run, KVCache(str(tmp_path / 'cache.db'))))
+    for alias, forms in zip(aliases, titles):
+        article = spaced(wiki.redirects[alias])
+        assert {tuple(resolved[title]) for title in forms} == {(article, wiki.page_id(article))}
+
+def test_resolutions_are_kept_but_missing_pages_are_not(tmp_path):
+    wiki = SyntheticWiki(300)
+    wiki.add_redirects(5, seed=2)
+    alias = spaced(next(iter(wiki.redirects)))
+    cache = KVCache(str(tmp_path / 'cache.db'))
+
+    async def run(resolver, log):
+        first = await resolver.resolve([alias, 'No such page'])
+        requests = len(log.times)
+        # A new resolver over the same cache only asks about the missing page again
+        resolver = TitleResolver(resolver.client, resolver.api_url, cache)
+        second = await resolver.resolve([alias, 'No such page'])
+        return first, second, requests, len(log.times) - requests
+
+    first, second, requests, repeated = asyncio.run(with_resolver(wiki, run, cache))
+    assert first == second == {alias: spaced(wiki.resolve(alias)), 'No such page': 'No such page'}
+    assert requests == repeated == 1
+    assert cache.get(CANONICAL_CACHE_PREFIX + 'No such page') is None
+
+def test_links_through_redirects_are_merged():
+    wiki = SyntheticWiki(links={'Home': ['Target', 'Target_alias', 'Home_alias', 'Other'], 'Target': [], 'Other': []})
+    wiki.redirects.update({'Target_alias': 'Target', 'Home_alias': 'Home'})
+    wiki.page_ids.update({'Target_alias': 4, 'Home_alias': 5})
+
+    async def run(resolver, log):
+        return await resolver.canonicalize_links({'Home': ['Target', 'Target alias', 'Home alias', 'Other']})
+
+    assert asyncio.run(with_resolver(wiki, run)) == {'Home': ['Target', 'Other']}
+
+def test_redirect_chains_and_loops_terminate():
+    query = {'normalized': [{'from': 'a_b', 'to': 'A b'}],
+             'redirects': [{'from': 'A b', 'to': 'C'}, {'from': 'C', 'to': 'D'},
+                           {'from': 'Loop 1', 'to': 'Loop 2'}, {'from': 'Loop 2', 'to': 'Loop 1'}]}
+    resolved = follow_title_changes({'a_b': 'a_b', 'C': 'C', 'Loop 1': 'Loop 1', 'D': 'D'}, query)
+    assert resolved['a_b'] == resolved['C'] == resolved['D'] == 'D'
+    assert resolved['Loop 1'] in ('Loop 1', 'Loop 2')
@@ -0,0 +1,124 @@
+import asyncio
+import json
+from crawl_store import CrawlStore
+from crawler import build_graph
+from link_sources import APILinkSource
+from network import AsyncHTTPClient
+from stub_wiki import SyntheticWiki, start_stub
+
+def spaced(titles):
+    return [title.replace('_', ' ') for title in titles]
+
+async def with_api_source(wiki, run):
+    runner, base_url = await start_stub(wiki)
+    try:
+        async with AsyncHTTPClient(rate_limit=None) as client:
+            return await run(APILinkSource(client, f"{base_url}/w/api.php"), runner.app['request_log'])
+    finally:
+        await runner.cleanup()
+
+class FailingRevisions:
+    """Wraps a link source whose revision check always fails."""
+    def __init__(self, source):
+        self.source = source
+
+    async def revisions(self, titles):
+        raise RuntimeError('revision query failed')
+
+    async def forward(self, titles):
+        return await self.source.forward(titles)
+
+def test_new_pages_are_fetched_without_a_revision_check(tmp_path):
+    wiki = SyntheticWiki(30)
+    titles = spaced(wiki.titles[:5])
+
+    async def run(source, log):
+        with CrawlStore(str(tmp_path)) as store:
+            links = await store.fetch_links(titles, source)
+            return links, len(log.times)
+
+    links, requests = asyncio.run(with_api_source(wiki, run))
+    assert links == {title: spaced(wiki.outlinks(title)) for title in titles}
+    assert requests == 1
+
+def test_expired_pages_are_revalidated_and_edited_pages_refetched(tmp_path):
+    wiki = SyntheticWiki(30)
+    titles = spaced(wiki.titles[:5])
+
+    async def run(source, log):
+        with CrawlStore(str(tmp_path), ttl=1e-9) as store:
+            await store.fetch_links(titles, source)
+            # The first expiry records each page's revision
+            await store.fetch_links(titles, source)
+            wiki.edit(titles[0], wiki.outlinks(titles[0])[::-1])
+            requests_before = len(log.times)
+            links = await store.fetch_links(titles, source)
+            return links, len(log.times) - requests_before
+
+    links, requests = asyncio.run(with_api_source(wiki, run))
+    assert links == {title: spaced(wiki.outlinks(title)) for title in titles}
+    # One revision check, then only the edited page is refetched
+    assert requests == 2
+
+def test_failed_revision_check_refetches_expired_pages(tmp_path):
+    wiki = SyntheticWiki(30)
+    titles = spaced(wiki.titles[:5])
+
+    async def run(source, log):
+        with CrawlStore(str(tmp_path), ttl=1e-9) as store:
+            await store.fetch_links(titles, source)
+            wiki.edit(titles[0], [])
+            wiki.edit(titles[0], wiki.outlinks(titles[1]))
+            return await store.fetch_links(titles, FailingRevisions(source))
+
+    links = asyncio.run(with_api_source(wiki, run))
+    assert links == {title: spaced(wiki.outlinks(title)) for title in titles}
+
+def test_store_is_replayed_on_open_and_a_torn_line_dropped(tmp_path):
+    wiki = SyntheticWiki(30)
+    titles = spaced(wiki.titles[:5])
+
+    async def run(source, log):
+        with CrawlStore(str(tmp_path)) as store:
+            return await store.fetch_links(titles, source)
+
+    links = asyncio.run(with_api_source(wiki, run))
+    with open(tmp_path / 'edges.jsonl', 'a') as file:
+        file.write(json.dumps({'title': 'Torn', 'revid': 1, 'fetched_at': 0, 'links': ['A']})[:20])
+    with CrawlStore(str(tmp_path)) as store:
+        assert {title: store.links(title) for title in titles} == links
+        assert 'Torn' not in store
+    with open(tmp_path / 'edges.jsonl', 'rb') as file:
+        assert file.read().endswith(b'\n')
+
+def test_interrupted_crawl_resumes_from_its_checkpoint(tmp_path):
+    wiki = SyntheticWiki(600)
+    start, finish = spaced(wiki.titles[:2])
+
+    async def run():
+        runner, base_url = await start_stub(wiki, latency=0.05)
+        try:
+            options = dict(max_depth=3, max_links_per_page=10**6, max_pages=400, concurrency=20, base_url=base_url, link_source='api')
+            reference = await build_graph(start, finish, **options)
+            with CrawlStore(str(tmp_path)) as store:
+                task = asyncio.ensure_future(build_graph(start, finish, store=store, **options))
+                while not task.done() and (store.load_checkpoint() or {}).get('depth', 0) < 2:
+                    await asyncio.sleep(0.005)
+                assert not task.done()
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                stored = len(store)
+            log = runner.app['request_log']
+            requests_before = len(log.times)
+            with CrawlStore(str(tmp_path)) as store:
+                resumed = await build_graph(start, finish, store=store, **options)
+                assert store.load_checkpoint() is None
+            return reference, resumed, stored, len(log.times) - requests_before
+        finally:
+            await runner.cleanup()
+
+    reference, resumed, stored, requests = asyncio.run(run())
+    assert resumed == reference
+    assert stored > 0
+    # Pages stored before the interruption are not fetched again
+    assert requests <= len(reference) - stored
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from crawl_store import CrawlStore
+from crawler import build_graph_concurrent
+from link_sources import APILinkSource
+from network import AsyncHTTPClient
+from stub_wiki import SyntheticWiki, start_stub
+
+def spaced(titles):
+    return [title.replace('_', ' ') for title in titles]
+
+def depths_from(wiki, start, max_links=None):
+    """Link distance from `start` to every page it reaches through each page's first `max_links` links."""
+    depths, frontier = {start: 0}, [start]
+    while frontier:
+        next_frontier = []
+        for page in frontier:
+            for link in spaced(wiki.outlinks(page))[:max_links]:
+                if link not in depths:
+                    depths[link] = depths[page] + 1
+                    next_frontier.append(link)
+        frontier = next_frontier
+    return depths
+
+class CountingSource:
+    """Wraps a link source, recording the pages whose links it fetched."""
+    def __init__(self, source):
+        self.source = source
+        self.fetched = []
+
+    async def forward(self, titles):
+        self.fetched.extend(titles)
+        return await self.source.forward(titles)
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+async def with_stub(wiki, run):
+    runner, base_url = await start_stub(wiki, latency=0.01)
+    try:
+        return await run(base_url)
+    finally:
+        await runner.cleanup()
+
+def crawl(wiki, start, finish, **options):
+    async def run(base_url):
+        return await build_graph_concurrent(start, finish, base_url=base_url, concurrency=20, parse_processes=0, **options)
+    return asyncio.run(with_stub(wiki, run))
+
+@pytest.mark.parametrize('link_source', ['api', 'html'])
+def test_crawl_covers_exactly_the_pages_within_max_depth(link_source):
+    wiki = SyntheticWiki(800, mean_links=4)
+    start, finish = spaced(wiki.titles[:2])
+    graph = crawl(wiki, start, finish, max_depth=3, max_links_per_page=10**6, max_pages=10**6, link_source=link_source)
+    depths = depths_from(wiki, start)
+    assert set(graph) == {page for page, depth in depths.items() if depth <= 3}
+    for page, links in graph.items():
+        # Pages at the depth limit are kept as leaves, unfetched
+        assert links == (spaced(wiki.outlinks(page)) if depths[page] < 3 else [])
+
+def test_crawl_stops_at_max_pages_and_samples_links():
+    wiki = SyntheticWiki(800, mean_links=8)
+    start, finish = spaced(wiki.titles[:2])
+    graph = crawl(wiki, start, finish, max_depth=10, max_links_per_page=3, max_pages=50, link_source='api')
+    assert len(graph) == 50
+    assert all(links == spaced(wiki.outlinks(page))[:3] for page, links in graph.items())
+    # Levels are fetched in order, so no page is crawled before a shallower one is
+    depths = depths_from(wiki, start, max_links=3)
+    assert max(depths[page] for page in graph) <= min(depths[page] for page in depths if page not in graph)
+
+def test_missing_start_page_returns_none():
+    wiki = SyntheticWiki(50)
+    assert crawl(wiki, 'No such page', spaced(wiki.titles[:1])[0], link_source='api') is None
+
+def test_crawl_resumes_from_a_matching_checkpoint(tmp_path):
+    wiki = SyntheticWiki(600, mean_links=4)
+    start, finish = spaced(wiki.titles[:2])
+    options = dict(max_depth=3, max_links_per_page=10**6, max_pages=10**6, concurrency=20)
+
+    async def run(base_url):
+        async with AsyncHTTPClient(rate_limit=None) as client:
+            api = APILinkSource(client, f"{base_url}/w/api.php")
+            reference = await build_graph_concurrent(start, finish, base_url=base_url, link_source=api, **options)
+            with CrawlStore(str(tmp_path)) as store:
+                # A crawl interrupted after its first level: the start page is stored, its links queued
+                first_level = await store.fetch_links([start], api)
+                crawl = {'start': start, 'end': finish, 'max_depth': 3, 'max_links_per_page': 10**6}
+                store.save_checkpoint({'crawl': crawl, 'depth': 1, 'frontier': first_level[start], 'pages': [start]})
+                source = CountingSource(api)
+                resumed = await build_graph_concurrent(start, finish, base_url=base_url, link_source=source, store=store,
+                                                       **options)
+                checkpoint = store.load_checkpoint()
+
+                # A checkpoint of a different crawl is ignored
+                store.save_checkpoint({'crawl': dict(crawl, max_depth=2), 'depth': 1, 'frontier': [], 'pages': [start]})
+                restarted = await build_graph_concurrent(start, finish, base_url=base_url, link_source=api, store=store,
+                                                         **options)
+            return reference, resumed, source.fetched, checkpoint, restarted
+
+    reference, resumed, fetched, checkpoint, restarted = asyncio.run(with_stub(wiki, run))
+    assert resumed == restarted == reference
+    assert start not in fetched
+    assert checkpoint is None
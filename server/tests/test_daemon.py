@@ -0,0 +1,76 @@
+import asyncio
+import os
+import numpy as np
+import daemon_client
+from daemon import SearchDaemon, serve
+from graph_store import write_store
+from stub_wiki import SyntheticWiki, start_stub
+
+LINKS = {'Alpha': ['Beta'], 'Beta': ['Gamma'], 'Gamma': ['Alpha'], 'Delta': ['Alpha']}
+
+async def with_daemon(tmp_path, daemon, run):
+    socket_path = str(tmp_path / 'daemon.sock')
+    serving = asyncio.ensure_future(serve(daemon, socket_path))
+    try:
+        while not os.path.exists(socket_path):
+            assert not serving.done(), serving.exception()
+            await asyncio.sleep(0.01)
+
+        async def query(**request):
+            # The client blocks on its socket, so it runs beside the daemon's event loop
+            return await asyncio.get_running_loop().run_in_executor(None, daemon_client.query, request, socket_path)
+        return await run(query)
+    finally:
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+        assert not os.path.exists(socket_path)
+
+def test_online_queries_round_trip_and_only_found_paths_are_cached(tmp_path):
+    async def run_stub():
+        runner, base_url = await start_stub(SyntheticWiki(links=LINKS))
+        log = runner.app['request_log']
+        try:
+            daemon = SearchDaemon(cache_path=str(tmp_path / 'cache.db'), base_url=base_url)
+
+            async def run(query):
+                found = await query(start='Alpha', end='Gamma')
+                requests = len(log.times)
+                again = await query(start='Alpha', end='Gamma')
+                repeat_requests = len(log.times) - requests
+                missing = await query(start='Alpha', end='Delta', max_pages=10)
+                requests = len(log.times)
+                await query(start='Alpha', end='Delta', max_pages=10)
+                retry_requests = len(log.times) - requests
+                wrong_algorithm = await query(start='Alpha', end='Gamma', algorithm='bfs')
+                return found, again, repeat_requests, missing, retry_requests, wrong_algorithm
+            return await with_daemon(tmp_path, daemon, run)
+        finally:
+            await runner.cleanup()
+
+    found, again, repeat_requests, missing, retry_requests, wrong_algorithm = asyncio.run(run_stub())
+    assert found['path'] == ['Alpha', 'Beta', 'Gamma'] and found['algorithm'] == 'online'
+    assert again['path'] == found['path']
+    # Titles and the path both come from the daemon's caches
+    assert repeat_requests == 0
+    assert missing['path'] is None
+    # "No path" from a live search is searched again rather than answered from the cache
+    assert retry_requests > 0
+    assert 'error' in wrong_algorithm
+
+def test_graph_store_queries(tmp_path):
+    titles = list(LINKS)
+    sources = np.array([titles.index(page) for page, links in LINKS.items() for _ in links])
+    destinations = np.array([titles.index(link) for links in LINKS.values() for link in links])
+    write_store(str(tmp_path / 'graph'), titles, sources, destinations)
+    daemon = SearchDaemon(str(tmp_path / 'graph'), cache_path='')
+
+    async def run(query):
+        return [await query(start='alpha', end='Gamma', algorithm=algorithm) for algorithm in ('bfs', 'bidirectional')] + \
+               [await query(start='Alpha', end='Delta'), await query(start='Alpha', end='Nowhere'),
+                await query(start='Alpha', end='Gamma', algorithm='online')]
+
+    bfs, bidirectional, unreachable, unknown, online = asyncio.run(with_daemon(tmp_path, daemon, run))
+    assert bfs['path'] == bidirectional['path'] == ['Alpha', 'Beta', 'Gamma']
+    assert unreachable['path'] is None
+    assert unknown == {'error': 'Start or end page not found in the graph'}
+    assert 'error' in online
@@ -0,0 +1,24 @@
+from graph_store import LinkGraph, import_dump
+
+PAGES = ("INSERT INTO `page` VALUES (1,0,'Alpha',0,0,0.1,'20240401000000',NULL,11,100,'wikitext',NULL),"
+         "(2,0,'Beta',0,0,0.2,'20240401000000',NULL,12,100,'wikitext',NULL),"
+         "(3,0,'B',1,0,0.3,'20240401000000',NULL,13,10,'wikitext',NULL),"
+         "(4,4,'About',0,0,0.4,'20240401000000',NULL,14,100,'wikitext',NULL);\n")
+# Alpha links to Beta through its redirect B; the redirect page itself links to Beta
+PAGELINKS = "INSERT INTO `pagelinks` VALUES (1,0,'B',0),(3,0,'Beta',0),(2,0,'Alpha',0);\n"
+REDIRECTS = "INSERT INTO `redirect` VALUES (3,0,'Beta','','');\n"
+
+def import_fixture(tmp_path, redirects):
+    (tmp_path / 'page.sql').write_text(PAGES)
+    (tmp_path / 'pagelinks.sql').write_text(PAGELINKS)
+    (tmp_path / 'redirect.sql').write_text(REDIRECTS)
+    redirect_dump = str(tmp_path / 'redirect.sql') if redirects else None
+    import_dump(str(tmp_path / 'page.sql'), str(tmp_path / 'pagelinks.sql'), str(tmp_path / 'store'),
+                redirect_dump=redirect_dump)
+    return dict(LinkGraph(str(tmp_path / 'store')).items())
+
+def test_redirect_pages_are_not_nodes(tmp_path):
+    assert import_fixture(tmp_path, redirects=False) == {'Alpha': [], 'Beta': ['Alpha']}
+
+def test_links_to_redirects_lead_to_their_articles(tmp_path):
+    assert import_fixture(tmp_path, redirects=True) == {'Alpha': ['Beta'], 'Beta': ['Alpha']}
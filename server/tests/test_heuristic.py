@@ -0,0 +1,107 @@
+import asyncio
+import numpy as np
+import pytest
+from cache import KVCache
+from heuristic import EmbeddingIndex, WikipediaTextFetcher
+from network import AsyncHTTPClient
+from stub_wiki import API_MAX_EXTRACTS, SyntheticWiki, start_stub
+
+async def with_stub(wiki, run, **stub_options):
+    runner, base_url = await start_stub(wiki, **stub_options)
+    try:
+        return await run(base_url, runner.app['request_log'])
+    finally:
+        await runner.cleanup()
+
+def test_extracts_are_batched_and_follow_continuation(tmp_path):
+    wiki = SyntheticWiki(200)
+    titles = [title.replace('_', ' ') for title in wiki.titles[:120]]
+
+    async def run(base_url, log):
+        fetcher = WikipediaTextFetcher(api_url=f"{base_url}/w/api.php", cache=KVCache(str(tmp_path / 'cache.db')))
+        async with AsyncHTTPClient(rate_limit=None) as client:
+            texts = await fetcher.fetch_texts(titles, client)
+            requests = len(log.times)
+            again = await fetcher.fetch_texts(titles[:10], client)
+        return texts, again, requests, len(log.times)
+
+    texts, again, requests, requests_after = asyncio.run(with_stub(wiki, run))
+    assert texts == {title: wiki.extract(title) for title in titles}
+    # 50 titles per request, and the stub serves API_MAX_EXTRACTS extracts per continuation
+    assert requests == sum(-(-len(titles[i:i + 50]) // API_MAX_EXTRACTS) for i in range(0, len(titles), 50))
+    assert again == {title: texts[title] for title in titles[:10]}
+    assert requests_after == requests
+
+def test_cancelled_fetch_does_not_strand_later_callers(tmp_path):
+    wiki = SyntheticWiki(50)
+    titles = [title.replace('_', ' ') for title in wiki.titles[:5]]
+
+    async def run(base_url, log):
+        fetcher = WikipediaTextFetcher(api_url=f"{base_url}/w/api.php", cache=KVCache(str(tmp_path / 'cache.db')))
+        async with AsyncHTTPClient(rate_limit=None) as client:
+            first = asyncio.ensure_future(fetcher.fetch_texts(titles, client))
+            await asyncio.sleep(0.05)
+            waiter = asyncio.ensure_future(fetcher.fetch_texts(titles, client))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            # The caller waiting on the cancelled fetch is released rather than left hanging
+            await asyncio.wait_for(asyncio.gather(waiter, return_exceptions=True), 1)
+            assert waiter.cancelled()
+            assert not fetcher.in_flight
+            return await asyncio.wait_for(fetcher.fetch_texts(titles, client), 5)
+
+    texts = asyncio.run(with_stub(wiki, run, latency=0.5))
+    assert texts == {title: wiki.extract(title) for title in titles}
+
+CORPUS = {
+    'Cat': 'cats are small furry animals kept as pets that hunt mice',
+    'Dog': 'dogs are loyal furry animals kept as pets that bark',
+    'Mouse': 'mice are small rodents hunted by cats',
+    'Rust': 'rust is a systems programming language with a borrow checker',
+    'Python': 'python is a dynamic programming language with a large standard library',
+    'Compiler': 'a compiler translates a programming language into machine code',
+}
+
+def test_embedding_index_scores_pages_against_a_target(tmp_path):
+    index = EmbeddingIndex(str(tmp_path / 'embeddings'))
+    index.fit(CORPUS, n_components=4)
+    assert index.dimensions == 4 and all(title in index for title in CORPUS)
+    scores = index.similarities(['Cat', 'Dog', 'Rust', 'Unknown'], 'Cat')
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert scores[1] > scores[2]
+    assert scores[3] == 0
+    assert list(index.similarities(['Cat'], 'Unknown')) == [0]
+    estimates = index.distance_estimates(['Cat', 'Dog', 'Unknown'], 'Cat')
+    assert estimates[0] == pytest.approx(0.0, abs=1e-5) and estimates[2] == 1
+
+def test_embedding_index_grows_and_survives_reload(tmp_path):
+    index_dir = str(tmp_path / 'embeddings')
+    index = EmbeddingIndex(index_dir)
+    index.fit(CORPUS, n_components=4)
+    added = {f"Language {i}": f"language number {i} is a programming language" for i in range(10)}
+    index.add({**added, 'Cat': 'ignored, already indexed'})
+    assert index.capacity >= len(CORPUS) + len(added) == len(index.titles)
+    titles = list(CORPUS) + list(added)
+    before = index.similarities(titles, 'Python')
+
+    loaded = EmbeddingIndex.load(index_dir)
+    assert loaded.titles == index.titles
+    assert np.allclose(loaded.similarities(titles, 'Python'), before)
+    assert np.allclose(loaded.transform([CORPUS['Rust']]), index.transform([CORPUS['Rust']]))
+
+def test_intros_and_full_texts_are_cached_apart(tmp_path):
+    wiki = SyntheticWiki(20)
+    titles = [title.replace('_', ' ') for title in wiki.titles[:3]]
+    cache = KVCache(str(tmp_path / 'cache.db'))
+    # What fetch_text would have stored for the first page
+    cache.put(WikipediaTextFetcher.CACHE_PREFIX + titles[0], 'the full text of the page')
+
+    async def run(base_url, log):
+        fetcher = WikipediaTextFetcher(api_url=f"{base_url}/w/api.php", cache=cache)
+        async with AsyncHTTPClient(rate_limit=None) as client:
+            return await fetcher.fetch_texts(titles, client), dict(fetcher.cached_texts())
+
+    texts, cached = asyncio.run(with_stub(wiki, run))
+    assert texts == {title: wiki.extract(title) for title in titles}
+    assert cache.get(WikipediaTextFetcher.CACHE_PREFIX + titles[0]) == 'the full text of the page'
+    assert cached == {titles[0]: 'the full text of the page', **{title: texts[title] for title in titles[1:]}}
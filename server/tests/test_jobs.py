@@ -0,0 +1,90 @@
+import asyncio
+import json
+from jobs import JobManager
+from server import PathFinder, create_app
+from stub_wiki import SyntheticWiki, start_stub
+
+LINKS = {'Alpha': ['Beta'], 'Beta': ['Gamma'], 'Gamma': ['Alpha']}
+
+async def events(job):
+    return [event async for event in job.stream()]
+
+def test_jobs_are_taken_from_each_client_in_turn():
+    order = []
+
+    async def search(start, finish, on_progress):
+        order.append(start)
+        on_progress({'depth': 1})
+        await asyncio.sleep(0)
+        return {'path': [start, finish]}
+
+    async def run():
+        manager = JobManager(search, workers=1)
+        # Jobs may be queued before the workers start
+        jobs = [manager.submit(client, f"{client}{i}", 'Target') for client, count in (('a', 3), ('b', 1), ('c', 2))
+                for i in range(count)]
+        await manager.start()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(events(job) for job in jobs)), 5)
+        finally:
+            await manager.stop()
+        return jobs
+
+    jobs = asyncio.run(run())
+    assert order == ['a0', 'b0', 'c0', 'a1', 'c1', 'a2']
+    assert all(job.status == 'done' for job in jobs)
+    assert [event for event, _ in jobs[0].events] == ['queued', 'started', 'progress', 'done']
+
+def test_failed_searches_end_with_a_failed_event():
+    async def search(start, finish, on_progress):
+        if start == 'Bad':
+            raise ValueError('Start or target page not found in the graph')
+        raise RuntimeError('connection reset')
+
+    async def run():
+        manager = JobManager(search, workers=2)
+        await manager.start()
+        try:
+            jobs = [manager.submit('a', 'Bad', 'Target'), manager.submit('b', 'Other', 'Target')]
+            return [await asyncio.wait_for(events(job), 5) for job in jobs], jobs
+        finally:
+            await manager.stop()
+
+    streams, jobs = asyncio.run(run())
+    assert [stream[-1] for stream in streams] == [('failed', {'error': 'Start or target page not found in the graph'}),
+                                                  ('failed', {'error': 'An error occurred while finding path'})]
+    assert [job.summary()['status'] for job in jobs] == ['failed', 'failed']
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+def test_job_events_are_streamed_over_sse(tmp_path):
+    from aiohttp.test_utils import TestClient, TestServer
+
+    async def run():
+        runner, base_url = await start_stub(SyntheticWiki(links=LINKS))
+        path_finder = PathFinder(None, str(tmp_path / 'cache.db'), f"{base_url}/w/api.php")
+        try:
+            async with TestClient(TestServer(create_app(path_finder))) as client:
+                created = await client.post('/jobs', json={'start': 'Alpha', 'finish': 'Gamma'})
+                job = await created.json()
+                response = await client.get(job['events'])
+                body = await asyncio.wait_for(response.text(), 10)
+                status = await (await client.get(f"/jobs/{job['id']}")).json()
+                return created.status, response.headers['Content-Type'], body, status
+        finally:
+            await runner.cleanup()
+
+    created, content_type, body, status = asyncio.run(run())
+    assert created == 202 and content_type == 'text/event-stream'
+    events = parse_sse(body)
+    assert [event for event, _ in events[:2]] == ['queued', 'started']
+    assert all(event == 'progress' for event, _ in events[2:-1])
+    event, result = events[-1]
+    assert event == 'done'
+    assert [url.rsplit('/', 1)[-1] for url in result['path']] == ['Alpha', 'Beta', 'Gamma']
+    assert status['status'] == 'done'
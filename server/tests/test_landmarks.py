@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from graph_store import LinkGraph, write_store
+from landmarks import UNREACHABLE, LandmarkIndex, bfs_distances, build_landmarks, write_landmarks
+from search_algorithms import a_star_search, bfs
+
+def random_store(tmp_path, nodes, edges, seed):
+    # Sparse enough that many pages cannot reach each other, or reach only some landmarks
+    rng = np.random.default_rng(seed)
+    sources, destinations = rng.integers(0, nodes, edges), rng.integers(0, nodes, edges)
+    write_store(str(tmp_path / 'graph'), [f"Page {node}" for node in range(nodes)], sources, destinations)
+    return LinkGraph(str(tmp_path / 'graph'))
+
+def landmark_index(tmp_path, graph, count, strategy):
+    write_landmarks(str(tmp_path / strategy), graph, *build_landmarks(graph, count, strategy))
+    return LandmarkIndex.load(str(tmp_path / strategy), graph)
+
+@pytest.mark.parametrize('strategy', ['degree', 'farthest'])
+def test_lower_bounds_never_exceed_the_true_distance(tmp_path, strategy):
+    graph = random_store(tmp_path, 300, 360, seed=4)
+    index = landmark_index(tmp_path, graph, 8, strategy)
+    reverse = graph.reversed()
+    nodes = np.arange(graph.node_count)
+    informative = 0
+    for target in range(0, graph.node_count, 7):
+        distances = bfs_distances(reverse.offsets, reverse.adjacency, target).astype(np.float64)
+        distances[distances == UNREACHABLE] = np.inf
+        bounds = index.lower_bounds(nodes, target)
+        assert np.all(bounds <= distances)
+        assert bounds[target] == 0
+        informative += np.count_nonzero(np.isfinite(bounds) & (bounds > 0))
+    assert informative
+def test_bfs_distances_reject_paths_past_the_uint8_range(tmp_path):
+    chain = np.arange(UNREACHABLE)
+    write_store(str(tmp_path / 'graph'), [f"Page {node}" for node in range(UNREACHABLE + 1)], chain, chain + 1)
+    graph = LinkGraph(str(tmp_path / 'graph'))
+    # 254 links is the longest distance that still fits below UNREACHABLE
+    assert bfs_distances(graph.offsets, graph.adjacency, 1)[-1] == UNREACHABLE - 1
+    with pytest.raises(ValueError):
+        bfs_distances(graph.offsets, graph.adjacency, 0)
+
+def test_a_star_with_landmarks_finds_shortest_paths(tmp_path):
+    graph = random_store(tmp_path, 300, 900, seed=5)
+    index = landmark_index(tmp_path, graph, 6, 'farthest')
+    rng = np.random.default_rng(6)
+    for start, target in rng.integers(0, graph.node_count, (40, 2)):
+        start, target = graph.title_of(int(start)), graph.title_of(int(target))
+        expected = bfs(graph, start, target)
+        path, cost = a_star_search(graph, start, target, batch_heuristic=index.distance_estimates)
+        assert len(path) == len(expected)
+        if expected:
+            assert cost == len(path) - 1
+            assert all(b in graph[a] for a, b in zip(path, path[1:]))
@@ -0,0 +1,59 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from link_sources import APILinkSource, HTMLLinkSource
+from network import AsyncHTTPClient
+from stub_wiki import API_MAX_LINKS, API_MAX_TITLES, SyntheticWiki, start_stub
+
+def spaced(titles):
+    return [title.replace('_', ' ') for title in titles]
+
+async def with_sources(wiki, run, **source_options):
+    runner, base_url = await start_stub(wiki)
+    try:
+        async with AsyncHTTPClient(rate_limit=None) as client:
+            html = HTMLLinkSource(client, base_url, **source_options)
+            api = APILinkSource(client, f"{base_url}/w/api.php")
+            return await run(html, api), runner.app['request_log']
+    finally:
+        await runner.cleanup()
+
+def test_both_sources_return_the_same_forward_links():
+    wiki = SyntheticWiki(80)
+    titles = spaced(wiki.titles[:API_MAX_TITLES + 10])
+
+    async def run(html, api):
+        return await html.forward(titles), await api.forward(titles)
+
+    (html_links, api_links), _ = asyncio.run(with_sources(wiki, run))
+    expected = {title: spaced(wiki.outlinks(title)) for title in titles}
+    assert html_links == expected
+    assert api_links == expected
+
+def test_html_source_parses_in_a_process_pool():
+    wiki = SyntheticWiki(40)
+    titles = spaced(wiki.titles[:12])
+    with ProcessPoolExecutor(1) as pool:
+        html_links, _ = asyncio.run(with_sources(wiki, lambda html, api: html.forward(titles), parse_pool=pool, parse_workers=2))
+    assert html_links == {title: spaced(wiki.outlinks(title)) for title in titles}
+
+def test_api_source_follows_link_continuation():
+    hub_links = [f"Leaf_{i}" for i in range(API_MAX_LINKS + 120)]
+    wiki = SyntheticWiki(links={'Hub': hub_links, **{leaf: ['Hub'] for leaf in hub_links}})
+
+    async def run(html, api):
+        return await api.forward(['Hub']), await api.backward(['Hub'])
+
+    (forward, backward), log = asyncio.run(with_sources(wiki, run))
+    assert forward == {'Hub': spaced(hub_links)}
+    assert sorted(backward['Hub']) == sorted(spaced(hub_links))
+    assert len(log.times) == 4
+
+def test_api_source_skips_missing_pages():
+    wiki = SyntheticWiki(20)
+
+    async def run(html, api):
+        return await api.forward(['Article 1', 'No such page']), await api.exists(['Article 1', 'No such page'])
+
+    (links, exists), _ = asyncio.run(with_sources(wiki, run))
+    assert list(links) == ['Article 1']
+    assert not exists
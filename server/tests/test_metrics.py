@@ -0,0 +1,65 @@
+import json
+import pytest
+import metrics
+from metrics import Counter, Gauge, Histogram
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty registry with metrics enabled, so render() shows only the test's metrics."""
+    monkeypatch.setattr(metrics, '_registry', {})
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+
+def test_render_uses_the_prometheus_text_format(registry):
+    requests = Counter('test_requests_total', 'Requests by route')
+    requests.inc(route='/find_path')
+    requests.inc(2, route='/find_path')
+    requests.inc(route='say "hi"\n')
+    Gauge('test_frontier', 'Frontier size').set(7)
+    assert metrics.render() == (
+        '# HELP test_requests_total Requests by route\n'
+        '# TYPE test_requests_total counter\n'
+        'test_requests_total{route="/find_path"} 3\n'
+        'test_requests_total{route="say \\"hi\\"\\n"} 1\n'
+        '# HELP test_frontier Frontier size\n'
+        '# TYPE test_frontier gauge\n'
+        'test_frontier 7\n')
+
+def test_histogram_buckets_are_cumulative_and_inclusive(registry):
+    latency = Histogram('test_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 1.0, 3.0):
+        latency.observe(value, operation='fetch')
+    lines = metrics.render().splitlines()
+    assert lines[1] == '# TYPE test_seconds histogram'
+    assert lines[2:] == [
+        'test_seconds_bucket{operation="fetch",le="0.1"} 2',
+        'test_seconds_bucket{operation="fetch",le="1.0"} 4',
+        'test_seconds_bucket{operation="fetch",le="+Inf"} 5',
+        'test_seconds_sum{operation="fetch"} 4.65',
+        'test_seconds_count{operation="fetch"} 5',
+    ]
+
+def test_disabled_metrics_record_nothing(monkeypatch, registry, tmp_path):
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+    counter, gauge, histogram = Counter('test_total', 'Count'), Gauge('test_gauge', 'Gauge'), Histogram('test_hist', 'Hist')
+    counter.inc()
+    gauge.set(1)
+    histogram.observe(0.2)
+    with histogram.time() as timer:
+        pass
+    assert timer is None
+    assert not counter.values and not gauge.values and not histogram.values
+    assert metrics.render().count('\n') == 6  # HELP and TYPE lines only
+
+def test_trace_writes_one_line_per_update(registry, tmp_path):
+    trace = tmp_path / 'trace.jsonl'
+    counter = Counter('test_total', 'Count')
+    metrics.start_trace(str(trace))
+    try:
+        counter.inc(route='a')
+        Histogram('test_hist', 'Hist').observe(0.5)
+    finally:
+        metrics.stop_trace()
+    counter.inc(route='a')
+    records = [json.loads(line) for line in trace.read_text().splitlines()]
+    assert [(record['metric'], record['value']) for record in records] == [('test_total', 1), ('test_hist', 0.5)]
+    assert records[0]['route'] == 'a'
@@ -0,0 +1,70 @@
+import random
+import numpy as np
+from graph_store import LinkGraph, write_store
+from minhash import SketchIndex, sketch_graph_store
+
+def overlapping_links(seed, pairs=40):
+    """{page: links} for pairs of pages A_i, B_i whose link sets overlap by a random amount."""
+    rng = random.Random(seed)
+    links = {}
+    for i in range(pairs):
+        shared = [f"Shared {i} {j}" for j in range(rng.randint(0, 60))]
+        links[f"A {i}"] = shared + [f"Only A {i} {j}" for j in range(rng.randint(1, 60))]
+        links[f"B {i}"] = shared + [f"Only B {i} {j}" for j in range(rng.randint(1, 60))]
+    return links
+
+def jaccard(links, first, second):
+    first, second = {first, *links[first]}, {second, *links[second]}
+    return len(first & second) / len(first | second)
+
+def test_estimates_track_the_exact_jaccard(tmp_path):
+    links = overlapping_links(seed=1)
+    index = SketchIndex(str(tmp_path / 'sketches'), permutations=256)
+    index.add(links)
+    errors = [abs(index.similarities([f"A {i}"], f"B {i}")[0] - jaccard(links, f"A {i}", f"B {i}"))
+              for i in range(len(links) // 2)]
+    # The standard error with 256 permutations is at most 1/32
+    assert np.mean(errors) < 0.03
+    assert max(errors) < 0.12
+    assert index.similarities(['A 0'], 'A 0')[0] == 1
+    assert list(index.similarities(['Unknown', 'A 0'], 'Nowhere')) == [0, 0]
+
+def test_links_merge_into_existing_signatures(tmp_path):
+    links = overlapping_links(seed=2, pairs=10)
+    whole = SketchIndex(str(tmp_path / 'whole'))
+    whole.add(links)
+    parts = SketchIndex(str(tmp_path / 'parts'))
+    parts.add({page: page_links[::2] for page, page_links in links.items()})
+    parts.add({page: page_links[1::2] for page, page_links in links.items()})
+    assert parts.titles == whole.titles
+    assert np.array_equal(parts.signatures[:len(parts)], whole.signatures[:len(whole)])
+
+def test_sketches_survive_save_and_load(tmp_path):
+    index_dir = str(tmp_path / 'sketches')
+    index = SketchIndex(index_dir, permutations=32, seed=7)
+    links = overlapping_links(seed=3)
+    pages = list(links)
+    # Several adds make the signature file grow past its first capacity
+    for first in range(0, len(pages), 7):
+        index.add({page: links[page] for page in pages[first:first + 7]})
+    index.save()
+    loaded = SketchIndex.load(index_dir)
+    assert (loaded.permutations, loaded.seed, loaded.titles) == (32, 7, pages)
+    assert np.array_equal(loaded.signatures[:len(loaded)], index.signatures[:len(index)])
+    assert np.array_equal(loaded.distance_estimates(pages, 'A 3'), index.distance_estimates(pages, 'A 3'))
+    # The same seed hashes new links the same way after a reload
+    loaded.add({'New': links['A 3']})
+    assert loaded.similarities(['New'], 'A 3')[0] > 0.9
+
+def test_graph_store_sketches_match_added_links(tmp_path):
+    rng = np.random.default_rng(4)
+    sources, destinations = rng.integers(0, 200, 800), rng.integers(0, 200, 800)
+    titles = [f"Page {node}" for node in range(200)]
+    write_store(str(tmp_path / 'graph'), titles, sources, destinations)
+    graph = LinkGraph(str(tmp_path / 'graph'))
+    from_store = SketchIndex(str(tmp_path / 'store'))
+    sketch_graph_store(from_store, graph)
+    from_links = SketchIndex(str(tmp_path / 'links'))
+    from_links.add(dict(graph.items()))
+    assert from_store.titles == from_links.titles == titles
+    assert np.array_equal(from_store.signatures[:200], from_links.signatures[:200])
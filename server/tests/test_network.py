@@ -0,0 +1,57 @@
+import asyncio
+import time
+from network import AsyncHTTPClient, TokenBucket
+from stub_wiki import SyntheticWiki, start_stub
+
+async def grant_times(bucket, count):
+    started = time.monotonic()
+    times = []
+    for _ in range(count):
+        await bucket.acquire()
+        times.append(time.monotonic() - started)
+    return times
+
+def test_bucket_is_empty_when_a_pause_ends():
+    bucket = TokenBucket(rate=20, burst=40)
+    bucket.pause(0.3)
+    times = asyncio.run(grant_times(bucket, 5))
+    assert times[0] >= 0.29
+    # Refilled at 20 per second from the end of the pause, not a burst of 40 saved up during it
+    assert times[-1] - times[0] >= 4 / 20 * 0.9
+
+def test_full_bucket_allows_a_burst():
+    times = asyncio.run(grant_times(TokenBucket(rate=20, burst=10), 10))
+    assert times[-1] < 0.1
+
+def test_no_request_reaches_the_server_before_retry_after():
+    async def run():
+        runner, base_url = await start_stub(SyntheticWiki(50), rate_limit=3)
+        try:
+            async with AsyncHTTPClient(rate_limit=100, burst=100, max_parallel_requests=1) as client:
+                for title in ('Article_1', 'Article_2', 'Article_3', 'Article_4', 'Article_5'):
+                    await client.get(f"{base_url}/wiki/{title}")
+                return runner.app['request_log']
+        finally:
+            await runner.cleanup()
+    log = asyncio.run(run())
+    assert log.throttled >= 1
+    assert len(log.times) == 5
+    # The stub answered 429 with Retry-After: 1 after the third request; the fourth waited it out
+    assert log.times[3] - log.times[2] >= 0.9
+
+def test_retries_are_logged_with_the_url_only(caplog):
+    async def run():
+        runner, base_url = await start_stub(SyntheticWiki(50), rate_limit=1)
+        try:
+            async with AsyncHTTPClient(rate_limit=100, burst=100, max_parallel_requests=1) as client:
+                for title in ('Article_1', 'Article_2'):
+                    await client.get(f"{base_url}/wiki/{title}")
+                return base_url
+        finally:
+            await runner.cleanup()
+    with caplog.at_level('WARNING'):
+        base_url = asyncio.run(run())
+    retries = [record for record in caplog.records if record.getMessage().startswith('Retrying')]
+    assert retries and all(record.levelname == 'WARNING' for record in retries)
+    assert retries[0].getMessage().startswith(f"Retrying {base_url}/wiki/Article_2 in ")
+    assert 'ClientSession' not in caplog.text
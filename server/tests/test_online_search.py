@@ -0,0 +1,84 @@
+import asyncio
+import random
+import pytest
+from crawler import online_search
+from network import AsyncHTTPClient
+from stub_wiki import SyntheticWiki, start_stub
+
+def spaced(title):
+    return title.replace('_', ' ')
+
+def sample_pairs(wiki, count, seed=0):
+    rng = random.Random(seed)
+    pairs = []
+    while len(pairs) < count:
+        start, finish = rng.sample(wiki.titles, 2)
+        distance = wiki.shortest_path_length(start, finish)
+        if distance and 2 <= distance <= 4:
+            pairs.append((spaced(start), spaced(finish), distance))
+    return pairs
+
+def assert_valid_path(wiki, path, start, finish):
+    assert path[0] == start and path[-1] == finish
+    assert all(b.replace(' ', '_') in wiki.outlinks(a) for a, b in zip(path, path[1:]))
+
+async def with_client(wiki, run, latency=0.0):
+    runner, base_url = await start_stub(wiki, latency=latency)
+    try:
+        async with AsyncHTTPClient(rate_limit=None) as client:
+            return await run(base_url, client, runner.app['request_log'])
+    finally:
+        await runner.cleanup()
+
+@pytest.mark.parametrize('link_source', ['api', 'html'])
+def test_paths_are_real_and_within_the_depth_limit(link_source):
+    wiki = SyntheticWiki(1000)
+
+    async def run(base_url, client, log):
+        results = []
+        for start, finish, distance in sample_pairs(wiki, 5):
+            # Found paths end one link past max_depth, or two once backlinks confirm them
+            max_depth = distance - 1 if link_source == 'api' else distance
+            path = await online_search(start, finish, max_pages=2000, base_url=base_url, link_source=link_source,
+                                       max_depth=max_depth, client=client)
+            results.append((start, finish, distance, path))
+        return results
+
+    for start, finish, distance, path in asyncio.run(with_client(wiki, run)):
+        assert path is not None
+        assert_valid_path(wiki, path, start, finish)
+        assert len(path) - 1 == distance
+
+def test_fetch_budget_is_respected():
+    # The target links nowhere and nothing links to it, so no path exists
+    wiki = SyntheticWiki(links={**{f"Page_{i}": [f"Page_{(i * 7 + j) % 500}" for j in range(1, 6)] for i in range(500)},
+                                'Island': []})
+
+    async def run(base_url, client, log):
+        stats = {}
+        path = await online_search('Page 0', 'Island', max_pages=40, base_url=base_url, link_source='html',
+                                   stats=stats, client=client)
+        return path, stats, len(log.times)
+
+    path, stats, requests = asyncio.run(with_client(wiki, run))
+    assert path is None
+    assert stats['fetched'] == 40
+    # Two existence checks, then one request per fetched page
+    assert requests == 2 + 40
+
+def test_outstanding_fetches_are_cancelled_once_a_path_is_found():
+    wiki = SyntheticWiki(3000)
+    start, finish, _ = sample_pairs(wiki, 1, seed=3)[0]
+
+    async def run(base_url, client, log):
+        path = await online_search(start, finish, max_pages=3000, base_url=base_url, link_source='html',
+                                   batch_size=20, client=client)
+        requests = len(log.times)
+        await asyncio.sleep(0.2)
+        return path, requests, len(log.times)
+
+    path, requests, requests_later = asyncio.run(with_client(wiki, run, latency=0.05))
+    assert path is not None
+    assert_valid_path(wiki, path, start, finish)
+    # Fetches still queued in the scheduler never reach the wiki
+    assert requests_later == requests
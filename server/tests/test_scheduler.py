@@ -0,0 +1,76 @@
+import asyncio
+from link_sources import article_url
+from network import AsyncHTTPClient
+from scheduler import FetchScheduler
+from stub_wiki import SyntheticWiki, start_stub
+
+async def with_scheduler(run, latency=0.1, workers=1):
+    wiki = SyntheticWiki(20)
+    runner, base_url = await start_stub(wiki, latency=latency)
+    try:
+        async with AsyncHTTPClient(rate_limit=None) as client:
+            async with FetchScheduler(client, workers=workers, hedge=False) as scheduler:
+                urls = [article_url(title, base_url) for title in wiki.titles]
+                return await run(scheduler, urls, runner.app['request_log'])
+    finally:
+        await runner.cleanup()
+
+def test_queued_fetches_run_lowest_priority_first():
+    async def run(scheduler, urls, log):
+        order = []
+
+        async def fetch(url, priority):
+            await scheduler.get(url, priority)
+            order.append(priority)
+
+        await asyncio.gather(fetch(urls[0], 0), fetch(urls[1], 3), fetch(urls[2], 1), fetch(urls[3], 2))
+        return order
+
+    # The first fetch is already running when the others are queued
+    assert asyncio.run(with_scheduler(run, latency=0.02)) == [0, 1, 2, 3]
+
+def test_cancelled_queued_fetch_never_reaches_the_server():
+    async def run(scheduler, urls, log):
+        running = asyncio.ensure_future(scheduler.get(urls[0]))
+        queued = asyncio.ensure_future(scheduler.get(urls[1]))
+        await asyncio.sleep(0.02)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        await running
+        await asyncio.sleep(0.02)
+        return queued.cancelled(), len(log.times), scheduler.queued, scheduler.fetches
+
+    cancelled, requests, queued, fetches = asyncio.run(with_scheduler(run))
+    assert cancelled
+    assert requests == 1
+    assert queued == 0
+    assert not fetches
+
+def test_cancelling_a_group_aborts_its_running_fetches():
+    async def run(scheduler, urls, log):
+        with scheduler.group() as group:
+            task = asyncio.ensure_future(scheduler.get(urls[0]))
+        await asyncio.sleep(0.03)
+        group.cancel()
+        started = asyncio.get_running_loop().time()
+        await asyncio.gather(task, return_exceptions=True)
+        return task.cancelled(), asyncio.get_running_loop().time() - started, scheduler.fetches
+
+    cancelled, waited, fetches = asyncio.run(with_scheduler(run, latency=1.0))
+    assert cancelled
+    assert waited < 0.5
+    assert not fetches
+
+def test_shared_fetch_survives_one_waiter_cancelling():
+    async def run(scheduler, urls, log):
+        first = asyncio.ensure_future(scheduler.get(urls[0]))
+        second = asyncio.ensure_future(scheduler.get(urls[0]))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        return first.cancelled(), await second, len(log.times)
+
+    cancelled, html, requests = asyncio.run(with_scheduler(run))
+    assert cancelled
+    assert 'Article 0' in html
+    assert requests == 1
@@ -0,0 +1,105 @@
+import random
+import pytest
+from benchmarks import synthetic_graph
+from search_algorithms import a_star_search, bfs, bidirectional_bfs, build_reverse_graph, dfs, dijkstra
+
+def assert_valid_path(graph, path, start, target):
+    assert path[0] == start and path[-1] == target
+    assert all(b in graph[a] for a, b in zip(path, path[1:]))
+
+def sample_pairs(graph, count, seed=1):
+    rng = random.Random(seed)
+    nodes = list(graph)
+    return [(rng.choice(nodes), rng.choice(nodes)) for _ in range(count)]
+
+def test_bidirectional_start_is_finish():
+    assert bidirectional_bfs({'A': ['B'], 'B': []}, 'A', 'A') == ['A']
+
+def test_bidirectional_no_path():
+    graph = {'A': ['B'], 'B': [], 'C': ['A']}
+    assert bidirectional_bfs(graph, 'A', 'C') == []
+
+def test_bidirectional_meets_at_depth_one():
+    assert bidirectional_bfs({'A': ['B'], 'B': []}, 'A', 'B') == ['A', 'B']
+    graph = {'A': ['M', 'X'], 'X': [], 'M': ['B'], 'B': []}
+    assert bidirectional_bfs(graph, 'A', 'B') == ['A', 'M', 'B']
+
+def test_bidirectional_depth_cap():
+    chain = {node: [node + 1] for node in range(5)}
+    chain[5] = []
+    assert bidirectional_bfs(chain, 0, 5, max_depth=4) == []
+    assert bidirectional_bfs(chain, 0, 5, max_depth=5) == [0, 1, 2, 3, 4, 5]
+
+def test_bidirectional_unknown_page_is_rejected():
+    with pytest.raises(ValueError):
+        bidirectional_bfs({'A': []}, 'A', 'Z')
+
+@pytest.mark.parametrize('seed', range(3))
+def test_bidirectional_matches_bfs_lengths(seed):
+    graph = synthetic_graph(200, 500, seed)
+    reverse_graph = build_reverse_graph(graph)
+    for start, target in sample_pairs(graph, 60, seed):
+        expected = bfs(graph, start, target, max_depth=len(graph))
+        built = bidirectional_bfs(graph, start, target, max_depth=len(graph))
+        given = bidirectional_bfs(graph, start, target, max_depth=len(graph), reverse_graph=reverse_graph)
+        assert len(built) == len(given) == len(expected)
+        if expected:
+            assert_valid_path(graph, built, start, target)
+            assert_valid_path(graph, given, start, target)
+
+@pytest.mark.parametrize('seed', range(3))
+def test_rewritten_searches_match_legacy_versions(seed):
+    from benchmarks import legacy_a_star_search, legacy_dfs, legacy_dijkstra
+    graph = synthetic_graph(300, 900, seed)
+    zero = lambda page, target: 0
+    for start, target in sample_pairs(graph, 40, seed):
+        for max_depth in (3, 8, 40):
+            expected = legacy_dfs(graph, start, target, max_depth)
+            path = dfs(graph, start, target, max_depth)
+            assert len(path) == len(expected)
+            if path:
+                assert_valid_path(graph, path, start, target)
+        expected, expected_cost = legacy_dijkstra(graph, start, target)
+        path, cost = dijkstra(graph, start, target)
+        assert len(path) == len(expected) and cost == expected_cost
+        if path:
+            assert_valid_path(graph, path, start, target)
+        expected, expected_cost = legacy_a_star_search(graph, start, target, zero)
+        path, cost = a_star_search(graph, start, target, zero)
+        assert len(path) == len(expected) and cost == expected_cost
+        if path:
+            assert_valid_path(graph, path, start, target)
+
+def test_dfs_goes_deeper_than_the_recursion_limit():
+    import sys
+    nodes = sys.getrecursionlimit() + 500
+    chain = {node: [node + 1] for node in range(nodes)}
+    chain[nodes] = []
+    assert dfs(chain, 0, nodes, max_depth=nodes) == list(range(nodes + 1))
+
+def test_bidirectional_gives_up_past_its_discovery_budget():
+    graph = synthetic_graph(200, 800)
+    stats = {}
+    assert bidirectional_bfs(graph, 0, 199, max_depth=200, stats=stats, max_discovered=5) == []
+    # The budget is checked after each page's links, so one page's links may overshoot it
+    largest = max(len(links) for links in [*graph.values(), *build_reverse_graph(graph).values()])
+    assert stats['discovered'] <= 5 + largest
+    assert bidirectional_bfs(graph, 0, 199, max_depth=200, max_discovered=len(graph) * 2)
+
+class UnusedFetcher:
+    def fetch_text(self, title):
+        raise AssertionError(f"fetched {title} without a fitted similarity model")
+
+def test_a_star_default_heuristic_without_a_fitted_model(monkeypatch):
+    import search_algorithms
+    from heuristic import TextSimilarity
+    monkeypatch.setattr(search_algorithms, '_text_heuristic', (UnusedFetcher(), None, TextSimilarity()))
+    graph = synthetic_graph(300, 1200, seed=9)
+    for start, target in sample_pairs(graph, 30):
+        expected = bfs(graph, start, target)
+        path, cost = a_star_search(graph, start, target)
+        if expected:
+            assert_valid_path(graph, path, start, target)
+            assert cost == len(path) - 1 == len(expected) - 1
+        else:
+            assert path == []
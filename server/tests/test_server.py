@@ -0,0 +1,107 @@
+import asyncio
+import time
+import server
+from server import PathFinder, RateLimiter, create_app
+from stub_wiki import SyntheticWiki, start_stub
+
+LINKS = {'Alpha': ['Beta'], 'Beta': ['Gamma'], 'Gamma': ['Alpha'], 'Delta': ['Alpha']}
+
+async def with_path_finder(tmp_path, run, latency=0.0):
+    runner, base_url = await start_stub(SyntheticWiki(links=LINKS), latency=latency)
+    path_finder = PathFinder(None, str(tmp_path / 'cache.db'), f"{base_url}/w/api.php")
+    await path_finder.start(None)
+    try:
+        return await run(path_finder, runner.app['request_log'])
+    finally:
+        await path_finder.stop(None)
+        await runner.cleanup()
+
+def count_searches(path_finder):
+    searches = []
+    search = path_finder._search
+
+    async def counted(start, finish):
+        searches.append((start, finish))
+        return await search(start, finish)
+    path_finder._search = counted
+    return searches
+
+def test_identical_concurrent_requests_share_one_search(tmp_path):
+    async def run(path_finder, log):
+        searches = count_searches(path_finder)
+        first, second = await asyncio.gather(path_finder.find_path('Alpha', 'Gamma'),
+                                             path_finder.find_path('Alpha', 'Gamma'))
+        return first, second, searches, path_finder.in_flight
+
+    first, second, searches, in_flight = asyncio.run(with_path_finder(tmp_path, run, latency=0.05))
+    assert first is second
+    assert first['path'] == ['Alpha', 'Beta', 'Gamma']
+    assert searches == [('Alpha', 'Gamma')]
+    assert not in_flight
+
+def test_solved_pairs_are_served_from_the_result_cache(tmp_path):
+    async def run(path_finder, log):
+        searches = count_searches(path_finder)
+        first = await path_finder.find_path('Alpha', 'Gamma')
+        requests = len(log.times)
+        second = await path_finder.find_path('Alpha', 'Gamma')
+        # Only the title resolution is asked of the wiki again
+        return first, second, searches, len(log.times) - requests
+
+    first, second, searches, requests = asyncio.run(with_path_finder(tmp_path, run))
+    assert second is first
+    assert len(searches) == 1
+    assert requests <= 1
+
+def test_failed_live_searches_are_not_cached(tmp_path):
+    async def run(path_finder, log):
+        searches = count_searches(path_finder)
+        first = await path_finder.find_path('Alpha', 'Delta')
+        await path_finder.find_path('Alpha', 'Delta')
+        return first, searches
+
+    first, searches = asyncio.run(with_path_finder(tmp_path, run))
+    assert first['path'] == []
+    assert len(searches) == 2
+
+def test_live_search_stops_at_its_page_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'MAX_SEARCH_PAGES', 1)
+
+    async def run(path_finder, log):
+        return await path_finder.find_path('Alpha', 'Gamma')
+
+    result = asyncio.run(with_path_finder(tmp_path, run))
+    assert result['path'] == []
+    assert result['discovered'] <= 3
+
+def test_rate_limiter_drops_idle_addresses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(server.time, 'monotonic', lambda: now[0])
+    limiter = RateLimiter('2/second')
+    assert limiter.allow('a') and limiter.allow('a') and not limiter.allow('a')
+    assert limiter.allow('b')
+    now[0] += 1.5
+    assert limiter.allow('c')
+    assert list(limiter.requests) == ['c']
+    assert limiter.allow('a')
+
+def test_find_path_route_rate_limits_clients(tmp_path):
+    from aiohttp.test_utils import TestClient, TestServer
+
+    async def run(path_finder, log):
+        async with TestClient(TestServer(create_app(path_finder, rate_limit='1/minute'))) as client:
+            body = {'start': 'Alpha', 'finish': 'Gamma'}
+            first = await client.post('/find_path', json=body)
+            second = await client.post('/find_path', json=body)
+            return first.status, (await first.json())['path'], second.status
+
+    async def run_app(tmp_path):
+        runner, base_url = await start_stub(SyntheticWiki(links=LINKS))
+        try:
+            return await run(PathFinder(None, str(tmp_path / 'cache.db'), f"{base_url}/w/api.php"), None)
+        finally:
+            await runner.cleanup()
+
+    status, path, limited = asyncio.run(run_app(tmp_path))
+    assert status == 200 and [url.rsplit('/', 1)[-1] for url in path] == ['Alpha', 'Beta', 'Gamma']
+    assert limited == 429
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from graph_store import LinkGraph, write_store
+from search_algorithms import bfs
+from sparse_bfs import sparse_bfs, sparse_bfs_many
+from stub_wiki import SyntheticWiki
+
+@pytest.fixture
+def chain(tmp_path):
+    # A -> B -> C, and D and E unreachable from A
+    write_store(str(tmp_path), ['A', 'B', 'C', 'D', 'E'], np.array([0, 1, 3]), np.array([1, 2, 4]))
+    return LinkGraph(str(tmp_path))
+
+def test_out_of_range_targets_are_unreachable(chain):
+    assert sparse_bfs(chain, 0, -1) == []
+    assert sparse_bfs(chain, 0, chain.node_count) == []
+    assert list(sparse_bfs_many(chain, 0, [2, 5, -1, 2, 4])) == [(2, [0, 1, 2]), (5, []), (-1, []), (4, [])]
+
+def test_out_of_range_start_is_rejected(chain):
+    for start in (-1, chain.node_count):
+        with pytest.raises(ValueError):
+            list(sparse_bfs_many(chain, start, [1]))
+
+def test_unknown_direction_is_rejected(chain):
+    with pytest.raises(ValueError):
+        sparse_bfs(chain, 0, 2, direction='sideways')
+
+@pytest.mark.parametrize('direction', ['auto', 'top-down', 'bottom-up'])
+def test_paths_match_bfs(tmp_path, direction):
+    wiki = SyntheticWiki(300)
+    titles = sorted(wiki.titles)
+    node_of = {title: node for node, title in enumerate(titles)}
+    edges = [(node_of[title], node_of[link]) for title in titles for link in wiki.outlinks(title)]
+    sources, destinations = (np.array(column) for column in zip(*edges))
+    write_store(str(tmp_path), titles, sources, destinations)
+    graph = LinkGraph(str(tmp_path))
+    adjacency = {title: sorted(wiki.outlinks(title)) for title in titles}
+    for target in titles[1:40]:
+        expected = bfs(adjacency, titles[0], target)
+        path = sparse_bfs(graph, 0, node_of[target], direction=direction)
+        assert [titles[node] for node in path] == (expected or [])
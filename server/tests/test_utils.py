@@ -0,0 +1,44 @@
+from benchmarks import legacy_parse_links
+from stub_wiki import NAV_LINKS, SyntheticWiki, wiki_href
+from utils import extract_title, parse_link_titles, parse_links
+
+BASE_URL = "https://en.wikipedia.org"
+TITLES = ['C++', 'Café', 'AC/DC', 'Star Wars: Episode IV', 'Mother_Teresa', '100% (album)', 'Ünïcödé', 'Québec City']
+
+def test_matches_the_beautifulsoup_parser_on_article_links():
+    wiki = SyntheticWiki(400, titles=TITLES, seed=3)
+    nav = {f"{BASE_URL}{wiki_href(title)}" for title in NAV_LINKS if ':' not in title}
+    for title in wiki.titles:
+        html = wiki.render_html(title, paragraphs=2)
+        links = parse_links(html, BASE_URL)
+        assert len(links) == len(set(links))
+        # The old parser also kept navigation links, and dropped every title with a colon in it
+        assert {link for link in links if ':' not in extract_title(link)} == set(legacy_parse_links(html, BASE_URL)) - nav
+        assert parse_link_titles(html, BASE_URL) == [link.replace('_', ' ') for link in wiki.links[title]]
+
+def test_percent_encoded_titles_are_decoded():
+    wiki = SyntheticWiki(links={'Home': TITLES})
+    links = parse_links(wiki.render_html('Home'), BASE_URL)
+    assert links[1] == f"{BASE_URL}/wiki/Caf%C3%A9"
+    assert [extract_title(link) for link in links] == [title.replace('_', ' ') for title in TITLES]
+
+def test_navigation_namespaces_and_fragments_are_left_out():
+    html = (
+        '<div id="mw-navigation"><a href="/wiki/Main_Page">Main page</a></div>'
+        '<div id="mw-content-text"><p>'
+        '<a href="/wiki/Paris#History">Paris history</a> <a class="x" href="/wiki/Paris">Paris</a> '
+        '<a href="/wiki/File:Paris.jpg">image</a> <a href="/wiki/category:Cities">lower case namespace</a> '
+        '<a href="/wiki/Talk:Paris">talk</a> <a href="/wiki/Template_talk:Infobox">template talk</a> '
+        '<a href="/wiki/Help%3AContents">encoded colon</a> <a href="/w/index.php?title=Paris&action=edit">edit</a> '
+        '<a href="#cite_note-1">[1]</a> <a href="https://fr.wikipedia.org/wiki/Paris">fr</a> '
+        '<a href="/wiki/Mission:_Impossible">film</a>'
+        '</p></div>'
+        '<div class="printfooter"><a href="/wiki/Printed">printed</a></div>'
+        '<div id="catlinks"><a href="/wiki/Category:Cities">Cities</a></div>'
+        '<div id="footer"><a href="/wiki/Wikipedia:About">About</a></div>'
+    )
+    assert parse_link_titles(html, BASE_URL) == ['Paris', 'Mission: Impossible']
+
+def test_pages_without_a_content_region_are_scanned_whole():
+    html = '<p><a href="/wiki/Alpha">Alpha</a> <a href="/wiki/Portal:Science">portal</a></p>'
+    assert parse_links(html, BASE_URL) == [f"{BASE_URL}/wiki/Alpha"]
@@ -1,7 +1,7 @@
 import re
 import logging
-from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse, urljoin, unquote
+from metrics import PARSE_SECONDS
 
 def normalize_url(url):
     try:
@@ -14,14 +14,16 @@ def normalize_url(url):
 
 def extract_title(url):
     try:
-        title = urlparse(url).path.split('/')[-1]
+        path = urlparse(url).path
+        title = path.split('/wiki/', 1)[1] if '/wiki/' in path else path.split('/')[-1]
         if title:
-            return title.replace('_', ' ')
+            return unquote(title).replace('_', ' ')
     except Exception as e:
         logging.error(f"Error extracting title from URL {url}: {e}")
     return None
 
 def clean_text(html_content):
+    from bs4 import BeautifulSoup
     try:
         soup = BeautifulSoup(html_content, 'html.parser')
         for script in soup(["script", "style", "sup", "table", "div"]):
@@ -32,20 +34,51 @@ def clean_text(html_content):
         logging.error(f"Error cleaning HTML content: {e}")
     return ''
 
+# Namespace prefixes (and common aliases) of pages that are not articles
+NON_ARTICLE_NAMESPACES = frozenset([
+    'Talk', 'User', 'User talk', 'Wikipedia', 'Wikipedia talk', 'WP', 'Project', 'File', 'File talk', 'Image',
+    'MediaWiki', 'MediaWiki talk', 'Template', 'Template talk', 'Help', 'Help talk', 'Category', 'Category talk',
+    'Portal', 'Portal talk', 'Draft', 'Draft talk', 'TimedText', 'TimedText talk', 'Module', 'Module talk',
+    'Special', 'Media', 'Book', 'Education Program', 'Gadget', 'Gadget definition', 'Topic',
+])
+CONTENT_START_PATTERN = re.compile(r'<div[^>]*\bid="mw-content-text"')
+CONTENT_END_PATTERN = re.compile(r'<div[^>]*(?:\bclass="printfooter"|\bid="catlinks")')
+WIKI_HREF_PATTERN = re.compile(r'<a\s[^>]*?href="/wiki/([^"?#]+)(?:#[^"]*)?"')
+
+def is_article_title(title):
+    title = unquote(title)  # hrefs may encode the namespace colon as %3A
+    if ':' not in title:
+        return True
+    namespace = title.split(':', 1)[0].replace('_', ' ').strip()
+    return namespace[:1].upper() + namespace[1:] not in NON_ARTICLE_NAMESPACES
+
 def parse_links(html_content, base_url="https://en.wikipedia.org"):
+    """Article links in the body of a Wikipedia page, in page order, without building a DOM.
+
+    Only the `#mw-content-text` region is scanned, so navigation, sidebar and footer links are left out,
+    as are links into other namespaces; section anchors are stripped from the links that remain.
+    """
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        links = set()
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if href.startswith('/wiki/') and ':' not in href:
-                full_url = urljoin(base_url, href)
-                links.add(full_url)
-        return list(links)
+        with PARSE_SECONDS.time():
+            start = CONTENT_START_PATTERN.search(html_content)
+            start = start.start() if start else 0
+            end = CONTENT_END_PATTERN.search(html_content, start)
+            end = end.start() if end else len(html_content)
+            links = {}
+            for match in WIKI_HREF_PATTERN.finditer(html_content, start, end):
+                title = match.group(1)
+                if is_article_title(title):
+                    links.setdefault(f"{base_url}/wiki/{title}")
+            return list(links)
     except Exception as e:
         logging.error(f"Error parsing links from HTML content: {e}")
     return []
 
+def parse_link_titles(html_content, base_url="https://en.wikipedia.org"):
+    """Titles of the article links in a page. Runs in parse worker processes, so only this short list
+    of strings is sent back to the crawler."""
+    return [extract_title(link) for link in parse_links(html_content, base_url=base_url)]
+
 def setup_logger(name='WikiCrawler', level=logging.INFO, file_name='crawler.log'):
     try:
         logger = logging.getLogger(name)